@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Compares the throughput of the synchronous delivery path against the
+asynchronous delivery engine using a local SMTP sink which adds latency to
+each command, imitating a remote relay.
+
+Usage:
+    python benchmarks/bench_delivery.py --messages 200 --latency 0.02
+
+Requires `aiosmtplib` and `aiosmtpd`.
+"""
+
+import argparse
+import asyncio
+import socket
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+
+class LatencySink:
+    """An SMTP handler which accepts every message after a delay."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.received = 0
+
+    async def handle_RCPT(self, server, session, envelope, address, options):
+        await asyncio.sleep(self.latency)
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.latency)
+        self.received += 1
+        return "250 Message accepted for delivery"
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_messages(count: int):
+    from django.core.mail import EmailMessage
+
+    return [
+        EmailMessage(
+            subject=f"Benchmark {i}",
+            body="Benchmark message body. " * 40,
+            from_email="sender@example.com",
+            to=[f"user{i}@domain{i % 10}.example.com"],
+        )
+        for i in range(count)
+    ]
+
+
+def bench_sync(count: int) -> float:
+    """The existing path: one `send_mail` call, and therefore one SMTP
+    connection, per message.
+    """
+    from email_signals import emailer
+
+    start = time.perf_counter()
+    for message in build_messages(count):
+        emailer.send_mail(
+            subject=message.subject,
+            plain_message=message.body,
+            from_email=message.from_email,
+            recipient_list=message.to,
+        )
+    return time.perf_counter() - start
+
+
+def bench_async(count: int, sessions: int, per_domain_limit: int) -> float:
+    from email_signals import delivery
+
+    messages = build_messages(count)
+    start = time.perf_counter()
+    results = delivery.deliver(
+        messages, sessions=sessions, per_domain_limit=per_domain_limit
+    )
+    elapsed = time.perf_counter() - start
+    failed = [result for result in results if not result.ok]
+    if failed:
+        raise RuntimeError(f"{len(failed)} messages failed: {failed[0]}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--per-domain-limit", type=int, default=4)
+    args = parser.parse_args()
+
+    from aiosmtpd.controller import Controller
+
+    port = get_free_port()
+    settings.configure(
+        EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+        EMAIL_HOST="127.0.0.1",
+        EMAIL_PORT=port,
+        EMAIL_TIMEOUT=30,
+        INSTALLED_APPS=[],
+        TEMPLATES=[
+            {"BACKEND": "django.template.backends.django.DjangoTemplates"}
+        ],
+    )
+    django.setup()
+
+    handler = LatencySink(args.latency)
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        sync_elapsed = bench_sync(args.messages)
+        async_elapsed = bench_async(
+            args.messages, args.sessions, args.per_domain_limit
+        )
+    finally:
+        controller.stop()
+
+    print(f"messages: {args.messages}, sink latency: {args.latency}s")
+    print(
+        f"sync:  {sync_elapsed:8.2f}s {args.messages / sync_elapsed:10.1f} "
+        "msgs/sec"
+    )
+    print(
+        f"async: {async_elapsed:8.2f}s {args.messages / async_elapsed:10.1f} "
+        f"msgs/sec ({args.sessions} sessions)"
+    )
+
+
+if __name__ == "__main__":
+    main()
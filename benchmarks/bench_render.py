@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Compares rendering an order confirmation email with the Django template
+engine and with Jinja2.
+
+Two things are measured:
+* Warm rendering: the template has already been compiled and is rendered
+  repeatedly, as a long running worker would.
+* Start up: the time for a fresh process to render the template for the
+  first time. For Jinja2 this is measured with an empty bytecode cache and
+  with a bytecode cache filled by an earlier process.
+
+Usage:
+    python benchmarks/bench_render.py --renders 500 --items 100
+
+Requires `jinja2`.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+TEMPLATE = "order_email.html"
+
+
+def build_context(items: int) -> dict:
+    """Build the context of an order with `items` line items."""
+    return {
+        "instance": {
+            "order_number": "ORD-000123",
+            "customer": {
+                "name": "Ada Lovelace",
+                "email": "ada@example.com",
+                "address": ["1 Example Street", "London", "N1 1AA"],
+            },
+            "lines": [
+                {
+                    "name": f"Product {i}",
+                    "description": "A thoroughly useful product. " * 4,
+                    "quantity": i % 5 + 1,
+                    "price": f"{i * 1.25:.2f}",
+                    "discounted": i % 3 == 0,
+                }
+                for i in range(items)
+            ],
+            "recommendations": [
+                {
+                    "slug": f"product-{i}",
+                    "name": f"Recommended {i}",
+                    "summary": "Customers who bought this also liked it.",
+                }
+                for i in range(items // 4)
+            ],
+            "total": "1234.56",
+        },
+        "signal_kwargs": {"created": True},
+    }
+
+
+def source() -> str:
+    return (BENCHMARKS_DIR / "templates" / TEMPLATE).read_text()
+
+
+def bench_warm(engine: str, context: dict, renders: int) -> tuple:
+    """Render the inline template `renders` times after compiling it and
+    return the time taken and the size of the output.
+    """
+    from email_signals import rendering
+
+    template_source = source()
+    output = rendering.render_string(template_source, context, engine, 1)
+    start = time.perf_counter()
+    for _ in range(renders):
+        rendering.render_string(template_source, context, engine, 1)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(output)
+
+
+def bench_cold(engine: str, context: dict, repeat: int = 20) -> float:
+    """Return the average time to compile and render the template once in a
+    fresh environment, as a new process would.
+    """
+    from email_signals import rendering, template_cache
+
+    template_source = source()
+    total = 0.0
+    for _ in range(repeat):
+        rendering.reset()
+        template_cache.invalidate()
+        start = time.perf_counter()
+        rendering.render_string(template_source, context, engine, 1)
+        total += time.perf_counter() - start
+    return total / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--renders", type=int, default=500)
+    parser.add_argument("--items", type=int, default=100)
+    args = parser.parse_args()
+
+    bytecode_dir = tempfile.mkdtemp()
+    settings.configure(
+        INSTALLED_APPS=[],
+        TEMPLATES=[
+            {
+                "BACKEND": "django.template.backends.django.DjangoTemplates",
+                "DIRS": [str(BENCHMARKS_DIR / "templates")],
+            }
+        ],
+        EMAIL_SIGNAL_JINJA2_BYTECODE_CACHE=None,
+        EMAIL_SIGNAL_JINJA2_BYTECODE_DIR=bytecode_dir,
+    )
+    django.setup()
+
+    from email_signals import rendering
+
+    context = build_context(args.items)
+    print(f"renders: {args.renders}, line items: {args.items}")
+    for engine in (rendering.DJANGO, rendering.JINJA2):
+        elapsed, size = bench_warm(engine, context, args.renders)
+        print(
+            f"{engine:27} warm: {elapsed:8.3f}s "
+            f"{args.renders / elapsed:10.1f} renders/sec ({size} bytes)"
+        )
+
+    startup = {
+        "django": bench_cold(rendering.DJANGO, context),
+        "jinja2 (no bytecode cache)": bench_cold(rendering.JINJA2, context),
+    }
+    settings.EMAIL_SIGNAL_JINJA2_BYTECODE_CACHE = "filesystem"
+    rendering.reset()
+    rendering.render_string(source(), context, rendering.JINJA2)
+    startup["jinja2 (bytecode cached)"] = bench_cold(rendering.JINJA2, context)
+
+    for name, elapsed in startup.items():
+        print(f"{name:27} start up: {elapsed * 1000:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,3 @@
+from .suppression import suppressed  # noqa: F401
+
 __version__ = "1.0.1"
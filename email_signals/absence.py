@@ -0,0 +1,201 @@
+"""Absence signals, which send an email when a record still meets their
+constraints some time after it was created or changed, e.g: an order which
+has not been completed 24 hours after it was placed.
+
+An absence signal has no model signal to raise it. Instead, the
+`email_signals_absence` command scans the signal's model for records whose
+`absence_field` is more than `absence_delay` minutes old. Each signal has a
+`Watermark`: the `absence_field` value and primary key of the last record it
+scanned. A scan only reads the records between the watermark and the
+current cutoff, in `(absence_field, pk)` order, with an indexed range query
+to which the constraints are added with `bulk.candidates()`. Each record is
+therefore scanned once, however often the command runs.
+
+The first scan of a signal only sets its watermark, so that records which
+were already overdue when the signal was added are not sent to. Signals are
+not scanned while their model is suppressed, see `suppression`, so that the
+records which become overdue meanwhile are sent to once it is lifted.
+"""
+
+import datetime
+import logging
+import typing as _t
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+from . import bulk, metrics, signals, suppression
+from .constraint_checker import ConstraintChecker
+from .models import Signal, Watermark
+
+logger = logging.getLogger(__name__)
+
+
+def cutoff(
+    signal: Signal, now: _t.Optional[datetime.datetime] = None
+) -> datetime.datetime:
+    """Return the time before which a record's `absence_field` has to be
+    for the signal to be sent for it.
+    """
+    now = now or timezone.now()
+    return now - datetime.timedelta(minutes=signal.absence_delay)
+
+
+def _position(value: datetime.datetime, field: models.Field):
+    """Return a watermark value as a value of the `absence_field`. Days
+    are those of the current time zone, like the values of date fields.
+    """
+    if isinstance(field, models.DateTimeField):
+        return value
+    if timezone.is_aware(value):
+        return timezone.localdate(value)
+    return value.date()
+
+
+def _watermark(
+    value: _t.Union[datetime.date, datetime.datetime],
+    end: datetime.datetime,
+) -> datetime.datetime:
+    """Return the value of a date or datetime field as a watermark value,
+    i.e: a day as its midnight in the current time zone.
+    """
+    if isinstance(value, datetime.datetime):
+        return value
+    value = datetime.datetime.combine(value, datetime.time.min)
+    if timezone.is_aware(end):
+        value = timezone.make_aware(value)
+    return value
+
+
+def last_due(end: datetime.datetime, field: models.Field) -> datetime.datetime:
+    """Return the latest watermark whose records are all due by `end`.
+
+    A date field only says which day a record belongs to, so its records
+    are only due once the whole day is before `end`.
+    """
+    if isinstance(field, models.DateTimeField):
+        return end
+    day = _position(end, field) - datetime.timedelta(days=1)
+    return _watermark(day, end)
+
+
+def scan_batch(
+    signal: Signal,
+    field_name: str,
+    end: datetime.datetime,
+    batch_size: int,
+    signal_kwargs: _t.Optional[dict] = None,
+) -> _t.Tuple[_t.List[models.Model], bool]:
+    """Scan the next batch of a signal's records, in order of a date or
+    datetime field up to `end`, and move the signal's watermark past them.
+
+    Args:
+        signal: The signal to scan the records for.
+        field_name: The field to scan the records in order of.
+        end: The value of the field to scan up to.
+        batch_size: The maximum number of records to read.
+        signal_kwargs: The kwargs the constraints are checked with.
+
+    Returns:
+        The records which met the constraints and whether the scan has
+        reached `end`.
+    """
+    signal_kwargs = signal_kwargs or {}
+    model = signal.model
+    field = model._meta.get_field(field_name)
+    name = field.name
+    end = last_due(end, field)
+    with transaction.atomic():
+        locked = Watermark.objects.select_for_update()
+        watermark, created = locked.get_or_create(
+            signal=signal, defaults={"value": end}
+        )
+        if created:
+            return [], True
+
+        constraints = list(signal.constraints.all())
+        queryset = bulk.candidates(signal, model, constraints, signal_kwargs)
+        if queryset is None:
+            watermark.value, watermark.last_pk = end, ""
+            watermark.save()
+            return [], True
+
+        position = _position(watermark.value, field)
+        after = Q(**{f"{name}__gt": position})
+        if watermark.last_pk:
+            last_pk = model._meta.pk.to_python(watermark.last_pk)
+            after |= Q(**{name: position, "pk__gt": last_pk})
+        rows = list(
+            queryset.filter(
+                after, **{f"{name}__lte": _position(end, field)}
+            ).order_by(name, "pk")[:batch_size]
+        )
+
+        done = len(rows) < batch_size
+        if done:
+            watermark.value, watermark.last_pk = end, ""
+        else:
+            last = rows[-1]
+            value = _watermark(getattr(last, name), end)
+            watermark.value, watermark.last_pk = value, str(last.pk)
+        watermark.save()
+
+    matched = [
+        instance
+        for instance in rows
+        if ConstraintChecker(instance, constraints, signal_kwargs).run_tests()
+    ]
+    return matched, done
+
+
+def scan(
+    signal: Signal,
+    batch_size: int = 1000,
+    now: _t.Optional[datetime.datetime] = None,
+) -> int:
+    """Send an absence signal's emails for the records which have become
+    overdue since its last scan.
+
+    Args:
+        signal: The absence signal.
+        batch_size: The maximum number of records to read at a time.
+        now: The time to scan up to. Defaults to now.
+
+    Returns:
+        The number of records emails were sent for.
+    """
+    end = cutoff(signal, now)
+    sent = 0
+    while not suppression.model_suppressed(signal.model, None):
+        # The watermark is committed before the emails are sent, so that a
+        # record is not sent to twice if sending fails or another scan runs
+        # at the same time.
+        matched, done = scan_batch(
+            signal, signal.absence_field, end, batch_size
+        )
+        for instance in matched:
+            signals.dispatch_signal(signal, instance, {})
+        sent += len(matched)
+        if done:
+            break
+    metrics.incr("absence.matched", sent)
+    return sent
+
+
+def process_absences(batch_size: int = 1000) -> int:
+    """Scan every active absence signal.
+
+    Args:
+        batch_size: The maximum number of records to read at a time.
+
+    Returns:
+        The number of records emails were sent for.
+    """
+    sent = 0
+    for signal in Signal.objects.filter(
+        signal_type=Signal.SignalTypeChoices.absence, active=True
+    ):
+        try:
+            sent += scan(signal, batch_size)
+        except Exception:
+            logger.exception("Failed to scan absence signal %s.", signal.pk)
+    return sent
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from . import models, forms
+from . import breaker, metrics, models, forms, payloads
 
 
 class SignalConstraintInline(admin.TabularInline):
@@ -25,3 +25,99 @@ class SignalAdmin(admin.ModelAdmin):
     class Media:
         css = {"all": ("email_signals/css/signal_change_form.min.css",)}
         js = ("email_signals/js/signal_change_form.min.js",)
+
+
+@admin.register(models.EmailTemplate)
+class EmailTemplateAdmin(admin.ModelAdmin):
+    form = forms.EmailTemplateAdminForm
+    list_display = ("name", "description", "updated_at")
+    search_fields = ("name", "description")
+
+
+@admin.register(models.OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    change_list_template = "email_signals/admin/email_signals/outboxemail/change_list.html"  # noqa: E501
+    list_display = (
+        "signal",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "created_at",
+        "sent_at",
+    )
+    list_filter = ("status",)
+    readonly_fields = (
+        "signal",
+        "recipients",
+        "context",
+        "payload",
+        "attempts",
+        "last_error",
+        "created_at",
+        "sent_at",
+    )
+
+    def changelist_view(self, request, extra_context=None):
+        """Show the state of the email backend's circuit breaker and the
+        delivery metrics of the process serving the request.
+        """
+        extra_context = {
+            "breaker_state": breaker.get_breaker().state,
+            "email_metrics": metrics.snapshot(),
+            **(extra_context or {}),
+        }
+        return super().changelist_view(request, extra_context)
+
+
+@admin.register(models.Digest)
+class DigestAdmin(admin.ModelAdmin):
+    list_display = ("signal", "recipient", "event_count", "send_at")
+    list_filter = ("signal",)
+    readonly_fields = (
+        "signal",
+        "recipient",
+        "window_start",
+        "send_at",
+        "events",
+        "event_count",
+    )
+
+
+@admin.register(models.Watermark)
+class WatermarkAdmin(admin.ModelAdmin):
+    list_display = ("signal", "value", "updated_at")
+    readonly_fields = ("signal", "value", "last_pk", "updated_at")
+
+
+@admin.register(models.SuppressedAddress)
+class SuppressedAddressAdmin(admin.ModelAdmin):
+    list_display = ("email", "reason", "active", "updated_at")
+    list_filter = ("reason", "active")
+    search_fields = ("email",)
+
+
+@admin.register(models.DeliveryLog)
+class DeliveryLogAdmin(admin.ModelAdmin):
+    list_display = ("signal", "status", "created_at")
+    list_filter = ("status",)
+    readonly_fields = (
+        "signal",
+        "recipients",
+        "status",
+        "error",
+        "content",
+        "created_at",
+    )
+    exclude = ("payload",)
+
+    @admin.display(description="Content")
+    def content(self, obj: models.DeliveryLog) -> str:
+        """Return the decompressed content of the email."""
+        return payloads.load(obj.payload)["body"]
+
+
+@admin.register(models.ChangeLog)
+class ChangeLogAdmin(admin.ModelAdmin):
+    list_display = ("table_name", "object_id", "operation", "created_at")
+    list_filter = ("table_name", "operation")
+    readonly_fields = ("table_name", "object_id", "operation", "created_at")
@@ -21,3 +21,7 @@ class EmailSignalsConfig(AppConfig):
         from . import signals
 
         signals.setup()
+
+        # Connects the receivers which invalidate compiled templates and
+        # refresh the signals' dependencies on them.
+        from . import dependencies  # noqa: F401
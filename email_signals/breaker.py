@@ -0,0 +1,188 @@
+"""A circuit breaker around the email backend.
+
+When sending fails `EMAIL_SIGNAL_BREAKER_THRESHOLD` times in a row, the
+breaker opens and sends are rejected straight away, rather than each one
+waiting for the SMTP timeout, for `EMAIL_SIGNAL_BREAKER_COOLDOWN` seconds.
+After the cooldown the breaker is half open and lets a single send through
+to probe whether the backend has recovered. If it succeeds the breaker
+closes, otherwise it opens again.
+
+Only errors which show the backend is down or failing count as failures, see
+`delivery.is_backend_error()`, so a refused recipient or a broken template
+can't stop all mail. Emails sent by the outbox worker go through the same
+breaker.
+
+The breaker's state is held per process.
+"""
+
+import threading
+import time
+import typing as _t
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from . import delivery, metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a send is rejected because the circuit is open."""
+
+
+class CircuitBreaker:
+    """Tracks consecutive failures of a call and rejects calls whilst the
+    circuit is open.
+
+    Args:
+        threshold: The number of consecutive failures which opens the
+            circuit.
+        cooldown: Seconds to keep the circuit open before probing.
+        name: The name used for the breaker's metrics.
+        clock: Returns the current time in seconds.
+        is_failure: Returns `True` if an error raised by a call counts as a
+            failure. Other errors show the call got a response, so they are
+            recorded as a success. Defaults to counting every error.
+    """
+
+    def __init__(
+        self,
+        threshold: int = 5,
+        cooldown: float = 30,
+        name: str = "breaker",
+        clock: _t.Callable[[], float] = time.monotonic,
+        is_failure: _t.Callable[[BaseException], bool] = lambda error: True,
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.name = name
+        self.clock = clock
+        self.is_failure = is_failure
+        self.failures = 0
+        self.opened_at: _t.Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+        self._set_state(CLOSED)
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        metrics.set_value(f"{self.name}.state", state)
+
+    @property
+    def state(self) -> str:
+        """The current state of the circuit."""
+        with self._lock:
+            if (
+                self._state == OPEN
+                and self.clock() - self.opened_at >= self.cooldown
+            ):
+                self._set_state(HALF_OPEN)
+            return self._state
+
+    def allow(self) -> bool:
+        """Return `True` if a call may be made. Whilst half open, only a
+        single probing call is allowed at a time.
+        """
+        state = self.state
+        with self._lock:
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+        metrics.incr(f"{self.name}.rejected")
+        return False
+
+    def record_success(self) -> None:
+        """Record a successful call, closing the circuit."""
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self.opened_at = None
+            if self._state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit if the threshold has
+        been reached or if the call was probing a half open circuit.
+        """
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.threshold:
+                self._probing = False
+                self.opened_at = self.clock()
+                if self._state != OPEN:
+                    metrics.incr(f"{self.name}.opened")
+                self._set_state(OPEN)
+
+    def record(self, error: _t.Optional[BaseException]) -> None:
+        """Record the outcome of a call which raised `error`, or succeeded
+        if it is `None`.
+        """
+        if error is not None and self.is_failure(error):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def call(self, func: _t.Callable, *args, **kwargs) -> _t.Any:
+        """Call `func` through the breaker.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"The {self.name} circuit is open.")
+        try:
+            result = func(*args, **kwargs)
+        except Exception as error:
+            self.record(error)
+            raise
+        self.record_success()
+        return result
+
+
+_breaker: _t.Optional[CircuitBreaker] = None
+_breaker_lock = threading.Lock()
+
+
+def get_breaker() -> CircuitBreaker:
+    """Return the breaker which guards the email backend, configured with
+    `settings.EMAIL_SIGNAL_BREAKER_THRESHOLD` and
+    `settings.EMAIL_SIGNAL_BREAKER_COOLDOWN`.
+    """
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker(
+                threshold=getattr(
+                    settings, "EMAIL_SIGNAL_BREAKER_THRESHOLD", 5
+                ),
+                cooldown=getattr(
+                    settings, "EMAIL_SIGNAL_BREAKER_COOLDOWN", 30
+                ),
+                is_failure=delivery.is_backend_error,
+            )
+        return _breaker
+
+
+def reset_breaker() -> None:
+    """Discard the email backend's breaker so that it is recreated from the
+    current settings.
+    """
+    global _breaker
+    with _breaker_lock:
+        _breaker = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting: str, **kwargs) -> None:
+    """Recreate the breaker when its settings are overridden, e.g: in
+    tests.
+    """
+    if setting in (
+        "EMAIL_SIGNAL_BREAKER_THRESHOLD",
+        "EMAIL_SIGNAL_BREAKER_COOLDOWN",
+    ):
+        reset_breaker()
@@ -0,0 +1,156 @@
+"""Time budgets which stop a slow signal from holding up a `save()`.
+
+Two budgets can be configured, both in seconds:
+
+* `settings.EMAIL_SIGNAL_DISPATCH_BUDGET` bounds the time spent handling a
+  model signal. Once it has been used up, the remaining emails are queued in
+  the outbox rather than rendered and sent.
+* `settings.EMAIL_SIGNAL_RENDER_BUDGET` bounds the time spent rendering a
+  single email. Rendering is abandoned when it runs over, and the email is
+  queued in the outbox or, when `settings.EMAIL_SIGNAL_BUDGET_FALLBACK` is
+  `"drop"`, dropped.
+
+Rendering can not be interrupted, so templates check the deadline as they
+are rendered: Django templates on every `CHECK_EVERY` variable lookups and
+assignments and Jinja2 templates on every `CHECK_EVERY` chunks of output.
+Templates are rendered as usual when no budget is active, e.g: by the outbox
+worker.
+"""
+
+import contextlib
+import contextvars
+import time
+import typing as _t
+from django.conf import settings
+from django.template import Context
+
+DISPATCH = "dispatch"
+RENDER = "render"
+
+#: How often, in lookups or chunks of output, rendering checks the deadline.
+CHECK_EVERY = 64
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar(
+    "email_signals_deadline", default=None
+)
+
+
+class BudgetExceeded(Exception):
+    """Raised when rendering runs over its time budget.
+
+    Args:
+        kind: The budget which was exceeded, `DISPATCH` or `RENDER`.
+        seconds: The length of the budget.
+    """
+
+    def __init__(self, kind: str, seconds: float):
+        super().__init__(f"The {kind} budget of {seconds}s was exceeded.")
+        self.kind = kind
+        self.seconds = seconds
+
+
+def dispatch_budget() -> _t.Optional[float]:
+    """Return the time budget for handling a model signal, if any."""
+    return getattr(settings, "EMAIL_SIGNAL_DISPATCH_BUDGET", None)
+
+
+def render_budget() -> _t.Optional[float]:
+    """Return the time budget for rendering an email, if any."""
+    return getattr(settings, "EMAIL_SIGNAL_RENDER_BUDGET", None)
+
+
+@contextlib.contextmanager
+def budget(seconds: _t.Optional[float], kind: str):
+    """Set a deadline `seconds` from now for the code run in the block. An
+    enclosing budget with an earlier deadline is kept.
+
+    Args:
+        seconds: The length of the budget. If `None`, no budget is set.
+        kind: The name of the budget, `DISPATCH` or `RENDER`.
+    """
+    current = _deadline.get()
+    deadline = None if seconds is None else time.monotonic() + seconds
+    if deadline is None or (current is not None and current[0] <= deadline):
+        yield
+        return
+
+    token = _deadline.set((deadline, kind, seconds))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def active() -> bool:
+    """Return `True` if a budget has been set."""
+    return _deadline.get() is not None
+
+
+def exceeded() -> bool:
+    """Return `True` if the current budget has been used up."""
+    current = _deadline.get()
+    return current is not None and time.monotonic() > current[0]
+
+
+def check() -> None:
+    """Raise `BudgetExceeded` if the current budget has been used up."""
+    current = _deadline.get()
+    if current is not None and time.monotonic() > current[0]:
+        raise BudgetExceeded(current[1], current[2])
+
+
+class BudgetContext(Context):
+    """A template context which checks the deadline every `CHECK_EVERY`
+    variable lookups and assignments, e.g: on each iteration of a
+    `{% for %}` loop.
+    """
+
+    _calls = 0
+
+    def _tick(self) -> None:
+        self._calls += 1
+        if self._calls % CHECK_EVERY == 0:
+            check()
+
+    def __getitem__(self, key):
+        self._tick()
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        self._tick()
+        super().__setitem__(key, value)
+
+
+def render_django(template, context: _t.Optional[dict]) -> str:
+    """Render a template of Django's template engine, checking the deadline
+    if a budget has been set.
+
+    Args:
+        template: A template returned by a `DjangoTemplates` engine.
+        context: The context to render the template with.
+    """
+    if not active() or not hasattr(template, "template"):
+        return template.render(context)
+    return template.template.render(
+        BudgetContext(
+            context or {}, autoescape=template.template.engine.autoescape
+        )
+    )
+
+
+def render_jinja2(template, context: _t.Optional[dict]) -> str:
+    """Render a Jinja2 template, checking the deadline if a budget has been
+    set.
+
+    Args:
+        template: The Jinja2 template.
+        context: The context to render the template with.
+    """
+    if not active():
+        return template.render(context or {})
+    chunks = []
+    for index, chunk in enumerate(template.generate(context or {})):
+        if index % CHECK_EVERY == 0:
+            check()
+        chunks.append(chunk)
+    return "".join(chunks)
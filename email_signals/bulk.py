@@ -0,0 +1,271 @@
+"""Evaluates `post_save` signals for the rows changed by bulk operations.
+
+Django does not send model signals for `bulk_create()`, `bulk_update()` or
+`QuerySet.update()`. Models whose manager is an `EmailSignalManager` send a
+single `bulk_post_save` for the rows such an operation changed instead.
+
+Rather than loading every row and checking a signal's constraints one row
+at a time, the constraints which can be expressed as lookups are translated
+into a filter on the affected primary keys, so that the database only
+returns the rows which may match. The rows are loaded with the relations
+the signal's content uses and every constraint is still checked against
+each of them, so a signal matches exactly the rows it would have matched
+had they been saved one by one.
+
+Constraints are translated when the database gives the same answer as the
+constraint's comparison, e.g: `contains` on a text field, or `gt` on a
+numeric field. Regular expressions, truthiness and comparisons against
+other fields of the instance are only checked in Python, as are case
+insensitive comparisons against non-ASCII values on SQLite, which only
+folds the case of ASCII letters.
+"""
+
+import typing as _t
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, models, router
+from django.db.models import Model, Q
+from django.db.models.base import ModelBase
+from . import rehydration, rendering, snapshot, utils
+from .constraint_checker import ConstraintChecker
+from .models import Signal, SignalConstraint
+
+_TEXT_LOOKUPS = frozenset(
+    {
+        "iexact",
+        "contains",
+        "icontains",
+        "startswith",
+        "istartswith",
+        "endswith",
+        "iendswith",
+    }
+)
+_CASE_INSENSITIVE_LOOKUPS = frozenset(
+    {"iexact", "icontains", "istartswith", "iendswith"}
+)
+_NUMERIC_LOOKUPS = frozenset({"gt", "gte", "lt", "lte"})
+_NUMERIC_FIELDS = (models.IntegerField, models.FloatField, models.DecimalField)
+
+
+def summarise() -> bool:
+    """Return `True` if the rows matched by a bulk operation should be sent
+    as one summary email per signal and recipients rather than one email
+    each.
+    """
+    return getattr(settings, "EMAIL_SIGNAL_BULK_SUMMARY", False)
+
+
+def chunk_size() -> int:
+    """Return the number of primary keys to filter on per query."""
+    return getattr(settings, "EMAIL_SIGNAL_BULK_CHUNK_SIZE", 500)
+
+
+def _field(model: ModelBase, path: str) -> _t.Optional[models.Field]:
+    """Return the field a `param` path of a constraint ends at, following
+    foreign keys and one to one fields. `None` is returned if the path does
+    not end at a concrete field which is not a relation.
+    """
+    segments = path.split(".")
+    current = model
+    for index, segment in enumerate(segments):
+        try:
+            field = current._meta.get_field(segment)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete:
+            return None
+        if index == len(segments) - 1:
+            return None if field.is_relation else field
+        if not (field.many_to_one or field.one_to_one):
+            return None
+        current = field.related_model
+    return None
+
+
+def _folds_case(model: ModelBase, value: str) -> bool:
+    """Return `True` if the model's database folds the case of `value` as
+    `str.lower()` does. SQLite only folds the case of ASCII letters.
+    """
+    if value.isascii():
+        return True
+    return connections[router.db_for_read(model)].vendor != "sqlite"
+
+
+def _in_kwargs(param: str, signal_kwargs: dict) -> bool:
+    return utils.get_param_from_obj(param, signal_kwargs)[0]
+
+
+def _param_2(
+    model: ModelBase, param_2: _t.Optional[str], signal_kwargs: dict
+) -> _t.Tuple[bool, _t.Any]:
+    """Return the value of a constraint's `param_2`, resolved as
+    `ConstraintChecker` does, if it is the same for every row.
+
+    Returns:
+        `False` and `None` if `param_2` is a value of the instance,
+        otherwise `True` and the value.
+    """
+    if param_2 is None:
+        return True, None
+    found, value = utils.get_param_from_obj(param_2, signal_kwargs)
+    if found:
+        return True, value
+    if hasattr(model, param_2.split(".")[0]):
+        return False, None
+    return True, utils.convert_to_primitive(param_2)
+
+
+def constraint_filter(
+    model: ModelBase, constraint: SignalConstraint, signal_kwargs: dict
+) -> _t.Optional[Q]:
+    """Translate a constraint into a filter on the model.
+
+    Args:
+        model: The model the signal is for.
+        constraint: The constraint to translate.
+        signal_kwargs: The kwargs of the bulk operation.
+
+    Returns:
+        The filter, or `None` if the constraint can only be checked in
+        Python.
+    """
+    param_1, comparison = constraint.param_1, constraint.comparison
+    if _in_kwargs(param_1, signal_kwargs):
+        return None
+    field = _field(model, param_1)
+    if field is None:
+        return None
+    lookup = param_1.replace(".", "__")
+
+    if comparison in ("isnull", "isnotnull"):
+        if "__" in lookup:
+            # A missing related instance is not the same as a null value.
+            return None
+        return Q(**{f"{lookup}__isnull": comparison == "isnull"})
+
+    constant, value = _param_2(model, constraint.param_2, signal_kwargs)
+    if not constant:
+        return None
+    if comparison == "exact":
+        if value is None:
+            return None
+        return Q(**{lookup: value})
+    if comparison in _TEXT_LOOKUPS:
+        if not isinstance(value, str) or not isinstance(
+            field, (models.CharField, models.TextField)
+        ):
+            return None
+        if comparison in _CASE_INSENSITIVE_LOOKUPS and not _folds_case(
+            model, value
+        ):
+            return None
+        return Q(**{f"{lookup}__{comparison}": value})
+    if comparison in _NUMERIC_LOOKUPS:
+        if not isinstance(field, _NUMERIC_FIELDS) or isinstance(value, bool):
+            return None
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        return Q(**{f"{lookup}__{comparison}": value})
+    return None
+
+
+def _kwargs_match(
+    model: ModelBase,
+    constraints: _t.List[SignalConstraint],
+    signal_kwargs: dict,
+) -> bool:
+    """Check the constraints which only compare values which are the same
+    for every row, such as the kwargs of the bulk operation.
+    """
+    for constraint in constraints:
+        found, value = utils.get_param_from_obj(
+            constraint.param_1, signal_kwargs
+        )
+        if not found:
+            continue
+        constant, param_2 = _param_2(model, constraint.param_2, signal_kwargs)
+        if constant and not ConstraintChecker.check_constraint(
+            value, param_2, constraint.comparison
+        ):
+            return False
+    return True
+
+
+def candidates(
+    signal: Signal,
+    model: ModelBase,
+    constraints: _t.List[SignalConstraint],
+    signal_kwargs: dict,
+) -> _t.Optional[models.QuerySet]:
+    """Return a queryset of the rows of a model which may match a signal's
+    constraints, loading the relations the signal's content uses. Each row
+    must still be checked with `ConstraintChecker`.
+
+    Args:
+        signal: The signal to evaluate.
+        model: The model of the rows.
+        constraints: The signal's constraints.
+        signal_kwargs: The kwargs the constraints are checked with.
+
+    Returns:
+        The queryset, or `None` if no row can match as a constraint which
+        is the same for every row fails.
+    """
+    if not _kwargs_match(model, constraints, signal_kwargs):
+        return None
+
+    lookups = Q()
+    for constraint in constraints:
+        lookup = constraint_filter(model, constraint, signal_kwargs)
+        if lookup is not None:
+            lookups &= lookup
+    try:
+        paths = snapshot.signal_paths(signal)
+    except rendering.TEMPLATE_ERRORS:
+        paths = frozenset()
+    select_related, prefetch_related = rehydration.query_plan(model, paths)
+    queryset = model._base_manager.filter(lookups)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset
+
+
+def matches(
+    signal: Signal,
+    model: ModelBase,
+    pks: _t.List[_t.Any],
+    unsaved: _t.Iterable[Model],
+    signal_kwargs: dict,
+) -> _t.Iterator[Model]:
+    """Yield the rows changed by a bulk operation which match a signal's
+    constraints.
+
+    Args:
+        signal: The `post_save` signal to evaluate.
+        model: The model of the rows.
+        pks: The primary keys of the rows.
+        unsaved: Created instances whose primary keys are not known. They
+            are checked in Python.
+        signal_kwargs: The kwargs of the bulk operation.
+    """
+    constraints = list(signal.constraints.all())
+    queryset = candidates(signal, model, constraints, signal_kwargs)
+    if queryset is None:
+        return
+    queryset = queryset.order_by("pk")
+
+    size = chunk_size()
+    for start in range(0, len(pks), size):
+        end = start + size
+        for instance in queryset.filter(pk__in=pks[start:end]):
+            checker = ConstraintChecker(instance, constraints, signal_kwargs)
+            if checker.run_tests():
+                yield instance
+    for instance in unsaved:
+        if ConstraintChecker(instance, constraints, signal_kwargs).run_tests():
+            yield instance
@@ -0,0 +1,126 @@
+"""Batches the delete signals raised by a single cascading delete.
+
+Deleting a record can cascade to thousands of related rows, each of which
+raises `pre_delete` and `post_delete`. When
+`settings.EMAIL_SIGNAL_CASCADE_SUMMARY` is enabled, the delete signals
+raised by one `delete()` call (identified by the `origin` Django passes to
+the signals) are evaluated in a batch: the `Signal`s and constraints of each
+model are loaded once, each matching row is snapshotted, and the rows are
+grouped by signal and recipients. Once the delete has committed, a single
+summary email is sent per group, which renders the signal's content for each
+row, as a folded `digests` email does.
+
+Rows deleted directly, rather than by a cascade or a queryset, are evaluated
+as before. Django only passes `origin` from version 4.1, so deletes are not
+batched on older versions.
+"""
+
+import logging
+import typing as _t
+from functools import partial
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Model, signals
+from . import coalesce, digests, metrics
+from .constraint_checker import ConstraintChecker
+from .models import Signal
+
+logger = logging.getLogger(__name__)
+
+SendSummary = _t.Callable[[Signal, _t.List[str], dict], None]
+
+
+def enabled() -> bool:
+    """Return `True` if cascading deletes should be batched."""
+    return getattr(settings, "EMAIL_SIGNAL_CASCADE_SUMMARY", False)
+
+
+def _new_batch() -> dict:
+    return {"signals": {}, "groups": {}}
+
+
+def _model_signals(
+    batch: dict, instance: Model, signal: signals.ModelSignal
+) -> _t.List[_t.Tuple[Signal, list]]:
+    """Return the signals and constraints of an instance's model, loading
+    them once per batch.
+    """
+    model = type(instance)
+    if model not in batch["signals"]:
+        batch["signals"][model] = [
+            (model_signal, list(model_signal.constraints.all()))
+            for model_signal in Signal.get_for_model_and_signal(
+                instance, signal
+            )
+        ]
+    return batch["signals"][model]
+
+
+def collect(
+    instance: Model,
+    signal: signals.ModelSignal,
+    kwargs: dict,
+    send_summary: SendSummary,
+) -> bool:
+    """Evaluate a delete signal as part of the batch of its `delete()` call.
+
+    Args:
+        instance: The instance being deleted.
+        signal: `pre_delete` or `post_delete`.
+        kwargs: The kwargs retrieved from the signal handler.
+        send_summary: Sends a summary as `send_summary(signal, emails,
+            context)` once the delete has committed.
+
+    Returns:
+        `True` if the signal was batched, `False` if it should be evaluated
+        as usual.
+    """
+    if not enabled() or signal not in (
+        signals.pre_delete,
+        signals.post_delete,
+    ):
+        return False
+    origin = kwargs.get("origin")
+    if origin is None or origin is instance:
+        return False
+    using = kwargs.get("using") or router.db_for_write(type(instance))
+    if not transaction.get_connection(using).in_atomic_block:
+        return False
+
+    batch, _ = coalesce.attach(
+        using,
+        ("delete", id(origin), signal),
+        _new_batch,
+        partial(_flush, send_summary),
+    )
+    for model_signal, constraints in _model_signals(batch, instance, signal):
+        if not ConstraintChecker(instance, constraints, kwargs).run_tests():
+            continue
+        mailing_list = instance.email_signal_recipients(
+            model_signal.mailing_list
+        )
+        if model_signal.digest_interval:
+            digests.record(model_signal, mailing_list, instance, kwargs)
+        else:
+            digests.fold(
+                batch["groups"], model_signal, mailing_list, instance, kwargs
+            )
+    metrics.incr("cascade.collected")
+    return True
+
+
+def _flush(send_summary: SendSummary, batch: dict) -> None:
+    """Send a summary for each group of a batch once its delete has
+    committed.
+    """
+    for model_signal, emails, context in digests.folded(batch["groups"]):
+        try:
+            send_summary(model_signal, emails, context)
+        except Exception:
+            logger.exception(
+                "Failed to send the summary of %s deletes for signal %s.",
+                context["event_count"],
+                model_signal.pk,
+            )
+            continue
+        metrics.incr("cascade.summaries")
@@ -0,0 +1,409 @@
+"""Captures changes made outside of the ORM, e.g: by raw SQL or by other
+services, and evaluates the `post_save` signals for them away from the write
+path.
+
+Two modes can be chosen with `settings.EMAIL_SIGNAL_CHANGE_CAPTURE`:
+
+* `"triggers"`: database triggers, installed with `install()` on SQLite and
+  PostgreSQL, write the table, primary key and operation of every inserted
+  or updated row of a registered model to the `ChangeLog` table. The
+  `email_signals_changes` command drains it in batches, loads the rows with
+  one `in_bulk()` query per model and evaluates their signals.
+* `"polling"`: models with an `EMAIL_SIGNAL_UPDATED_FIELD` attribute naming
+  a datetime field which is set on every change, e.g: `updated_at`, are
+  scanned for rows changed since each signal's `Watermark`. Whether a row
+  was inserted or updated is unknown, so `created` is `None` and signals
+  with a constraint on `created` never match; a warning is logged when one
+  is polled.
+
+In either mode, `post_save` is no longer evaluated when the ORM saves a
+captured model, so that a change is only evaluated once. With triggers, a
+model is only captured once its triggers are installed, which each process
+checks in the database's catalogue at most once every
+`settings.EMAIL_SIGNAL_CHANGE_TRIGGER_POLL` seconds. Deleted rows
+cannot be loaded after the fact, so delete signals are still evaluated when
+they are raised.
+"""
+
+import datetime
+import logging
+import time
+import typing as _t
+from collections import defaultdict
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Model, signals
+from django.db.models.base import ModelBase
+from django.utils import timezone
+from . import absence, metrics, rehydration, rendering, snapshot, suppression
+from .models import ChangeLog, Signal
+
+logger = logging.getLogger(__name__)
+
+TRIGGERS = "triggers"
+POLLING = "polling"
+
+TRIGGER_NAME = "email_signals_capture"
+
+# The tables with triggers installed on each database and when they should
+# be read again.
+_installed: _t.Dict[str, _t.Tuple[_t.FrozenSet[str], float]] = {}
+
+_POSTGRESQL_FUNCTION = """
+CREATE OR REPLACE FUNCTION email_signals_capture() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO {changelog} (table_name, object_id, operation, created_at)
+    VALUES (
+        TG_TABLE_NAME, to_jsonb(NEW) ->> TG_ARGV[0], left(TG_OP, 1), now()
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def mode() -> _t.Optional[str]:
+    """Return the change capture mode, if any."""
+    return getattr(settings, "EMAIL_SIGNAL_CHANGE_CAPTURE", None)
+
+
+def poll_lag() -> float:
+    """Return how many seconds behind the current time polling scans, so
+    that rows changed by transactions which have not committed yet are not
+    skipped.
+    """
+    return getattr(settings, "EMAIL_SIGNAL_CHANGE_POLL_LAG", 5)
+
+
+def updated_field(model: ModelBase) -> _t.Optional[str]:
+    """Return the field polling scans a model in order of, if any."""
+    return getattr(model, "EMAIL_SIGNAL_UPDATED_FIELD", None)
+
+
+def trigger_poll_interval() -> float:
+    """Return how long, in seconds, a process may use the tables it last
+    read as having triggers installed.
+    """
+    return getattr(settings, "EMAIL_SIGNAL_CHANGE_TRIGGER_POLL", 60)
+
+
+def _read_installed(using: str) -> _t.FrozenSet[str]:
+    """Read the tables with triggers installed from the database's
+    catalogue. Databases without trigger support have none.
+    """
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        sql = (
+            "SELECT tbl_name FROM sqlite_master WHERE type = 'trigger' "
+            "AND name LIKE %s"
+        )
+        params = [f"{TRIGGER_NAME}_%"]
+    elif connection.vendor == "postgresql":
+        sql = (
+            "SELECT c.relname FROM pg_trigger t JOIN pg_class c "
+            "ON c.oid = t.tgrelid WHERE t.tgname = %s"
+        )
+        params = [TRIGGER_NAME]
+    else:
+        return frozenset()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return frozenset(row[0] for row in cursor.fetchall())
+
+
+def installed_tables(using: str = "default") -> _t.FrozenSet[str]:
+    """Return the tables of a database which have triggers installed."""
+    now = time.monotonic()
+    tables, expires = _installed.get(using, (frozenset(), 0.0))
+    if now >= expires:
+        tables = _read_installed(using)
+        _installed[using] = (tables, now + trigger_poll_interval())
+    return tables
+
+
+def captured(model: ModelBase) -> bool:
+    """Return `True` if changes to a model are captured, rather than
+    evaluated when the ORM saves them.
+    """
+    current = mode()
+    if current == TRIGGERS:
+        using = router.db_for_write(model)
+        return model._meta.db_table in installed_tables(using)
+    return current == POLLING and updated_field(model) is not None
+
+
+def _registered_models() -> _t.List[ModelBase]:
+    from .registry import registered_models
+
+    return list(registered_models.values())
+
+
+def trigger_sql(model: ModelBase, connection) -> _t.List[str]:
+    """Return the statements which install the triggers of a model.
+
+    Args:
+        model: The model to capture the changes of.
+        connection: The connection to a SQLite or PostgreSQL database.
+    """
+    vendor, quote = connection.vendor, connection.ops.quote_name
+    table = model._meta.db_table
+    pk = model._meta.pk.column
+    changelog = quote(ChangeLog._meta.db_table)
+    literal = table.replace("'", "''")
+    if vendor == "postgresql":
+        return [
+            _POSTGRESQL_FUNCTION.format(changelog=changelog),
+            f"DROP TRIGGER IF EXISTS {TRIGGER_NAME} ON {quote(table)}",
+            f"CREATE TRIGGER {TRIGGER_NAME} AFTER INSERT OR UPDATE ON "
+            f"{quote(table)} FOR EACH ROW EXECUTE PROCEDURE "
+            f"{TRIGGER_NAME}('{pk}')",
+        ]
+    if vendor == "sqlite":
+        return [
+            f"CREATE TRIGGER IF NOT EXISTS "
+            f"{quote(f'{TRIGGER_NAME}_{table}_{operation}')} AFTER "
+            f"{operation.upper()} ON {quote(table)} BEGIN INSERT INTO "
+            f"{changelog} (table_name, object_id, operation, created_at) "
+            f"VALUES ('{literal}', NEW.{quote(pk)}, '{operation[0].upper()}',"
+            f" CURRENT_TIMESTAMP); END"
+            for operation in ("insert", "update")
+        ]
+    raise NotImplementedError(
+        f"Change capture triggers are not supported on {vendor}."
+    )
+
+
+def drop_trigger_sql(model: ModelBase, connection) -> _t.List[str]:
+    """Return the statements which remove the triggers of a model."""
+    vendor, quote = connection.vendor, connection.ops.quote_name
+    table = model._meta.db_table
+    if vendor == "postgresql":
+        return [f"DROP TRIGGER IF EXISTS {TRIGGER_NAME} ON {quote(table)}"]
+    if vendor == "sqlite":
+        return [
+            f"DROP TRIGGER IF EXISTS "
+            f"{quote(f'{TRIGGER_NAME}_{table}_{operation}')}"
+            for operation in ("insert", "update")
+        ]
+    raise NotImplementedError(
+        f"Change capture triggers are not supported on {vendor}."
+    )
+
+
+def _execute(
+    statements: _t.Callable[[ModelBase, _t.Any], _t.List[str]],
+    models: _t.Optional[_t.Iterable[ModelBase]],
+    using: str,
+) -> None:
+    connection = connections[using]
+    try:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            for model in models or _registered_models():
+                for statement in statements(model, connection):
+                    cursor.execute(statement)
+    finally:
+        # Read the installed triggers again when they are next needed.
+        _installed.pop(using, None)
+
+
+def install(
+    models: _t.Optional[_t.Iterable[ModelBase]] = None, using: str = "default"
+) -> None:
+    """Install the triggers which capture changes.
+
+    Args:
+        models: The models to capture the changes of. Defaults to the
+            registered models.
+        using: The alias of the database to install the triggers on.
+    """
+    _execute(trigger_sql, models, using)
+
+
+def uninstall(
+    models: _t.Optional[_t.Iterable[ModelBase]] = None, using: str = "default"
+) -> None:
+    """Remove the triggers installed by `install()`.
+
+    Args:
+        models: The models to stop capturing the changes of. Defaults to the
+            registered models.
+        using: The alias of the database to remove the triggers from.
+    """
+    _execute(drop_trigger_sql, models, using)
+
+
+def _load(
+    model: ModelBase, object_ids: _t.Iterable[str], using: str
+) -> _t.Dict[_t.Any, Model]:
+    """Load the changed rows of a model with the relations its signals'
+    content uses.
+    """
+    paths = set()
+    for signal in Signal.get_for_model_and_signal(model, signals.post_save):
+        try:
+            paths |= snapshot.signal_paths(signal)
+        except rendering.TEMPLATE_ERRORS:
+            continue
+    select_related, prefetch_related = rehydration.query_plan(model, paths)
+    queryset = model._base_manager.using(using)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    pk_field = model._meta.pk
+    return queryset.in_bulk(
+        {pk_field.to_python(object_id) for object_id in object_ids}
+    )
+
+
+def _evaluate(instance: Model, signal_kwargs: dict) -> None:
+    from . import signals as email_signals
+
+    try:
+        email_signals.evaluate(instance, signals.post_save, signal_kwargs)
+    except Exception:
+        logger.exception(
+            "Failed to evaluate the captured change of %s %s.",
+            instance._meta.label,
+            instance.pk,
+        )
+
+
+def process_changelog(batch_size: int = 1000, using: str = "default") -> int:
+    """Drain a batch of the change log and evaluate the `post_save` signals
+    of the changed rows. Repeated changes of a row in the batch are
+    evaluated once.
+
+    Args:
+        batch_size: The maximum number of entries to drain.
+        using: The alias of the database the change log is on.
+
+    Returns:
+        The number of entries drained.
+    """
+    tables = {model._meta.db_table: model for model in _registered_models()}
+    with transaction.atomic(using=using):
+        entries = list(
+            ChangeLog.objects.using(using)
+            .select_for_update(skip_locked=True)
+            .order_by("pk")[:batch_size]
+        )
+        if not entries:
+            return 0
+        ChangeLog.objects.using(using).filter(
+            pk__in=[entry.pk for entry in entries]
+        ).delete()
+
+    # Whether each changed row was created, in the order it first changed.
+    changed = defaultdict(dict)
+    for entry in entries:
+        if entry.table_name not in tables:
+            continue
+        rows = changed[tables[entry.table_name]]
+        rows[entry.object_id] = (
+            rows.get(entry.object_id, False) or entry.operation == "I"
+        )
+
+    for model, rows in changed.items():
+        if suppression.model_suppressed(model, signals.post_save):
+            continue
+        instances = _load(model, rows, using)
+        pk_field = model._meta.pk
+        for object_id, created in rows.items():
+            instance = instances.get(pk_field.to_python(object_id))
+            if instance is None:
+                # Deleted since it was changed.
+                continue
+            _evaluate(
+                instance,
+                {
+                    "created": created,
+                    "update_fields": None,
+                    "raw": False,
+                    "using": using,
+                    "captured": True,
+                },
+            )
+    metrics.incr("changes.drained", len(entries))
+    return len(entries)
+
+
+def poll(
+    batch_size: int = 1000, now: _t.Optional[datetime.datetime] = None
+) -> int:
+    """Evaluate the `post_save` signals of the models with an
+    `EMAIL_SIGNAL_UPDATED_FIELD` for the rows changed since each signal's
+    watermark.
+
+    Args:
+        batch_size: The maximum number of rows to read at a time.
+        now: The time to scan up to, less `EMAIL_SIGNAL_CHANGE_POLL_LAG`
+            seconds. Defaults to now.
+
+    Returns:
+        The number of rows signals were evaluated for.
+    """
+    end = (now or timezone.now()) - datetime.timedelta(seconds=poll_lag())
+    signal_kwargs = {
+        "created": None,
+        "update_fields": None,
+        "raw": False,
+        "captured": True,
+    }
+    evaluated = 0
+    for model in _registered_models():
+        field = updated_field(model)
+        if field is None or suppression.model_suppressed(
+            model, signals.post_save
+        ):
+            continue
+        for signal in Signal.get_for_model_and_signal(
+            model, signals.post_save
+        ):
+            if signal.constraints.filter(param_1="created").exists():
+                logger.warning(
+                    "Signal %s has a constraint on created, which polled "
+                    "changes can't match.",
+                    signal.pk,
+                )
+            done = False
+            while not done:
+                matched, done = absence.scan_batch(
+                    signal, field, end, batch_size, signal_kwargs
+                )
+                for instance in matched:
+                    _dispatch(signal, instance, signal_kwargs)
+                evaluated += len(matched)
+    metrics.incr("changes.polled", evaluated)
+    return evaluated
+
+
+def _dispatch(signal: Signal, instance: Model, signal_kwargs: dict) -> None:
+    from . import signals as email_signals
+
+    try:
+        email_signals.dispatch_signal(signal, instance, signal_kwargs)
+    except Exception:
+        logger.exception(
+            "Failed to send signal %s for the change of %s %s.",
+            signal.pk,
+            instance._meta.label,
+            instance.pk,
+        )
+
+
+def process_changes(batch_size: int = 1000) -> int:
+    """Evaluate the captured changes of the configured mode.
+
+    Args:
+        batch_size: The maximum number of changes to read at a time.
+
+    Returns:
+        The number of changes processed.
+    """
+    current = mode()
+    if current == TRIGGERS:
+        return process_changelog(batch_size)
+    if current == POLLING:
+        return poll(batch_size)
+    return 0
@@ -0,0 +1,167 @@
+"""Coalesces repeated saves of the same instance within a transaction.
+
+When `settings.EMAIL_SIGNAL_COALESCE` is enabled, `post_save` signals raised
+inside a transaction are not evaluated straight away. They are keyed by the
+model and primary key of the instance and evaluated once, when the
+transaction commits, against the instance's final state. Saves after the
+first only replace the pending instance, so a checkout flow which saves an
+order six times checks the signals' constraints and sends emails once. If
+the transaction is rolled back, nothing is evaluated.
+"""
+
+import threading
+import typing as _t
+import weakref
+from functools import partial
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Model, signals
+from . import metrics
+
+_local = threading.local()
+
+Callback = _t.Callable[[Model, signals.ModelSignal, dict], None]
+
+
+def enabled() -> bool:
+    """Return `True` if `post_save` signals should be coalesced."""
+    return getattr(settings, "EMAIL_SIGNAL_COALESCE", False)
+
+
+class _Entry:
+    """A value waiting for its transaction to commit.
+
+    Only the entry's on-commit hook holds a strong reference to it. Django
+    discards the hooks of a transaction or savepoint which is rolled back,
+    which frees the entry and removes it from the registry.
+    """
+
+    __slots__ = ("value", "__weakref__")
+
+    def __init__(self, value: _t.Any):
+        self.value = value
+
+
+def _pending(using: str) -> _t.Dict[tuple, "weakref.ref[_Entry]"]:
+    """Return the entries waiting for this thread's transaction on a
+    database to commit.
+    """
+    registry = getattr(_local, "pending", None)
+    if registry is None:
+        registry = _local.pending = {}
+    return registry.setdefault(using, {})
+
+
+def _discard(using: str, key: tuple, ref: "weakref.ref[_Entry]") -> None:
+    """Remove an entry from the registry, unless it has been replaced."""
+    pending = _pending(using)
+    if pending.get(key) is ref:
+        del pending[key]
+
+
+def attach(
+    using: str,
+    key: tuple,
+    create: _t.Callable[[], _t.Any],
+    flush: _t.Callable[[_t.Any], None],
+) -> _t.Tuple[_t.Any, bool]:
+    """Return a value which lives until the current transaction commits,
+    creating it if this is the first time `key` is used in the transaction.
+
+    Args:
+        using: The alias of the database the transaction is on.
+        key: Identifies the value within the transaction.
+        create: Creates the value.
+        flush: Called with the value once the transaction commits.
+
+    Returns:
+        A `(value, created)` tuple.
+    """
+    pending = _pending(using)
+    ref = pending.get(key)
+    entry = ref() if ref is not None else None
+    if entry is not None:
+        return entry.value, False
+
+    # Either the first use of the key in this transaction or the previous
+    # one was rolled back.
+    entry = _Entry(create())
+    pending[key] = weakref.ref(entry, lambda ref: _discard(using, key, ref))
+    transaction.on_commit(
+        partial(_flush, using, key, entry, flush), using=using
+    )
+    return entry.value, True
+
+
+def _flush(
+    using: str,
+    key: tuple,
+    entry: _Entry,
+    flush: _t.Callable[[_t.Any], None],
+) -> None:
+    """Flush a value once its transaction has committed."""
+    pending = _pending(using)
+    ref = pending.get(key)
+    if ref is not None and ref() is entry:
+        del pending[key]
+    flush(entry.value)
+
+
+def _merge(previous: dict, kwargs: dict) -> dict:
+    """Merge the kwargs of a save into those of an earlier save of the same
+    instance.
+    """
+    merged = dict(kwargs)
+    merged["created"] = previous.get("created") or kwargs.get("created")
+    update_fields = previous.get("update_fields")
+    if update_fields is None or kwargs.get("update_fields") is None:
+        merged["update_fields"] = None
+    else:
+        merged["update_fields"] = frozenset(update_fields) | frozenset(
+            kwargs["update_fields"]
+        )
+    return merged
+
+
+def _evaluate(state: dict) -> None:
+    """Evaluate a coalesced signal once its transaction has committed."""
+    state["callback"](state["instance"], state["signal"], state["kwargs"])
+
+
+def defer(
+    instance: Model,
+    signal: signals.ModelSignal,
+    kwargs: dict,
+    callback: Callback,
+) -> bool:
+    """Defer a signal until its transaction commits, merging it with any
+    pending signal for the same instance.
+
+    Args:
+        instance: The instance which was saved.
+        signal: The signal which was raised.
+        kwargs: The kwargs retrieved from the signal handler.
+        callback: Evaluates the signal as `callback(instance, signal,
+            kwargs)` once the transaction commits.
+
+    Returns:
+        `True` if the signal was deferred, `False` if it should be
+        evaluated now.
+    """
+    if not enabled() or signal is not signals.post_save or instance.pk is None:
+        return False
+    using = kwargs.get("using") or router.db_for_write(type(instance))
+    if not transaction.get_connection(using).in_atomic_block:
+        return False
+
+    state, created = attach(
+        using, ("save", instance._meta.label, instance.pk), dict, _evaluate
+    )
+    if created:
+        metrics.incr("coalesce.deferred")
+        state.update(signal=signal, kwargs=kwargs, callback=callback)
+    else:
+        metrics.incr("coalesce.merged")
+        state["kwargs"] = _merge(state["kwargs"], kwargs)
+    state["instance"] = instance
+    return True
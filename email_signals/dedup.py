@@ -0,0 +1,100 @@
+"""Suppresses identical emails sent within a signal's dedup window.
+
+An email is identified by the signal, the instance's primary key, its
+recipients and, when the signal's `dedup_by_content` is set, a hash of the
+context values its content uses. Keys are added to Django's cache with
+`add()`, which is atomic, so only the first of several identical emails
+within the window is sent, whichever process raises it. Recipients are
+checked a chunk at a time before anything is rendered, so that large
+mailing lists are still streamed.
+"""
+
+import hashlib
+import itertools
+import json
+import typing as _t
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Model
+from . import metrics, recipients, snapshot
+
+
+def _cache():
+    return caches[getattr(settings, "EMAIL_SIGNAL_DEDUP_CACHE", "default")]
+
+
+def content_hash(signal, instance: Model, signal_kwargs: dict) -> str:
+    """Return a hash of the context values a signal's content uses."""
+    context = snapshot.snapshot_context(signal, instance, signal_kwargs)
+    data = json.dumps(context, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def key(
+    signal, instance: Model, emails: _t.Iterable[str], content: str = ""
+) -> str:
+    """Return the cache key of an email.
+
+    Args:
+        signal: The signal the email is for.
+        instance: The model instance the signal was raised for.
+        emails: The email's recipients. Their order does not matter.
+        content: A hash of the email's context, if it is part of the key.
+    """
+    parts = [str(signal.pk), str(instance.pk), content]
+    parts.extend(sorted(email.lower() for email in emails))
+    digest = hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+    return f"email_signals:dedup:{digest}"
+
+
+def filter_duplicates(
+    signal,
+    instance: Model,
+    signal_kwargs: dict,
+    mailing_list: _t.Iterable[_t.Any],
+) -> _t.Iterable[_t.Any]:
+    """Leave out the recipients who have been sent the same email within the
+    signal's dedup window.
+
+    Args:
+        signal: The signal being dispatched.
+        instance: The model instance the signal was raised for.
+        signal_kwargs: The kwargs retrieved from the signal handler.
+        mailing_list: The recipients, as returned by the mailing list.
+
+    Returns:
+        The recipients who have not been sent the email. `mailing_list` is
+        returned as is if the signal has no dedup window or the instance
+        has not been saved.
+    """
+    if not signal.dedup_window or instance.pk is None:
+        return mailing_list
+    content = ""
+    if signal.dedup_by_content:
+        content = content_hash(signal, instance, signal_kwargs)
+    return _filter_duplicates(signal, instance, content, mailing_list)
+
+
+def _filter_duplicates(
+    signal, instance: Model, content: str, mailing_list: _t.Iterable[_t.Any]
+) -> _t.Iterator[_t.Any]:
+    cache = _cache()
+    entries = recipients.iter_entries(mailing_list)
+    sent = False
+    while True:
+        chunk = list(itertools.islice(entries, recipients.chunk_size()))
+        if not chunk:
+            break
+        emails = [email for email, _ in chunk]
+        if cache.add(
+            key(signal, instance, emails, content), 1, signal.dedup_window
+        ):
+            sent = True
+            for _, recipient in chunk:
+                yield recipient
+            continue
+        metrics.incr("dedup.sends_avoided", len(chunk))
+        if signal.personalised:
+            metrics.incr("dedup.renders_avoided", len(chunk))
+    if not sent and not signal.personalised:
+        metrics.incr("dedup.renders_avoided")
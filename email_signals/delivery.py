@@ -0,0 +1,374 @@
+"""Delivery of rendered email messages with a per message result.
+
+The asynchronous engine keeps a fixed number of SMTP sessions open and sends
+messages over them one after the other, so that a high latency relay costs
+one connection set up per session rather than one per message. It requires
+the optional `aiosmtplib` dependency
+(`pip install django-email-signals[async]`). `deliver_sync` provides the same
+results using Django's configured email backend.
+"""
+
+import asyncio
+import contextlib
+import smtplib
+import typing as _t
+from collections import defaultdict
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage, get_connection
+
+try:
+    import aiosmtplib
+except ImportError:  # pragma: no cover
+    aiosmtplib = None
+
+
+class DeliveryResult(_t.NamedTuple):
+    """The outcome of delivering a single message.
+
+    Attributes:
+        message: The message that was delivered.
+        ok: `True` if the relay accepted the message for at least one
+            recipient.
+        error: The exception raised while delivering the message, if any.
+        temporary: `True` if the failure is worth retrying (4xx responses,
+            timeouts and dropped connections).
+        refused: Recipients that were refused by the relay mapped to the
+            relay's response.
+    """
+
+    message: EmailMessage
+    ok: bool
+    error: _t.Optional[BaseException] = None
+    temporary: bool = False
+    refused: _t.Dict[str, str] = {}
+
+
+def is_temporary_error(error: BaseException) -> bool:
+    """Check if a delivery error is transient and the message should be
+    retried later.
+
+    Args:
+        error: The exception raised while delivering a message.
+
+    Returns:
+        True if the error is transient.
+    """
+    if aiosmtplib is not None:
+        if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+            return all(
+                400 <= refused.code < 500 for refused in error.recipients
+            )
+        if isinstance(error, aiosmtplib.SMTPResponseException):
+            return 400 <= error.code < 500
+        if isinstance(
+            error,
+            (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPTimeoutError),
+        ):
+            return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, (OSError, asyncio.TimeoutError))
+
+
+def is_backend_error(error: BaseException) -> bool:
+    """Check if a delivery error shows that the relay is down or failing,
+    rather than that a message or one of its recipients was rejected.
+
+    Args:
+        error: The exception raised while delivering a message.
+
+    Returns:
+        True for connection errors, timeouts and 4xx or 5xx responses to the
+        session. False for refused recipients and errors which did not come
+        from the relay, e.g: a template error.
+    """
+    if aiosmtplib is not None:
+        if isinstance(
+            error,
+            (
+                aiosmtplib.SMTPRecipientsRefused,
+                aiosmtplib.SMTPRecipientRefused,
+            ),
+        ):
+            return False
+        if isinstance(
+            error,
+            (
+                aiosmtplib.SMTPResponseException,
+                aiosmtplib.SMTPServerDisconnected,
+                aiosmtplib.SMTPConnectError,
+                aiosmtplib.SMTPTimeoutError,
+            ),
+        ):
+            return True
+    # `smtplib`'s errors are subclasses of `OSError`, so recipients refused
+    # by the relay have to be ruled out first.
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+    return isinstance(error, (OSError, asyncio.TimeoutError))
+
+
+def message_domains(message: EmailMessage) -> _t.List[str]:
+    """Return the sorted, unique recipient domains of a message.
+
+    Args:
+        message: The message to get the domains for.
+
+    Returns:
+        The domains the message will be delivered to.
+    """
+    return sorted(
+        {
+            recipient.rpartition("@")[2].lower()
+            for recipient in message.recipients()
+        }
+    )
+
+
+class AsyncDeliveryEngine:
+    """Delivers messages over a pool of concurrent SMTP sessions.
+
+    Every session is a long lived connection to the relay which sends queued
+    messages back to back. Connection settings default to Django's `EMAIL_*`
+    settings.
+    """
+
+    def __init__(
+        self,
+        host: _t.Optional[str] = None,
+        port: _t.Optional[int] = None,
+        username: _t.Optional[str] = None,
+        password: _t.Optional[str] = None,
+        use_tls: _t.Optional[bool] = None,
+        use_ssl: _t.Optional[bool] = None,
+        timeout: _t.Optional[float] = None,
+        sessions: _t.Optional[int] = None,
+        per_domain_limit: _t.Optional[int] = None,
+    ):
+        """Initialise the engine.
+
+        Args:
+            host: The SMTP relay host. Defaults to `settings.EMAIL_HOST`.
+            port: The SMTP relay port. Defaults to `settings.EMAIL_PORT`.
+            username: Defaults to `settings.EMAIL_HOST_USER`.
+            password: Defaults to `settings.EMAIL_HOST_PASSWORD`.
+            use_tls: Upgrade the connection with STARTTLS. Defaults to
+                `settings.EMAIL_USE_TLS`.
+            use_ssl: Use an implicit TLS connection. Defaults to
+                `settings.EMAIL_USE_SSL`.
+            timeout: Timeout in seconds for each SMTP operation. Defaults to
+                `settings.EMAIL_TIMEOUT`.
+            sessions: The number of concurrent SMTP sessions. Defaults to
+                `settings.EMAIL_SIGNAL_SMTP_SESSIONS` or 8.
+            per_domain_limit: The maximum number of messages being delivered
+                to any one recipient domain at the same time. Defaults to
+                `settings.EMAIL_SIGNAL_SMTP_PER_DOMAIN_LIMIT` or 4.
+        """
+        if aiosmtplib is None:
+            raise ImproperlyConfigured(
+                "`aiosmtplib` is required to use the asynchronous delivery "
+                "engine. Install it with `pip install aiosmtplib`."
+            )
+
+        self.host = host or settings.EMAIL_HOST
+        self.port = port or settings.EMAIL_PORT
+        self.username = (
+            settings.EMAIL_HOST_USER if username is None else username
+        )
+        self.password = (
+            settings.EMAIL_HOST_PASSWORD if password is None else password
+        )
+        self.use_tls = settings.EMAIL_USE_TLS if use_tls is None else use_tls
+        self.use_ssl = settings.EMAIL_USE_SSL if use_ssl is None else use_ssl
+        self.timeout = settings.EMAIL_TIMEOUT if timeout is None else timeout
+        self.sessions = sessions or getattr(
+            settings, "EMAIL_SIGNAL_SMTP_SESSIONS", 8
+        )
+        self.per_domain_limit = per_domain_limit or getattr(
+            settings, "EMAIL_SIGNAL_SMTP_PER_DOMAIN_LIMIT", 4
+        )
+
+    def _client(self) -> "aiosmtplib.SMTP":
+        """Return a new, unconnected SMTP client."""
+        return aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            username=self.username or None,
+            password=self.password or None,
+            use_tls=self.use_ssl,
+            start_tls=self.use_tls,
+            timeout=self.timeout,
+        )
+
+    async def send_messages(
+        self, messages: _t.Iterable[EmailMessage]
+    ) -> _t.List[DeliveryResult]:
+        """Deliver `messages` over the session pool.
+
+        Args:
+            messages: The messages to deliver.
+
+        Returns:
+            A result for each message, in the same order as `messages`.
+        """
+        messages = list(messages)
+        results: _t.List[_t.Optional[DeliveryResult]] = [None] * len(messages)
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in enumerate(messages):
+            queue.put_nowait(item)
+
+        domain_limits = defaultdict(
+            lambda: asyncio.Semaphore(self.per_domain_limit)
+        )
+        await asyncio.gather(
+            *(
+                self._session(queue, results, domain_limits)
+                for _ in range(min(self.sessions, len(messages)))
+            )
+        )
+        return results
+
+    async def _session(
+        self,
+        queue: asyncio.Queue,
+        results: _t.List[_t.Optional[DeliveryResult]],
+        domain_limits: _t.Dict[str, asyncio.Semaphore],
+    ) -> None:
+        """Take messages off the queue and deliver them over a single SMTP
+        session until the queue is empty. The session is re-established if
+        the relay drops the connection.
+        """
+        client = None
+        try:
+            while True:
+                try:
+                    index, message = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                async with contextlib.AsyncExitStack() as stack:
+                    # Domains are acquired in sorted order so that two
+                    # sessions can never wait on each other.
+                    for domain in message_domains(message):
+                        await stack.enter_async_context(domain_limits[domain])
+                    try:
+                        if client is None or not client.is_connected:
+                            client = self._client()
+                            await client.connect()
+                        results[index] = await self._deliver(client, message)
+                    except Exception as error:
+                        results[index] = DeliveryResult(
+                            message=message,
+                            ok=False,
+                            error=error,
+                            temporary=is_temporary_error(error),
+                        )
+                        if isinstance(
+                            error,
+                            (
+                                aiosmtplib.SMTPServerDisconnected,
+                                aiosmtplib.SMTPTimeoutError,
+                                OSError,
+                            ),
+                        ):
+                            client = None
+                        elif client is not None and client.is_connected:
+                            # Reset the transaction so that the next message
+                            # starts from a clean state.
+                            with contextlib.suppress(Exception):
+                                await client.rset()
+        finally:
+            if client is not None and client.is_connected:
+                with contextlib.suppress(Exception):
+                    await client.quit()
+
+    @staticmethod
+    async def _deliver(
+        client: "aiosmtplib.SMTP", message: EmailMessage
+    ) -> DeliveryResult:
+        """Send a single message over an open session."""
+        refused, _ = await client.send_message(
+            message.message(),
+            sender=message.from_email,
+            recipients=message.recipients(),
+        )
+        return DeliveryResult(
+            message=message,
+            ok=True,
+            refused={
+                recipient: response.message
+                for recipient, response in refused.items()
+            },
+        )
+
+
+def deliver(
+    messages: _t.Iterable[EmailMessage], **engine_kwargs
+) -> _t.List[DeliveryResult]:
+    """Synchronous entry point to the delivery engine, for use by code which
+    is not running in an event loop.
+
+    Args:
+        messages: The messages to deliver.
+        engine_kwargs: Keyword arguments passed to `AsyncDeliveryEngine`.
+
+    Returns:
+        A result for each message, in the same order as `messages`.
+    """
+    engine = AsyncDeliveryEngine(**engine_kwargs)
+    return asyncio.run(engine.send_messages(messages))
+
+
+def deliver_sync(
+    messages: _t.Iterable[EmailMessage], connection=None
+) -> _t.List[DeliveryResult]:
+    """Deliver `messages` one at a time over a single connection of Django's
+    configured email backend.
+
+    Args:
+        messages: The messages to deliver.
+        connection: The email backend connection to use. Defaults to a new
+            connection to the configured backend.
+
+    Returns:
+        A result for each message, in the same order as `messages`.
+    """
+    messages = list(messages)
+    connection = connection or get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        return [
+            DeliveryResult(
+                message=message,
+                ok=False,
+                error=error,
+                temporary=is_temporary_error(error),
+            )
+            for message in messages
+        ]
+
+    results = []
+    try:
+        for message in messages:
+            try:
+                sent = connection.send_messages([message])
+            except Exception as error:
+                results.append(
+                    DeliveryResult(
+                        message=message,
+                        ok=False,
+                        error=error,
+                        temporary=is_temporary_error(error),
+                    )
+                )
+            else:
+                results.append(DeliveryResult(message=message, ok=bool(sent)))
+    finally:
+        connection.close()
+    return results
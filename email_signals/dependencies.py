@@ -0,0 +1,138 @@
+"""Works out which context paths and templates a signal's content depends
+on, so that they can be stored on the signal when it is saved.
+
+The stored paths are used to plan the queries which load the instances of
+queued emails and to take snapshots, without parsing the content again. The
+stored template names are used to refresh the dependencies of the signals
+which include, extend or render a stored `EmailTemplate` as a fragment when
+it is changed.
+"""
+
+import typing as _t
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db.models.base import ModelBase
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from . import loaders, rehydration, rendering, snapshot
+from .models import EmailTemplate, Signal
+
+# The `Signal` fields the dependencies are worked out from.
+CONTENT_FIELDS = ("plain_message", "html_message", "template", "render_engine")
+
+# Methods of a manager or queryset which return a single instance.
+_SINGLE_INSTANCE = ("first", "last", "get", "earliest", "latest")
+
+
+def compute(signal: Signal) -> _t.Optional[dict]:
+    """Return the dependencies of a signal's content.
+
+    Args:
+        signal: The `Signal` instance.
+
+    Returns:
+        A dict with the sorted `paths` and `templates` the content depends
+        on, or `None` if the content cannot be parsed, in which case the
+        content is parsed when it is rendered.
+    """
+    try:
+        return snapshot.signal_dependencies(signal)
+    except rendering.TEMPLATE_ERRORS + (ImproperlyConfigured,):
+        return None
+
+
+def resolves(model: ModelBase, path: str) -> bool:
+    """Check whether an `instance` path can be resolved against a model.
+
+    Relations are followed from model to model. Once a path reaches a field
+    or an attribute which is not a relation, the rest of it cannot be
+    checked and is assumed to resolve.
+
+    Args:
+        model: The model of the signal's instance.
+        path: A context path, e.g: `instance.customer.name`. Paths which do
+            not start with `instance` always resolve.
+
+    Returns:
+        Whether the path resolves.
+    """
+    segments = path.split(".")
+    if segments[0] != "instance":
+        return True
+
+    current, many = model, False
+    for segment in segments[1:]:
+        if many:
+            # `current` is a manager or queryset of related instances.
+            if segment == snapshot.ITEMS or segment.isdigit():
+                many = False
+            elif segment in _SINGLE_INSTANCE:
+                many = False
+            elif segment != "all":
+                manager = current._default_manager
+                return hasattr(manager, segment)
+            continue
+
+        field = rehydration._relations(current).get(segment)
+        if field is None:
+            return hasattr(current, segment)
+        current = field.related_model
+        many = field.many_to_many or field.one_to_many
+    return True
+
+
+def invalid_paths(model: ModelBase, paths: _t.Iterable[str]) -> _t.List[str]:
+    """Return the `instance` paths which cannot be resolved against a model.
+
+    Args:
+        model: The model of the signal's instance.
+        paths: Context paths, e.g: `instance.customer.name`.
+
+    Returns:
+        The sorted paths which do not resolve.
+    """
+    return sorted(path for path in paths if not resolves(model, path))
+
+
+def refresh(template_name: str) -> int:
+    """Work out the dependencies of the signals which depend on a template
+    again.
+
+    Args:
+        template_name: The name of the template which has changed.
+
+    Returns:
+        The number of signals which were updated.
+    """
+    updated = 0
+    signals = Signal.objects.exclude(template_dependencies=None)
+    for signal in signals.iterator():
+        if template_name not in signal.template_dependencies["templates"]:
+            continue
+        Signal.objects.filter(pk=signal.pk).update(
+            template_dependencies=compute(signal)
+        )
+        updated += 1
+    return updated
+
+
+@receiver(post_save, sender=EmailTemplate)
+@receiver(post_delete, sender=EmailTemplate)
+def _refresh_on_change(instance: EmailTemplate, **kwargs) -> None:
+    """Discard compiled templates and work out the dependencies of the
+    signals which use a template again when it is changed.
+
+    Both are done by this one receiver, as the dependencies are worked out
+    from the compiled templates, which must therefore be discarded first
+    whatever order the receivers were connected in.
+    """
+    loaders.invalidate()
+    snapshot.source_dependencies.cache_clear()
+    refresh(instance.name)
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting: str, **kwargs) -> None:
+    """Discard the parsed dependencies when the template settings change."""
+    if setting == "TEMPLATES":
+        snapshot.source_dependencies.cache_clear()
@@ -0,0 +1,281 @@
+"""Digest delivery of signal emails.
+
+Signals with a `digest_interval` do not send an email each time they match.
+Instead, a compact snapshot of each match is added to a `Digest` for each
+recipient and the current window, and the `email_signals_worker` command
+queues each digest in the outbox, where it is rendered and sent, once its
+window has closed.
+
+The content of a digest signal loops over the matches::
+
+    {% for event in events %}
+        {{ event.instance.order_number }}: {{ event.instance.total }}
+    {% endfor %}
+    {% if omitted %}And {{ omitted }} more.{% endif %}
+
+Signals without a `digest_interval` can also have emails folded into a
+digest, e.g: when they are over a `ratelimit`. Their digests are collected
+over `settings.EMAIL_SIGNAL_DIGEST_FOLD_INTERVAL` minutes and each event is
+rendered with the signal's content and joined into a single email.
+
+At most `settings.EMAIL_SIGNAL_DIGEST_MAX_EVENTS` events are kept per
+digest. Later events are only counted, so that an open digest takes a
+bounded amount of storage and is rendered with a bounded amount of memory.
+"""
+
+import datetime
+import json
+import typing as _t
+from collections import defaultdict
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import connection, transaction
+from django.db.models import Model
+from django.utils import timezone
+from . import emailer, metrics, recipients, snapshot
+from .models import Digest, OutboxEmail, Signal
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def max_events() -> int:
+    """Return the maximum number of events kept per digest."""
+    return getattr(settings, "EMAIL_SIGNAL_DIGEST_MAX_EVENTS", 100)
+
+
+def interval(signal: Signal) -> int:
+    """Return the number of minutes a signal's digests are collected for."""
+    return signal.digest_interval or getattr(
+        settings, "EMAIL_SIGNAL_DIGEST_FOLD_INTERVAL", 60
+    )
+
+
+def window(
+    signal: Signal, now: _t.Optional[datetime.datetime] = None
+) -> _t.Tuple[datetime.datetime, datetime.datetime]:
+    """Return the start and end of a digest signal's current window. Windows
+    are aligned to the signal's interval, so that every process adds the
+    events of a window to the same digest.
+
+    Args:
+        signal: The digest signal.
+        now: The time to find the window of. Defaults to now.
+
+    Returns:
+        The start and end of the window.
+    """
+    now = now or timezone.now()
+    epoch = _EPOCH if timezone.is_aware(now) else _EPOCH.replace(tzinfo=None)
+    length = datetime.timedelta(minutes=interval(signal))
+    start = now - (now - epoch) % length
+    return start, start + length
+
+
+def record(
+    signal: Signal,
+    mailing_list: _t.Iterable[_t.Any],
+    instance: Model,
+    signal_kwargs: dict,
+) -> int:
+    """Add an event to the current digest of each recipient. Events of
+    signals without a `digest_interval` are folded into a digest.
+
+    Args:
+        signal: The digest signal which was raised.
+        mailing_list: The recipients, as returned by the mailing list.
+        instance: The model instance the signal was raised for.
+        signal_kwargs: The kwargs retrieved from the signal handler.
+
+    Returns:
+        The number of digests the event was added to.
+    """
+    if signal.digest_interval:
+        event = snapshot.take_snapshot(
+            snapshot.event_paths(signal),
+            {"instance": instance, "signal_kwargs": signal_kwargs},
+        )
+    else:
+        event = snapshot.snapshot_context(signal, instance, signal_kwargs)
+    start, end = window(signal)
+    limit = max_events()
+    recorded = 0
+    for chunk in recipients.chunked(mailing_list):
+        with transaction.atomic():
+            Digest.objects.bulk_create(
+                [
+                    Digest(
+                        signal=signal,
+                        recipient=email,
+                        window_start=start,
+                        send_at=end,
+                    )
+                    for email in chunk
+                ],
+                ignore_conflicts=True,
+            )
+            digests = list(
+                Digest.objects.select_for_update().filter(
+                    signal=signal, window_start=start, recipient__in=chunk
+                )
+            )
+            for digest in digests:
+                if len(digest.events) < limit:
+                    digest.events.append(event)
+                digest.event_count += 1
+            Digest.objects.bulk_update(digests, ["events", "event_count"])
+        recorded += len(digests)
+    metrics.incr("digests.events", recorded)
+    return recorded
+
+
+def fold(
+    groups: dict,
+    signal: Signal,
+    mailing_list: _t.Iterable[_t.Any],
+    instance: Model,
+    signal_kwargs: dict,
+) -> None:
+    """Add an event to a group of events held in memory and sent as a
+    single folded email to the same recipients, see `folded()`.
+
+    Args:
+        groups: The groups, keyed by signal and recipients.
+        signal: The signal which was raised.
+        mailing_list: The recipients, as returned by the mailing list.
+        instance: The model instance the signal was raised for.
+        signal_kwargs: The kwargs retrieved from the signal handler.
+    """
+    emails = tuple(sorted(set(recipients.iter_recipients(mailing_list))))
+    group = groups.setdefault(
+        (signal.pk, emails),
+        {"signal": signal, "emails": emails, "events": [], "count": 0},
+    )
+    group["count"] += 1
+    if len(group["events"]) < max_events():
+        # Snapshotted now, as the instance may change or be deleted before
+        # the group is sent.
+        group["events"].append(
+            snapshot.snapshot_context(signal, instance, signal_kwargs)
+        )
+
+
+def folded(
+    groups: dict,
+) -> _t.Iterator[_t.Tuple[Signal, _t.List[str], dict]]:
+    """Yield the signal, recipients and the snapshot of the context of the
+    folded email of each group of events collected with `fold()`.
+    """
+    for group in groups.values():
+        yield group["signal"], list(group["emails"]), {
+            snapshot.EVENTS: group["events"],
+            "event_count": group["count"],
+            "omitted": group["count"] - len(group["events"]),
+        }
+
+
+def _context(digest: Digest) -> dict:
+    """Return the snapshot of the context a digest is rendered with."""
+    return {
+        snapshot.EVENTS: digest.events,
+        "event_count": digest.event_count,
+        "omitted": digest.event_count - len(digest.events),
+        "window_start": snapshot.encode_value(digest.window_start),
+        "window_end": snapshot.encode_value(digest.send_at),
+    }
+
+
+def build_folded(
+    signal: Signal, context: dict, recipient_list: _t.List[str]
+) -> EmailMultiAlternatives:
+    """Render a folded digest by rendering each event with the signal's
+    content and joining them into a single email.
+
+    Args:
+        signal: The signal the events were folded for.
+        context: The loaded context of the digest.
+        recipient_list: The email addresses to send the email to.
+
+    Returns:
+        The email message ready to be sent.
+    """
+    # Every event may have been omitted, e.g: when
+    # `settings.EMAIL_SIGNAL_DIGEST_MAX_EVENTS` is 0.
+    message = emailer.build_email(
+        subject=signal.subject,
+        recipient_list=recipient_list,
+        plain_message="",
+        from_email=signal.from_email,
+    )
+    bodies, html_bodies = [], []
+    for event in context[snapshot.EVENTS]:
+        if "recipient" in context:
+            event = {**event, "recipient": context["recipient"]}
+        rendered = emailer.build_email(
+            subject=signal.subject,
+            recipient_list=recipient_list,
+            plain_message=signal.plain_message,
+            html_message=signal.get_html_message(),
+            from_email=signal.from_email,
+            template=signal.template,
+            context=event,
+            signal_id=signal.pk,
+            render_engine=signal.render_engine,
+        )
+        bodies.append(rendered.body)
+        html_bodies.extend(content for content, _ in rendered.alternatives)
+    if context["omitted"]:
+        bodies.append(f"And {context['omitted']} more.")
+        html_bodies.append(f"<p>And {context['omitted']} more.</p>")
+
+    message.body = "\n\n".join(bodies)
+    message.alternatives = []
+    if html_bodies:
+        message.attach_alternative("<hr>".join(html_bodies), "text/html")
+    return message
+
+
+def process_digests(batch_size: int = 100) -> int:
+    """Queue the digests whose window has closed in the outbox, where they
+    are rendered and sent like any other queued email. Digests of a signal
+    which is not personalised and which have the same events are queued as
+    a single email, so that they are rendered once.
+
+    Args:
+        batch_size: The maximum number of digests to process.
+
+    Returns:
+        The number of digests that were processed.
+    """
+    with transaction.atomic():
+        digests = list(
+            Digest.objects.select_for_update(
+                skip_locked=connection.features.has_select_for_update_skip_locked  # noqa: E501
+            )
+            .filter(send_at__lte=timezone.now())
+            .order_by("send_at", "pk")[:batch_size]
+        )
+        signals = Signal.objects.in_bulk(
+            {digest.signal_id for digest in digests}
+        )
+        groups = defaultdict(list)
+        for digest in digests:
+            key = (digest.signal_id, digest.window_start)
+            if signals[digest.signal_id].personalised:
+                key += (digest.recipient,)
+            else:
+                key += (json.dumps(digest.events), digest.event_count)
+            groups[key].append(digest)
+
+        OutboxEmail.objects.bulk_create(
+            OutboxEmail(
+                signal=signals[group[0].signal_id],
+                recipients=[digest.recipient for digest in group],
+                context=_context(group[0]),
+            )
+            for group in groups.values()
+        )
+        Digest.objects.filter(
+            pk__in=[digest.pk for digest in digests]
+        ).delete()
+    metrics.incr("digests.sent", len(digests))
+    return len(digests)
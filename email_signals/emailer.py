@@ -1,11 +1,10 @@
 import typing as _t
 from django.conf import settings
-from django.template.loader import render_to_string
-from django.core.mail import send_mail as _send_mail
-from . import utils
+from django.core.mail import EmailMultiAlternatives
+from . import breaker, metrics, mime, rendering
 
 
-def send_mail(
+def build_email(
     subject: str,
     recipient_list: _t.Iterable[str],
     plain_message: _t.Optional[str] = None,
@@ -13,10 +12,12 @@ def send_mail(
     from_email: _t.Optional[str] = None,
     template: _t.Optional[str] = None,
     context: _t.Optional[_t.Dict[str, _t.Any]] = None,
-) -> None:
-    """A wrapper for Django's `send_email` function. This will handle cases
-    where the `from_email` is not defined and where the user wants to use a
-    custom template to render their email.
+    signal_id: _t.Optional[_t.Any] = None,
+    render_engine: _t.Optional[str] = None,
+) -> EmailMultiAlternatives:
+    """Render an email ready to be sent. This will handle cases where the
+    `from_email` is not defined and where the user wants to use a custom
+    template to render their email.
 
     Args:
         subject: The subject of the email.
@@ -26,9 +27,13 @@ def send_mail(
         from_email: The email address of the sender.
         template: The template to use to render the email.
         context: The context to use to render the email.
+        signal_id: The id of the signal the content belongs to, if any. Used
+            to cache the compiled content.
+        render_engine: The engine to render the content with. Defaults to
+            `settings.EMAIL_SIGNAL_RENDER_ENGINE`.
 
     Returns:
-        None
+        The email message.
     """
 
     try:
@@ -39,13 +44,98 @@ def send_mail(
             "or `settings.EMAIL_SIGNAL_DEFAULT_SENDER` needs to be set."
         )
 
+    message = EmailMultiAlternatives(
+        subject=subject,
+        body=rendering.render_string(
+            plain_message, context, render_engine, signal_id, "plain_message"
+        ),
+        from_email=from_email,
+        to=list(recipient_list),
+    )
     if template:
-        html_message = render_to_string(template, context or {})
+        html_message = rendering.render_template(
+            template, context, render_engine
+        )
+    else:
+        html_message = rendering.render_string(
+            html_message, context, render_engine, signal_id, "html_message"
+        )
+    if html_message:
+        message.attach_alternative(html_message, "text/html")
+    return message
+
+
+def _send_all(messages: _t.List[EmailMultiAlternatives]) -> None:
+    """Send messages over a single connection to the email backend."""
+    if len(messages) == 1:
+        messages[0].send()
+        return
+    with messages[0].get_connection() as connection:
+        for message in messages:
+            message.connection = connection
+            message.send()
 
-    _send_mail(
+
+def send_message(message: EmailMultiAlternatives) -> None:
+    """Send a message through the email backend's circuit breaker. The
+    message is split into one message per domain and up to
+    `settings.EMAIL_SIGNAL_MAX_RCPT` recipients, which share a single MIME
+    structure.
+
+    Args:
+        message: The message to send.
+
+    Raises:
+        breaker.CircuitOpenError: If the circuit is open because the backend
+            has been failing. The message has not been sent.
+    """
+    messages = mime.split_message(message)
+    try:
+        breaker.get_breaker().call(_send_all, messages)
+    except breaker.CircuitOpenError:
+        raise
+    except Exception:
+        metrics.incr("emails.failed")
+        raise
+    metrics.incr("emails.sent", len(messages))
+
+
+def send_mail(
+    subject: str,
+    recipient_list: _t.Iterable[str],
+    plain_message: _t.Optional[str] = None,
+    html_message: _t.Optional[str] = None,
+    from_email: _t.Optional[str] = None,
+    template: _t.Optional[str] = None,
+    context: _t.Optional[_t.Dict[str, _t.Any]] = None,
+) -> None:
+    """A wrapper for Django's `send_email` function. This will handle cases
+    where the `from_email` is not defined and where the user wants to use a
+    custom template to render their email.
+
+    Args:
+        subject: The subject of the email.
+        plain_message: The plain text message of the email.
+        html_message: The HTML message of the email.
+        recipient_list: The list of recipients of the email.
+        from_email: The email address of the sender.
+        template: The template to use to render the email.
+        context: The context to use to render the email.
+
+    Returns:
+        None
+
+    Raises:
+        breaker.CircuitOpenError: If the circuit is open because the backend
+            has been failing. The message has not been sent.
+    """
+    message = build_email(
         subject=subject,
-        message=utils.add_context_to_string(plain_message, context),
-        html_message=utils.add_context_to_string(html_message, context),
-        from_email=from_email,
         recipient_list=recipient_list,
+        plain_message=plain_message,
+        html_message=html_message,
+        from_email=from_email,
+        template=template,
+        context=context,
     )
+    send_message(message)
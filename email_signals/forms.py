@@ -1,8 +1,9 @@
 from django import forms
 from django.template.loader import get_template
-from django.template import TemplateDoesNotExist
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import DateField
 from django.utils.html import format_html
-from . import models
+from . import dependencies, models, ratelimit, rendering, snapshot
 from .registry import registered_content_types
 from .utils import get_param_from_obj
 from .constraint_checker import comparison_requires_2_params
@@ -36,8 +37,58 @@ class SignalAdminForm(forms.ModelForm):
         cleaned_data = super().clean()
         if self.is_valid():
             self._clean_mailing_list()
+            self._clean_dependencies()
+            self._clean_absence()
         return cleaned_data
 
+    def _clean_absence(self):
+        """Check that an absence signal has a delay and a date or datetime
+        field to count it from.
+        """
+        if (
+            self.cleaned_data["signal_type"]
+            != models.Signal.SignalTypeChoices.absence
+        ):
+            return
+        if self.cleaned_data["absence_delay"] is None:
+            raise forms.ValidationError(
+                "Absence signals must have an absence delay."
+            )
+        model = self.cleaned_data["content_type"].model_class()
+        name = self.cleaned_data["absence_field"]
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            field = None
+        if not isinstance(field, DateField):
+            raise forms.ValidationError(
+                f"{name!r} is not a date or datetime field of "
+                f"{model.__name__}."
+            )
+
+    def _clean_dependencies(self):
+        """Check that the content can be parsed and that every `instance`
+        path it references can be resolved against the model.
+        """
+        engine = rendering.resolve_engine(self.cleaned_data["render_engine"])
+        try:
+            paths, _ = snapshot.content_dependencies(
+                self.cleaned_data["plain_message"],
+                self.cleaned_data["html_message"],
+                self.cleaned_data["template"],
+                engine,
+            )
+        except rendering.TEMPLATE_ERRORS as error:
+            raise forms.ValidationError(f"The content is invalid: {error}")
+
+        model = self.cleaned_data["content_type"].model_class()
+        invalid = dependencies.invalid_paths(model, paths)
+        if invalid:
+            raise forms.ValidationError(
+                f"The model {model.__name__} cannot resolve "
+                f"{', '.join(invalid)}"
+            )
+
     def _clean_mailing_list(self):
         """The `mailing_list` field contains a string which corresponds to a
         method that should exist in the model. Check that the function does
@@ -58,18 +109,73 @@ class SignalAdminForm(forms.ModelForm):
         return mailing_list
 
     def clean_template(self):
-        """Check that the template exists."""
+        """Check that the template exists for the engine which will render
+        it.
+        """
         template = self.cleaned_data["template"]
         if not template:
             return template
+
+        # `render_engine` is cleaned after `template`, so the raw value is
+        # used.
+        engine = self.data.get(self.add_prefix("render_engine"))
         try:
-            get_template(template)
-        except TemplateDoesNotExist:
+            if rendering.resolve_engine(engine) == rendering.JINJA2:
+                rendering.jinja2_environment().get_template(template)
+            else:
+                get_template(template)
+        except rendering.TEMPLATE_NOT_FOUND:
             raise forms.ValidationError(
                 f"The template {template} does not exist"
             )
+        except rendering.TEMPLATE_ERRORS as error:
+            raise forms.ValidationError(
+                f"The template {template} is invalid: {error}"
+            )
+        except ImproperlyConfigured as error:
+            raise forms.ValidationError(str(error))
         return template
 
+    def clean_rate_limit(self):
+        """Check that the rate limit can be parsed."""
+        rate_limit = self.cleaned_data["rate_limit"]
+        if rate_limit:
+            try:
+                ratelimit.parse_rate(rate_limit)
+            except ValueError as error:
+                raise forms.ValidationError(str(error))
+        return rate_limit
+
+    def clean_render_engine(self):
+        """Check that the render engine is installed."""
+        engine = self.cleaned_data["render_engine"]
+        if (
+            rendering.resolve_engine(engine) == rendering.JINJA2
+            and rendering.jinja2 is None
+        ):
+            raise forms.ValidationError(
+                "`jinja2` must be installed to render emails with Jinja2."
+            )
+        return engine
+
+
+class EmailTemplateAdminForm(forms.ModelForm):
+    class Meta:
+        model = models.EmailTemplate
+        fields = "__all__"
+
+    def clean_content(self):
+        """Check that the content compiles with the default engine."""
+        content = self.cleaned_data["content"]
+        try:
+            if rendering.engine_name() == rendering.JINJA2:
+                rendering.jinja2_environment().parse(content)
+            else:
+                snapshot.django_engine().from_string(content)
+        except rendering.TEMPLATE_ERRORS as error:
+            raise forms.ValidationError(f"The template is invalid: {error}")
+        return content
+
 
 class SignalConstraintAdminForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,100 @@
+"""A per-process cache of the rendered output of fragments shared by many
+emails, such as a branded header, footer or unsubscribe block.
+
+Fragments are templates rendered with the `{% email_fragment %}` tag (or the
+`email_fragment()` function in Jinja2 templates). Their output is cached by
+the template's name, a version and, optionally, a few context values it
+varies on, so that common content is rendered once per process per version
+rather than once per email. The version combines
+`settings.EMAIL_SIGNAL_FRAGMENT_VERSION` with the `EmailTemplate`
+generation, so saving a stored template renders its fragments again.
+"""
+
+import threading
+import typing as _t
+from collections import OrderedDict
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from . import loaders, metrics
+
+_lock = threading.Lock()
+_fragments: "OrderedDict[tuple, str]" = OrderedDict()
+
+
+def max_size() -> int:
+    """Return the maximum number of rendered fragments to cache."""
+    return getattr(settings, "EMAIL_SIGNAL_FRAGMENT_CACHE_SIZE", 256)
+
+
+def version() -> tuple:
+    """Return the current version of every fragment. Changing
+    `settings.EMAIL_SIGNAL_FRAGMENT_VERSION`, or saving or deleting an
+    `EmailTemplate`, changes the version.
+    """
+    return (
+        getattr(settings, "EMAIL_SIGNAL_FRAGMENT_VERSION", 1),
+        loaders.generation(),
+    )
+
+
+def get_or_render(
+    name: str,
+    vary_on: _t.Iterable[_t.Any],
+    render: _t.Callable[[], str],
+    engine: str = "django",
+) -> str:
+    """Return the cached output of a fragment, rendering and caching it if
+    it has not been rendered for the current version.
+
+    Args:
+        name: The name of the fragment's template.
+        vary_on: Context values the fragment's output depends on.
+        render: Renders the fragment.
+        engine: The engine the fragment is rendered with.
+
+    Returns:
+        The rendered fragment.
+    """
+    key = (engine, name, version(), tuple(str(value) for value in vary_on))
+    with _lock:
+        output = _fragments.get(key)
+        if output is not None:
+            _fragments.move_to_end(key)
+    if output is not None:
+        metrics.incr("fragments.hits")
+        return output
+
+    metrics.incr("fragments.misses")
+    output = render()
+    with _lock:
+        _fragments[key] = output
+        _fragments.move_to_end(key)
+        while len(_fragments) > max_size():
+            _fragments.popitem(last=False)
+    return output
+
+
+def invalidate() -> None:
+    """Discard every cached fragment."""
+    with _lock:
+        _fragments.clear()
+
+
+def stats() -> _t.Dict[str, int]:
+    """Return the number of hits and misses and the size of the cache."""
+    with _lock:
+        size = len(_fragments)
+    return {
+        "hits": metrics.get("fragments.hits"),
+        "misses": metrics.get("fragments.misses"),
+        "size": size,
+        "max_size": max_size(),
+    }
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting: str, **kwargs) -> None:
+    """Discard the cached fragments when the template settings change."""
+    if setting == "TEMPLATES" or setting.startswith("EMAIL_SIGNAL_FRAGMENT_"):
+        invalidate()
@@ -0,0 +1,448 @@
+"""Prepares HTML email content when it is saved rather than when it is sent.
+
+The pipeline moves the rules in `<style>` elements onto the elements they
+match as `style` attributes, as many email clients ignore `<style>`
+elements, and then minifies the HTML by removing comments and collapsing
+whitespace. Template tags (`{{ }}`, `{% %}` and `{# #}`) are left untouched
+so that the result can still be rendered.
+
+Only simple selectors can be inlined: type, class, id and universal
+selectors, combined with descendant (` `) and child (`>`) combinators. Rules
+with other selectors (e.g: `a:hover`) and at-rules (e.g: `@media`) are kept
+in a `<style>` element.
+
+The structure of the document is only known if every element is closed
+where it was opened. Markup whose elements are opened and closed unevenly,
+e.g: by different branches of an `{% if %}` tag, or left unclosed, is
+returned as it is.
+"""
+
+import re
+import typing as _t
+from html import escape
+from html.parser import HTMLParser
+from django.conf import settings
+
+_TEMPLATE_TAG_RE = re.compile(r"{{.*?}}|{%.*?%}|{#.*?#}", re.DOTALL)
+_PLACEHOLDER = "__emailsignalstag{}__"
+_PLACEHOLDER_RE = re.compile(r"__emailsignalstag(\d+)__")
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+_WHITESPACE_RE = re.compile(r"\s+")
+_COMPOUND_RE = re.compile(r"^(\*|[a-z][a-z0-9-]*)?((?:[.#][\w-]+)*)$", re.I)
+
+VOID_ELEMENTS = frozenset(
+    (
+        "area base br col embed hr img input link meta param source track "
+        "wbr"
+    ).split()
+)
+BLOCK_ELEMENTS = frozenset(
+    (
+        "address article aside blockquote body center dd div dl dt "
+        "fieldset figure footer form h1 h2 h3 h4 h5 h6 head header hr html "
+        "li link main meta nav ol p section style table tbody td tfoot th "
+        "thead title tr ul"
+    ).split()
+)
+#: Elements whose content is kept exactly as it is.
+RAW_ELEMENTS = frozenset(("pre", "textarea", "script", "style"))
+
+
+class Element:
+    """An element of the parsed document."""
+
+    def __init__(self, tag: str, attrs: _t.List[_t.Tuple[str, str]]):
+        self.tag = tag
+        self.attrs = attrs
+        self.children: list = []
+        self.parent: _t.Optional["Element"] = None
+        # Whether the element was closed by an end tag in the source.
+        self.closed = False
+
+    def get(self, name: str) -> _t.Optional[str]:
+        for key, value in self.attrs:
+            if key == name:
+                return value
+        return None
+
+    def set(self, name: str, value: str) -> None:
+        for index, (key, _) in enumerate(self.attrs):
+            if key == name:
+                self.attrs[index] = (name, value)
+                return
+        self.attrs.append((name, value))
+
+    @property
+    def classes(self) -> _t.Set[str]:
+        return set((self.get("class") or "").split())
+
+    def elements(self) -> _t.Iterator["Element"]:
+        """Yield this element's descendants in document order."""
+        for child in self.children:
+            if isinstance(child, Element):
+                yield child
+                yield from child.elements()
+
+
+class Text(str):
+    """Text, which is escaped as it appeared in the source."""
+
+
+class Raw(str):
+    """Markup which is output as it is, e.g: comments and doctypes."""
+
+
+class Comment(str):
+    """An HTML comment."""
+
+
+class _TreeBuilder(HTMLParser):
+    """Builds a tree of `Element` objects. `balanced` is `False` once an
+    end tag does not close the current element.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.root = Element("", [])
+        self.current = self.root
+        self.balanced = True
+
+    def _append(self, node) -> None:
+        if isinstance(node, Element):
+            node.parent = self.current
+        self.current.children.append(node)
+
+    def handle_starttag(self, tag, attrs):
+        element = Element(tag, [(key, value) for key, value in attrs])
+        self._append(element)
+        if tag not in VOID_ELEMENTS:
+            self.current = element
+
+    def handle_startendtag(self, tag, attrs):
+        element = Element(tag, [(key, value) for key, value in attrs])
+        element.closed = True
+        self._append(element)
+
+    def handle_endtag(self, tag):
+        if self.current.tag != tag:
+            self.balanced = False
+            self._append(Raw(f"</{tag}>"))
+            return
+        self.current.closed = True
+        self.current = self.current.parent
+
+    def close(self):
+        super().close()
+        if self.current is not self.root:
+            self.balanced = False
+
+    def handle_data(self, data):
+        self._append(Text(data))
+
+    def handle_entityref(self, name):
+        self._append(Text(f"&{name};"))
+
+    def handle_charref(self, name):
+        self._append(Text(f"&#{name};"))
+
+    def handle_comment(self, data):
+        self._append(Comment(data))
+
+    def handle_decl(self, decl):
+        self._append(Raw(f"<!{decl}>"))
+
+    def unknown_decl(self, data):
+        self._append(Raw(f"<![{data}]>"))
+
+    def handle_pi(self, data):
+        self._append(Raw(f"<?{data}>"))
+
+
+def _protect(html: str) -> _t.Tuple[str, _t.List[str]]:
+    """Replace template tags with placeholders the HTML parser will leave
+    alone.
+    """
+    tags = []
+
+    def replace(match):
+        tags.append(match.group(0))
+        return _PLACEHOLDER.format(len(tags) - 1)
+
+    return _TEMPLATE_TAG_RE.sub(replace, html), tags
+
+
+def _restore(html: str, tags: _t.List[str]) -> str:
+    """Put the template tags back in place of their placeholders."""
+    return _PLACEHOLDER_RE.sub(lambda match: tags[int(match.group(1))], html)
+
+
+def _parse_declarations(css: str) -> _t.List[_t.Tuple[str, str, bool]]:
+    """Parse `prop: value; ...` into `(prop, value, important)` tuples."""
+    declarations = []
+    for declaration in css.split(";"):
+        prop, _, value = declaration.partition(":")
+        prop, value = prop.strip().lower(), value.strip()
+        if not prop or not value:
+            continue
+        important = value.lower().endswith("!important")
+        if important:
+            value = value[: -len("!important")].strip()
+        declarations.append((prop, value, important))
+    return declarations
+
+
+def _split_blocks(css: str) -> _t.List[_t.Tuple[str, str]]:
+    """Split a stylesheet into its top level `(prelude, body)` blocks."""
+    blocks, depth, start, prelude = [], 0, 0, ""
+    for index, char in enumerate(css):
+        if char == "{":
+            if depth == 0:
+                prelude = css[start:index].strip()
+                start = index + 1
+            depth += 1
+        elif char == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude, css[start:index]))
+                start = index + 1
+    return blocks
+
+
+def _parse_selector(selector: str) -> _t.Optional[list]:
+    """Parse a selector into a list of `(combinator, tag, ids, classes)`
+    steps. Returns `None` if the selector can not be inlined.
+    """
+    tokens = selector.replace(">", " > ").split()
+    steps, combinator = [], " "
+    for token in tokens:
+        if token == ">":
+            if not steps or combinator == ">":
+                return None
+            combinator = ">"
+            continue
+        match = _COMPOUND_RE.match(token)
+        if not match or not token:
+            return None
+        tag, rest = match.group(1), match.group(2)
+        ids = set(re.findall(r"#([\w-]+)", rest))
+        classes = set(re.findall(r"\.([\w-]+)", rest))
+        steps.append((combinator, (tag or "*").lower(), ids, classes))
+        combinator = " "
+    return steps or None
+
+
+def _specificity(steps: list) -> _t.Tuple[int, int, int]:
+    return (
+        sum(len(ids) for _, _, ids, _ in steps),
+        sum(len(classes) for _, _, _, classes in steps),
+        sum(1 for _, tag, _, _ in steps if tag != "*"),
+    )
+
+
+def _matches_compound(element: Element, step) -> bool:
+    _, tag, ids, classes = step
+    if tag != "*" and element.tag != tag:
+        return False
+    if ids and element.get("id") not in ids:
+        return False
+    return classes <= element.classes
+
+
+def _matches(element: Element, steps: list) -> bool:
+    """Return `True` if `element` matches the parsed selector."""
+    if not _matches_compound(element, steps[-1]):
+        return False
+    combinator = steps[-1][0]
+    remaining = steps[:-1]
+    if not remaining:
+        return True
+    ancestor = element.parent
+    while ancestor is not None and ancestor.tag:
+        if _matches(ancestor, remaining):
+            return True
+        if combinator == ">":
+            return False
+        ancestor = ancestor.parent
+    return False
+
+
+def _format_declarations(declarations) -> str:
+    return ";".join(
+        f"{prop}:{value}{' !important' if important else ''}"
+        for prop, value, important in declarations
+    )
+
+
+def inline_css(root: Element) -> None:
+    """Move the rules of the document's `<style>` elements onto the elements
+    they match. Rules which can not be inlined are kept.
+    """
+    styles = [element for element in root.elements() if element.tag == "style"]
+    rules = []
+    for style in styles:
+        css = _CSS_COMMENT_RE.sub("", "".join(style.children))
+        kept = []
+        for prelude, body in _split_blocks(css):
+            selectors = [
+                _parse_selector(selector) for selector in prelude.split(",")
+            ]
+            if prelude.startswith("@") or not all(selectors):
+                kept.append(f"{prelude}{{{body.strip()}}}")
+                continue
+            declarations = _parse_declarations(body)
+            for steps in selectors:
+                rules.append((steps, _specificity(steps), declarations))
+        if kept:
+            style.children = [Raw("".join(kept))]
+        else:
+            style.parent.children.remove(style)
+
+    if not rules:
+        return
+    for element in root.elements():
+        if element.tag in ("style", "head", "html", "title", "meta"):
+            continue
+        matched = []
+        for order, (steps, specificity, declarations) in enumerate(rules):
+            if _matches(element, steps):
+                for prop, value, important in declarations:
+                    matched.append(
+                        ((important, 0) + specificity + (order,), prop, value)
+                    )
+        if not matched:
+            continue
+        # Existing inline styles beat rules unless the rule is important.
+        for prop, value, important in _parse_declarations(
+            element.get("style") or ""
+        ):
+            matched.append(((important, 1, 0, 0, 0, 0), prop, value))
+
+        winners: _t.Dict[str, tuple] = {}
+        for priority, prop, value in matched:
+            if prop not in winners or priority >= winners[prop][0]:
+                winners[prop] = (priority, value)
+        element.set(
+            "style",
+            _format_declarations(
+                (prop, value, priority[0])
+                for prop, (priority, value) in winners.items()
+            ),
+        )
+
+
+def _is_block(node) -> bool:
+    return isinstance(node, Element) and node.tag in BLOCK_ELEMENTS
+
+
+def minify(element: Element) -> None:
+    """Remove comments and collapse whitespace. Conditional comments, which
+    Outlook relies on, and the content of `<pre>`, `<textarea>`, `<script>`
+    and `<style>` elements are kept.
+    """
+    children = []
+    for node in element.children:
+        if isinstance(node, Comment) and not (
+            node.startswith("[if") or node.startswith("<![endif")
+        ):
+            continue
+        if (
+            isinstance(node, Text)
+            and children
+            and isinstance(children[-1], Text)
+        ):
+            # Join text either side of a removed comment.
+            children[-1] = Text(children[-1] + node)
+            continue
+        children.append(node)
+
+    result = []
+    for index, node in enumerate(children):
+        if isinstance(node, Element):
+            if node.tag not in RAW_ELEMENTS:
+                minify(node)
+            result.append(node)
+            continue
+        if not isinstance(node, Text):
+            result.append(node)
+            continue
+
+        text = _WHITESPACE_RE.sub(" ", node)
+        if text == " ":
+            before = children[index - 1] if index else None
+            after = children[index + 1] if index + 1 < len(children) else None
+            if (
+                _is_block(before)
+                or _is_block(after)
+                or (
+                    (before is None or after is None)
+                    and (element.tag in BLOCK_ELEMENTS or not element.tag)
+                )
+            ):
+                continue
+        result.append(Text(text))
+    element.children = result
+
+
+def _serialise_attrs(attrs) -> str:
+    parts = []
+    for key, value in attrs:
+        if value is None:
+            parts.append(f" {key}")
+        else:
+            parts.append(f' {key}="{escape(value, quote=True)}"')
+    return "".join(parts)
+
+
+def serialise(element: Element) -> str:
+    """Convert a tree back into HTML."""
+    parts = []
+    for node in element.children:
+        if isinstance(node, Element):
+            parts.append(f"<{node.tag}{_serialise_attrs(node.attrs)}>")
+            if node.tag in VOID_ELEMENTS:
+                continue
+            parts.append(serialise(node))
+            if node.closed:
+                parts.append(f"</{node.tag}>")
+        elif isinstance(node, Comment):
+            parts.append(f"<!--{node}-->")
+        else:
+            parts.append(node)
+    return "".join(parts)
+
+
+def process(html: str, inline: bool = True, minify_html: bool = True) -> str:
+    """Inline the CSS and minify an HTML document.
+
+    Args:
+        html: The HTML, which may contain template tags.
+        inline: Whether to inline the CSS.
+        minify_html: Whether to minify the HTML.
+
+    Returns:
+        The processed HTML, or `html` as it is if its elements are not
+        balanced.
+    """
+    protected, tags = _protect(html)
+    builder = _TreeBuilder()
+    builder.feed(protected)
+    builder.close()
+    if not builder.balanced:
+        return html
+    if inline:
+        inline_css(builder.root)
+    if minify_html:
+        minify(builder.root)
+    return _restore(serialise(builder.root), tags)
+
+
+def is_enabled() -> bool:
+    """Return `True` if HTML content should be processed when it is saved."""
+    return getattr(settings, "EMAIL_SIGNAL_HTML_PIPELINE", False)
+
+
+def process_if_enabled(html: _t.Optional[str]) -> _t.Optional[str]:
+    """Process `html` if the pipeline is enabled, otherwise return `None`."""
+    if not html or not is_enabled():
+        return None
+    return process(html)
@@ -0,0 +1,151 @@
+"""Template loaders which serve templates stored in the `EmailTemplate`
+table, so that layouts can be shared between signals with `{% extends %}`
+and `{% include %}`.
+
+Add the cached loader to your template engine's loaders::
+
+    TEMPLATES = [
+        {
+            "BACKEND": "django.template.backends.django.DjangoTemplates",
+            "DIRS": [...],
+            "OPTIONS": {
+                "loaders": [
+                    "email_signals.loaders.Loader",
+                    "django.template.loaders.filesystem.Loader",
+                    "django.template.loaders.app_directories.Loader",
+                ],
+            },
+        },
+    ]
+
+Compiled templates are cached per process. Saving or deleting an
+`EmailTemplate` bumps a generation counter held in Django's cache, from the
+receiver in `dependencies`, which makes every process discard its compiled
+templates the next time it loads one. Each process reads the counter at
+most once every `settings.EMAIL_SIGNAL_TEMPLATE_STORE_POLL` seconds, so that
+loading a template, e.g: for every `{% include %}`, does not cost a round
+trip to the cache.
+"""
+
+import time
+import typing as _t
+from django.conf import settings
+from django.core.cache import caches
+from django.template import Origin, TemplateDoesNotExist
+from django.template.loaders import base, cached
+
+GENERATION_KEY = "email_signals:email_templates:generation"
+
+_local_generation = 0
+
+# The last value read of the shared generation and when it should be read
+# again.
+_shared_generation = {"value": 0, "expires": 0.0}
+
+
+def _cache():
+    return caches[
+        getattr(settings, "EMAIL_SIGNAL_TEMPLATE_STORE_CACHE", "default")
+    ]
+
+
+def poll_interval() -> float:
+    """Return how long, in seconds, a process may use the last value it read
+    of the shared generation.
+    """
+    return getattr(settings, "EMAIL_SIGNAL_TEMPLATE_STORE_POLL", 1)
+
+
+def generation() -> _t.Tuple[int, int]:
+    """Return a value which changes whenever an `EmailTemplate` is saved or
+    deleted, straight away in this process and within
+    `settings.EMAIL_SIGNAL_TEMPLATE_STORE_POLL` seconds in any other process
+    sharing the cache.
+    """
+    now = time.monotonic()
+    if now >= _shared_generation["expires"]:
+        _shared_generation.update(
+            value=_cache().get(GENERATION_KEY, 0),
+            expires=now + poll_interval(),
+        )
+    return _local_generation, _shared_generation["value"]
+
+
+def invalidate() -> None:
+    """Make every process discard its compiled templates."""
+    global _local_generation
+    _local_generation += 1
+    cache = _cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+class DatabaseLoader(base.Loader):
+    """Loads templates from the `EmailTemplate` table. Templates are looked
+    up by their name.
+    """
+
+    def get_template_sources(self, template_name: str):
+        yield Origin(
+            name=f"email_signals.EmailTemplate:{template_name}",
+            template_name=template_name,
+            loader=self,
+        )
+
+    def get_contents(self, origin: Origin) -> str:
+        from .models import EmailTemplate
+
+        row = (
+            EmailTemplate.objects.filter(name=origin.template_name)
+            .values_list("content_processed", "content")
+            .first()
+        )
+        if row is None:
+            raise TemplateDoesNotExist(origin)
+        return row[0] or row[1]
+
+
+class Loader(cached.Loader):
+    """Loads templates from the `EmailTemplate` table and caches the
+    compiled templates until an `EmailTemplate` is changed.
+
+    Args:
+        engine: The template engine.
+        loaders: The loaders to cache. Defaults to only the
+            `DatabaseLoader`.
+    """
+
+    def __init__(self, engine, loaders=None):
+        super().__init__(
+            engine, loaders or ["email_signals.loaders.DatabaseLoader"]
+        )
+        self._generation = generation()
+
+    def get_template(self, template_name: str, skip=None):
+        current = generation()
+        if current != self._generation:
+            self.reset()
+            self._generation = current
+        return super().get_template(template_name, skip)
+
+
+def jinja2_source(name: str) -> _t.Optional[_t.Tuple[str, None, _t.Callable]]:
+    """Load a template from the `EmailTemplate` table for Jinja2's
+    `FunctionLoader`. The compiled template is reused until an
+    `EmailTemplate` is changed.
+    """
+    # Imported here so that the Jinja2 environment, which uses this loader,
+    # can be set up without the models, e.g: by the benchmarks.
+    from .models import EmailTemplate
+
+    row = (
+        EmailTemplate.objects.filter(name=name)
+        .values_list("content_processed", "content")
+        .first()
+    )
+    if row is None:
+        return None
+    loaded_at = generation()
+    return row[0] or row[1], None, lambda: generation() == loaded_at
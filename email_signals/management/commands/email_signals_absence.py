@@ -0,0 +1,38 @@
+import time
+from django.core.management.base import BaseCommand
+from ... import absence
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends the emails of absence signals for the records which have "
+        "become overdue since the last scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="The maximum number of records to read at a time.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=60,
+            help="Seconds to wait between scans.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Scan once and exit.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent = absence.process_absences(options["batch_size"])
+            if options["verbosity"] > 1 and sent:
+                self.stdout.write(f"Sent emails for {sent} records.")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
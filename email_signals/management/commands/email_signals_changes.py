@@ -0,0 +1,60 @@
+import time
+from django.core.management.base import BaseCommand
+from ... import changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Evaluates the post_save signals of the changes captured by "
+        "settings.EMAIL_SIGNAL_CHANGE_CAPTURE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--install",
+            action="store_true",
+            help="Install the change capture triggers and exit.",
+        )
+        parser.add_argument(
+            "--uninstall",
+            action="store_true",
+            help="Remove the change capture triggers and exit.",
+        )
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="The database to install or remove the triggers on.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="The maximum number of changes to read at a time.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait once every captured change is processed.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the captured changes once and exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options["install"]:
+            changes.install(using=options["database"])
+            return
+        if options["uninstall"]:
+            changes.uninstall(using=options["database"])
+            return
+        while True:
+            processed = changes.process_changes(options["batch_size"])
+            if options["verbosity"] > 1 and processed:
+                self.stdout.write(f"Processed {processed} changes.")
+            if options["once"]:
+                return
+            if processed < options["batch_size"]:
+                time.sleep(options["interval"])
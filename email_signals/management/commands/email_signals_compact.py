@@ -0,0 +1,53 @@
+import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from ... import retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes sent and failed emails, delivery logs and unused payloads "
+        "which are older than the retention period."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "EMAIL_SIGNAL_RETENTION_DAYS", 30),
+            help="Delete rows older than this many days.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="The maximum number of rows to delete in a transaction.",
+        )
+        parser.add_argument(
+            "--archive",
+            help="Append the rows to this file, one JSON object per line, "
+            "before deleting them.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to wait between chunks.",
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - datetime.timedelta(days=options["days"])
+        kwargs = {
+            "before": before,
+            "chunk_size": options["chunk_size"],
+            "pause": options["pause"],
+        }
+        if options["archive"]:
+            with open(options["archive"], "a", encoding="utf-8") as archive:
+                deleted = retention.compact(archive=archive, **kwargs)
+        else:
+            deleted = retention.compact(**kwargs)
+
+        for name, count in deleted.items():
+            self.stdout.write(f"Deleted {count} {name.replace('_', ' ')}.")
@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand
+from ... import digests, outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends emails which have been queued in the outbox and queues "
+        "digests whose window has closed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="The maximum number of emails to send at once.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait before checking again when the outbox is "
+            "empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process a single batch and exit.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            digested = digests.process_digests(options["batch_size"])
+            if options["verbosity"] > 1 and digested:
+                self.stdout.write(f"Queued {digested} digests.")
+            processed = outbox.process_outbox(options["batch_size"])
+            if options["verbosity"] > 1 and processed:
+                self.stdout.write(f"Processed {processed} emails.")
+            if options["once"]:
+                return
+            if not processed and not digested:
+                time.sleep(options["interval"])
@@ -0,0 +1,48 @@
+"""In-process counters and gauges describing what the application is doing,
+e.g: how many emails have been sent or dropped.
+
+Values are kept per process and are reset when the process restarts. They
+can be read with `snapshot()` and are shown in the admin on the outbox
+changelist.
+"""
+
+import threading
+import typing as _t
+
+_lock = threading.Lock()
+_values: _t.Dict[str, _t.Any] = {}
+
+
+def incr(name: str, value: int = 1) -> None:
+    """Increment a counter.
+
+    Args:
+        name: The name of the counter, e.g: `emails.sent`.
+        value: The amount to increment the counter by.
+    """
+    with _lock:
+        _values[name] = _values.get(name, 0) + value
+
+
+def set_value(name: str, value: _t.Any) -> None:
+    """Set a gauge to a value, e.g: the state of the circuit breaker."""
+    with _lock:
+        _values[name] = value
+
+
+def get(name: str, default: _t.Any = 0) -> _t.Any:
+    """Return the current value of a counter or gauge."""
+    with _lock:
+        return _values.get(name, default)
+
+
+def snapshot() -> _t.Dict[str, _t.Any]:
+    """Return a copy of all counters and gauges."""
+    with _lock:
+        return dict(sorted(_values.items()))
+
+
+def reset() -> None:
+    """Reset all counters and gauges."""
+    with _lock:
+        _values.clear()
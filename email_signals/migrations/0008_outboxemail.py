@@ -0,0 +1,85 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("email_signals", "0007_alter_signal_mailing_list"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="signal",
+            name="from_email",
+            field=models.EmailField(
+                blank=True,
+                help_text="If not set, `settings.EMAIL_SIGNAL_DEFAULT_SENDER` with be used.",
+                max_length=254,
+                null=True,
+            ),
+        ),
+        migrations.CreateModel(
+            name="OutboxEmail",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("recipients", models.JSONField()),
+                (
+                    "context",
+                    models.JSONField(
+                        blank=True,
+                        help_text="Snapshot of the template context captured when the signal was raised.",
+                        null=True,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("sent", "Sent"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "signal",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="outbox",
+                        to="email_signals.signal",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Outbox email",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt_at"],
+                        name="email_signa_status_282237_idx",
+                    )
+                ],
+            },
+        ),
+    ]
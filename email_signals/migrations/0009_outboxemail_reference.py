@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("email_signals", "0008_outboxemail"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outboxemail",
+            name="content_type",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="When set, the instance is loaded from the database when the email is sent rather than being taken from the snapshot.",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="contenttypes.contenttype",
+            ),
+        ),
+        migrations.AddField(
+            model_name="outboxemail",
+            name="object_id",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("email_signals", "0009_outboxemail_reference"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmailPayload",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hash", models.CharField(max_length=64, unique=True)),
+                ("codec", models.CharField(max_length=10)),
+                ("data", models.BinaryField()),
+                (
+                    "size",
+                    models.PositiveIntegerField(
+                        help_text="Size of the uncompressed content in bytes."
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Email payload",
+            },
+        ),
+        migrations.CreateModel(
+            name="DeliveryLog",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("recipients", models.JSONField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("sent", "Sent"), ("failed", "Failed")],
+                        max_length=10,
+                    ),
+                ),
+                ("error", models.TextField(blank=True, default="")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, db_index=True),
+                ),
+                (
+                    "payload",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="deliveries",
+                        to="email_signals.emailpayload",
+                    ),
+                ),
+                (
+                    "signal",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="deliveries",
+                        to="email_signals.signal",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Delivery log",
+            },
+        ),
+        migrations.AddField(
+            model_name="outboxemail",
+            name="payload",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="When set, the email has already been rendered and is sent as is.",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="outbox",
+                to="email_signals.emailpayload",
+            ),
+        ),
+    ]
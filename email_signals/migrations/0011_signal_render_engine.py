@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("email_signals", "0010_payloads"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="signal",
+            name="render_engine",
+            field=models.CharField(
+                blank=True,
+                choices=[("django", "Django"), ("jinja2", "Jinja2")],
+                default="",
+                help_text="The template engine to render the content with. If not set, `settings.EMAIL_SIGNAL_RENDER_ENGINE` will be used.",
+                max_length=10,
+            ),
+        ),
+    ]
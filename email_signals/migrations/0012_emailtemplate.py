@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("email_signals", "0011_signal_render_engine"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmailTemplate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="The name the template is loaded by, e.g: `emails/base.html`.",
+                        max_length=100,
+                        unique=True,
+                    ),
+                ),
+                ("description", models.TextField(blank=True, null=True)),
+                ("content", models.TextField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Email template",
+                "ordering": ["name"],
+            },
+        ),
+    ]
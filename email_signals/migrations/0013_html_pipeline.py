@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("email_signals", "0012_emailtemplate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="emailtemplate",
+            name="content_processed",
+            field=models.TextField(
+                blank=True,
+                editable=False,
+                help_text="The content with its CSS inlined and minified. Set on save when `settings.EMAIL_SIGNAL_HTML_PIPELINE` is enabled.",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="signal",
+            name="html_message_processed",
+            field=models.TextField(
+                blank=True,
+                editable=False,
+                help_text="The HTML content with its CSS inlined and minified. Set on save when `settings.EMAIL_SIGNAL_HTML_PIPELINE` is enabled.",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("email_signals", "0013_html_pipeline"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="signal",
+            name="personalised",
+            field=models.BooleanField(
+                default=False,
+                help_text="Render the email separately for each recipient, with the recipient available in the content as `recipient`.",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("email_signals", "0014_signal_personalised"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="signal",
+            name="template_dependencies",
+            field=models.JSONField(
+                blank=True,
+                editable=False,
+                help_text="The context paths and the templates the content depends on. Set on save.",
+                null=True,
+            ),
+        ),
+    ]
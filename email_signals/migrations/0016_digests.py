@@ -0,0 +1,72 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("email_signals", "0015_signal_template_dependencies"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="signal",
+            name="digest_interval",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="When set, matches are collected for this many minutes and sent to each recipient as a single digest email, with the matches available in the content as `events`.",
+                null=True,
+            ),
+        ),
+        migrations.CreateModel(
+            name="Digest",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("recipient", models.CharField(max_length=254)),
+                ("window_start", models.DateTimeField()),
+                ("send_at", models.DateTimeField(db_index=True)),
+                (
+                    "events",
+                    models.JSONField(
+                        default=list,
+                        help_text="Snapshots of the context of each event. At most `settings.EMAIL_SIGNAL_DIGEST_MAX_EVENTS` are kept.",
+                    ),
+                ),
+                (
+                    "event_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="The number of events, including those which were not kept.",
+                    ),
+                ),
+                (
+                    "signal",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="digests",
+                        to="email_signals.signal",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Digest",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="digest",
+            constraint=models.UniqueConstraint(
+                fields=("signal", "recipient", "window_start"),
+                name="email_signals_digest_unique",
+            ),
+        ),
+    ]
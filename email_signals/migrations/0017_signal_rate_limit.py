@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("email_signals", "0016_digests"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="signal",
+            name="rate_limit",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text='The maximum number of emails to send, e.g: "100/m" for 100 a minute. If not set, `settings.EMAIL_SIGNAL_RATE_LIMITS["signal"]` will be used.',
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("email_signals", "0017_signal_rate_limit"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="signal",
+            name="dedup_by_content",
+            field=models.BooleanField(
+                default=False,
+                help_text="Only treat emails as identical if the values their content uses are the same.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="signal",
+            name="dedup_window",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="When set, identical emails for the same record and recipients are only sent once within this many seconds.",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("email_signals", "0018_signal_dedup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SuppressedAddress",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("email", models.CharField(max_length=254, unique=True)),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("bounce", "Bounced"),
+                            ("complaint", "Complained"),
+                            ("unsubscribe", "Unsubscribed"),
+                            ("manual", "Manual"),
+                        ],
+                        default="manual",
+                        max_length=20,
+                    ),
+                ),
+                ("active", models.BooleanField(default=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, db_index=True),
+                ),
+            ],
+            options={
+                "verbose_name": "Suppressed address",
+                "verbose_name_plural": "Suppressed addresses",
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("email_signals", "0019_suppressed_addresses"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="signal",
+            name="absence_delay",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="For absence signals, the number of minutes after `absence_field` at which a record which meets the constraints is sent an email.",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="signal",
+            name="absence_field",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="For absence signals, the date or datetime field of the model the delay is counted from, e.g: `created_at`. The field should be indexed.",
+                max_length=255,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="signal",
+            name="signal_type",
+            field=models.CharField(
+                choices=[
+                    ("pre_save", "Pre Save"),
+                    ("post_save", "Post Save"),
+                    ("pre_delete", "Pre Delete"),
+                    ("post_delete", "Post Delete"),
+                    ("absence", "Absence"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.CreateModel(
+            name="Watermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("value", models.DateTimeField()),
+                (
+                    "last_pk",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "signal",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="watermark",
+                        to="email_signals.signal",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Watermark",
+            },
+        ),
+    ]
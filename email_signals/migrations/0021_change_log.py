@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("email_signals", "0020_absence_signals"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeLog",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("table_name", models.CharField(max_length=255)),
+                ("object_id", models.CharField(max_length=255)),
+                ("operation", models.CharField(max_length=1)),
+                ("created_at", models.DateTimeField()),
+            ],
+            options={
+                "verbose_name": "Change log entry",
+                "verbose_name_plural": "Change log",
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:57
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("email_signals", "0021_change_log"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="emailpayload",
+            name="last_used_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                help_text="When the payload was last stored for an email. Unused payloads are only deleted once this is older than the cutoff.",
+            ),
+        ),
+    ]
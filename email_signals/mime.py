@@ -0,0 +1,124 @@
+"""Builds the MIME structure of a message once and clones it for groups of
+recipients.
+
+Rendering the content and encoding its MIME parts is the expensive part of
+building a message. A message sent to many recipients is encoded once and
+then copied for each group of recipients, with only the `To` and
+`Message-ID` headers replaced. The encoded parts are shared by every copy.
+
+Recipients are grouped by domain, so that a relay can hand each message to
+a single destination server, with up to `settings.EMAIL_SIGNAL_MAX_RCPT`
+recipients (`RCPT TO` commands) per message.
+"""
+
+import copy
+import typing as _t
+from collections import defaultdict
+from django.conf import settings
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.core.mail.message import make_msgid
+from django.core.mail.utils import DNS_NAME
+
+#: The number of recipients every SMTP server must accept per message
+#: (RFC 5321, section 4.5.3.1.8).
+DEFAULT_MAX_RCPT = 100
+
+
+def max_recipients() -> int:
+    """Return the maximum number of recipients per message."""
+    return getattr(settings, "EMAIL_SIGNAL_MAX_RCPT", DEFAULT_MAX_RCPT)
+
+
+def group_recipients(
+    recipients: _t.Iterable[str], max_rcpt: _t.Optional[int] = None
+) -> _t.List[_t.List[str]]:
+    """Group recipients by their domain into chunks of at most `max_rcpt`
+    recipients.
+
+    Args:
+        recipients: The email addresses to group.
+        max_rcpt: The maximum number of recipients per chunk. Defaults to
+            `settings.EMAIL_SIGNAL_MAX_RCPT`.
+
+    Returns:
+        The chunks, in the order each domain first appears in
+        `recipients`.
+    """
+    max_rcpt = max(1, max_rcpt or max_recipients())
+    domains = defaultdict(list)
+    for recipient in recipients:
+        domains[recipient.rpartition("@")[2].lower()].append(recipient)
+
+    chunks = []
+    for group in domains.values():
+        while group:
+            chunks.append(group[:max_rcpt])
+            group = group[max_rcpt:]
+    return chunks
+
+
+class PreparedMessage(EmailMultiAlternatives):
+    """A copy of a message for some of its recipients which reuses the MIME
+    structure built for the original message.
+
+    Args:
+        original: The message being copied.
+        mime: The MIME structure built by `original.message()`.
+        recipients: The recipients of this copy.
+    """
+
+    def __init__(self, original: EmailMessage, mime, recipients: _t.List[str]):
+        super().__init__(
+            subject=original.subject,
+            body=original.body,
+            from_email=original.from_email,
+            to=recipients,
+            connection=original.connection,
+            attachments=original.attachments,
+            headers=original.extra_headers,
+            alternatives=getattr(original, "alternatives", None),
+            reply_to=original.reply_to,
+        )
+        self.mime = mime
+
+    def message(self):
+        msg = copy.copy(self.mime)
+        # Deleting a header gives the copy its own list of headers, so the
+        # original's headers are left untouched.
+        del msg["To"]
+        self._set_list_header_if_not_empty(msg, "To", self.to)
+        headers = {name.lower() for name in self.extra_headers}
+        if "message-id" not in headers:
+            del msg["Message-ID"]
+            msg["Message-ID"] = make_msgid(domain=DNS_NAME)
+        return msg
+
+
+def split_message(
+    message: EmailMessage, max_rcpt: _t.Optional[int] = None
+) -> _t.List[EmailMessage]:
+    """Split a message into one message per chunk of recipients, sharing a
+    single MIME structure.
+
+    Messages with `cc` or `bcc` recipients and messages whose recipients fit
+    in a single chunk are returned as they are. The MIME structure of a
+    `PreparedMessage` is reused rather than built again.
+
+    Args:
+        message: The rendered message.
+        max_rcpt: The maximum number of recipients per message. Defaults to
+            `settings.EMAIL_SIGNAL_MAX_RCPT`.
+
+    Returns:
+        The messages to send.
+    """
+    if message.cc or message.bcc:
+        return [message]
+    chunks = group_recipients(message.to, max_rcpt)
+    if len(chunks) <= 1:
+        return [message]
+    if isinstance(message, PreparedMessage):
+        mime = message.mime
+    else:
+        mime = message.message()
+    return [PreparedMessage(message, mime, chunk) for chunk in chunks]
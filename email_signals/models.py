@@ -1,8 +1,25 @@
 import typing as _t
-from django.db import models
+from django import dispatch
+from django.db import models, transaction
 from django.db.models import signals
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 from tinymce.models import HTMLField
+from . import html_pipeline, suppression
+
+#: Sent once by the bulk operations of `EmailSignalQuerySet`, with the model
+#: as the sender and `pks`, `unsaved` (created instances without a primary
+#: key), `created`, `update_fields` and `using` as arguments.
+bulk_post_save = dispatch.Signal()
+
+
+def _add_update_field(kwargs: dict, source: str, field: str) -> None:
+    """Save `field` as well when `source` is one of the `update_fields`
+    passed to `Model.save()`.
+    """
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and source in update_fields:
+        kwargs["update_fields"] = set(update_fields) | {field}
 
 
 class EmailSignalMixin:
@@ -10,23 +27,26 @@ class EmailSignalMixin:
 
     EMAIL_SIGNAL_MODEL = True
 
-    def email_signal_recipients(self, method_name: str) -> _t.List[str]:
-        """Return a list of email addresses to send the signal to.
+    def email_signal_recipients(self, method_name: str) -> _t.Iterable[str]:
+        """Return the email addresses to send the signal to.
 
         Args:
             method_name: The name of the method which when called will return
-                a mailing list.
+                a mailing list. The method can return a list, a generator or
+                a queryset of email addresses or of model instances with an
+                `email` field.
 
         Returns:
-            A list of email addresses to send emails to.
+            The email addresses to send emails to.
 
         """
+        from . import recipients
+
         emails = None
         if hasattr(self, method_name):
             emails = getattr(self, method_name)()
         elif "@" in method_name:
-            emails = method_name.split(",")
-            emails = [email.strip() for email in emails if email]
+            emails = list(recipients.parse_static(method_name))
         if emails is None:
             raise NotImplementedError(
                 f"{self.__class__.__name__} has no method {method_name} or "
@@ -35,6 +55,90 @@ class EmailSignalMixin:
         return emails
 
 
+class EmailSignalQuerySet(models.QuerySet):
+    """A queryset whose `bulk_create()`, `bulk_update()` and `update()` send
+    a single `bulk_post_save` for the rows they change, so that `post_save`
+    signals are evaluated for them. Use it on models with the
+    `EmailSignalMixin`, through `EmailSignalManager`.
+    """
+
+    def _send_bulk_post_save(
+        self,
+        pks: _t.List[_t.Any],
+        unsaved: _t.List[models.Model] = (),
+        created: bool = False,
+        update_fields: _t.Optional[_t.Iterable[str]] = None,
+    ) -> None:
+        if not pks and not unsaved:
+            return
+        bulk_post_save.send(
+            sender=self.model,
+            pks=pks,
+            unsaved=list(unsaved),
+            created=created,
+            update_fields=(
+                frozenset(update_fields) if update_fields is not None else None
+            ),
+            using=self.db,
+        )
+
+    def _has_listeners(self) -> bool:
+        return bulk_post_save.has_listeners(
+            self.model
+        ) and not suppression.model_suppressed(self.model, signals.post_save)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if self._has_listeners():
+            self._send_bulk_post_save(
+                [obj.pk for obj in objs if obj.pk is not None],
+                [obj for obj in objs if obj.pk is None],
+                created=True,
+            )
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        # `bulk_update()` is made up of calls to `update()`, which should
+        # not send signals of their own.
+        with suppression.suppressed([self.model], [signals.post_save]):
+            rows = super().bulk_update(objs, fields, *args, **kwargs)
+        if self._has_listeners():
+            self._send_bulk_post_save(
+                [obj.pk for obj in objs], update_fields=fields
+            )
+        return rows
+
+    bulk_update.alters_data = True
+
+    def update(self, **kwargs):
+        if (
+            not self._has_listeners()
+            or not Signal.objects.filter(
+                content_type=ContentType.objects.get_for_model(self.model),
+                signal_type=Signal.SignalTypeChoices.post_save,
+                active=True,
+            ).exists()
+        ):
+            return super().update(**kwargs)
+
+        # The rows are selected before they are updated, as the update may
+        # change the values they were filtered by.
+        with transaction.atomic(using=self.db, savepoint=False):
+            pks = list(self.values_list("pk", flat=True))
+            rows = super().update(**kwargs)
+        self._send_bulk_post_save(pks, update_fields=kwargs)
+        return rows
+
+    update.alters_data = True
+
+
+class EmailSignalManager(models.Manager.from_queryset(EmailSignalQuerySet)):
+    """A manager which sends `bulk_post_save` for bulk operations, see
+    `EmailSignalQuerySet`.
+    """
+
+
 class Signal(models.Model):
     """Stores signals to be raised by the email_signals app."""
 
@@ -45,6 +149,13 @@ class Signal(models.Model):
         post_save = "post_save", "Post Save"
         pre_delete = "pre_delete", "Pre Delete"
         post_delete = "post_delete", "Post Delete"
+        absence = "absence", "Absence"
+
+    class RenderEngineChoices(models.TextChoices):
+        """Choices for the template engine which renders the content."""
+
+        django = "django", "Django"
+        jinja2 = "jinja2", "Jinja2"
 
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
@@ -63,6 +174,13 @@ class Signal(models.Model):
         null=True,
         verbose_name="HTML content",
     )
+    html_message_processed = models.TextField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="The HTML content with its CSS inlined and minified. Set "
+        "on save when `settings.EMAIL_SIGNAL_HTML_PIPELINE` is enabled.",
+    )
     subject = models.CharField(max_length=255)
     from_email = models.EmailField(
         null=True,
@@ -86,11 +204,90 @@ class Signal(models.Model):
         max_length=20,
         choices=SignalTypeChoices.choices,
     )
+    render_engine = models.CharField(
+        max_length=10,
+        choices=RenderEngineChoices.choices,
+        blank=True,
+        default="",
+        help_text="The template engine to render the content with. If not "
+        "set, `settings.EMAIL_SIGNAL_RENDER_ENGINE` will be used.",
+    )
+    personalised = models.BooleanField(
+        default=False,
+        help_text="Render the email separately for each recipient, with the "
+        "recipient available in the content as `recipient`.",
+    )
+    digest_interval = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        help_text="When set, matches are collected for this many minutes and "
+        "sent to each recipient as a single digest email, with the matches "
+        "available in the content as `events`.",
+    )
+    rate_limit = models.CharField(
+        max_length=20,
+        blank=True,
+        default="",
+        help_text='The maximum number of emails to send, e.g: "100/m" for 100 '
+        'a minute. If not set, `settings.EMAIL_SIGNAL_RATE_LIMITS["signal"]` '
+        "will be used.",
+    )
+    dedup_window = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        help_text="When set, identical emails for the same record and "
+        "recipients are only sent once within this many seconds.",
+    )
+    dedup_by_content = models.BooleanField(
+        default=False,
+        help_text="Only treat emails as identical if the values their "
+        "content uses are the same.",
+    )
+    absence_field = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        help_text="For absence signals, the date or datetime field of the "
+        "model the delay is counted from, e.g: `created_at`. The field should "
+        "be indexed.",
+    )
+    absence_delay = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        help_text="For absence signals, the number of minutes after "
+        "`absence_field` at which a record which meets the constraints is "
+        "sent an email.",
+    )
+    template_dependencies = models.JSONField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="The context paths and the templates the content depends "
+        "on. Set on save.",
+    )
     active = models.BooleanField(default=True)
 
     def __str__(self) -> str:
         return f"({self.signal_type}): {self.name}"
 
+    def save(self, *args, **kwargs) -> None:
+        from . import dependencies
+
+        self.html_message_processed = html_pipeline.process_if_enabled(
+            self.html_message
+        )
+        _add_update_field(kwargs, "html_message", "html_message_processed")
+        self.template_dependencies = dependencies.compute(self)
+        for source in dependencies.CONTENT_FIELDS:
+            _add_update_field(kwargs, source, "template_dependencies")
+        super().save(*args, **kwargs)
+
+    def get_html_message(self) -> _t.Optional[str]:
+        """Return the HTML content to render, preferring the processed
+        content.
+        """
+        return self.html_message_processed or self.html_message
+
     def get_signal_type(self) -> signals.ModelSignal:
         """Return the signal type."""
         return getattr(signals, self.signal_type)
@@ -146,6 +343,50 @@ class Signal(models.Model):
         """Return `True` if the signal is a post delete signal."""
         return self.signal_type == self.SignalTypeChoices.post_delete
 
+    def is_absence(self) -> bool:
+        """Return `True` if the signal is an absence signal."""
+        return self.signal_type == self.SignalTypeChoices.absence
+
+
+class EmailTemplate(models.Model):
+    """Stores a template which signals can use as their `template` or
+    `{% extends %}` and `{% include %}` in their content. Served by
+    `email_signals.loaders.Loader`.
+    """
+
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        help_text="The name the template is loaded by, e.g: "
+        "`emails/base.html`.",
+    )
+    description = models.TextField(blank=True, null=True)
+    content = models.TextField()
+    content_processed = models.TextField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="The content with its CSS inlined and minified. Set on "
+        "save when `settings.EMAIL_SIGNAL_HTML_PIPELINE` is enabled.",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Email template"
+        ordering = ["name"]
+
+    def __str__(self) -> str:
+        return self.name
+
+    def save(self, *args, **kwargs) -> None:
+        self.content_processed = html_pipeline.process_if_enabled(self.content)
+        _add_update_field(kwargs, "content", "content_processed")
+        super().save(*args, **kwargs)
+
+    def get_content(self) -> str:
+        """Return the content to render, preferring the processed content."""
+        return self.content_processed or self.content
+
 
 class SignalConstraint(models.Model):
     """Stores the constraints for a signal."""
@@ -190,3 +431,228 @@ class SignalConstraint(models.Model):
 
     def __str__(self) -> str:
         return f"{self.signal.name} - {self.comparison} - {self.param_1}"
+
+
+class EmailPayload(models.Model):
+    """Stores the compressed content of a rendered email. Identical content
+    is stored once and shared.
+    """
+
+    hash = models.CharField(max_length=64, unique=True)
+    codec = models.CharField(max_length=10)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField(
+        help_text="Size of the uncompressed content in bytes."
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the payload was last stored for an email. Unused "
+        "payloads are only deleted once this is older than the cutoff.",
+    )
+
+    class Meta:
+        verbose_name = "Email payload"
+
+    def __str__(self) -> str:
+        return self.hash
+
+
+class OutboxEmail(models.Model):
+    """Stores emails which are waiting to be sent by the background worker."""
+
+    class StatusChoices(models.TextChoices):
+        """Choices for the delivery status of an email."""
+
+        pending = "pending", "Pending"
+        sent = "sent", "Sent"
+        failed = "failed", "Failed"
+
+    signal = models.ForeignKey(
+        Signal, on_delete=models.CASCADE, related_name="outbox"
+    )
+    recipients = models.JSONField()
+    context = models.JSONField(
+        blank=True,
+        null=True,
+        help_text="Snapshot of the template context captured when the "
+        "signal was raised.",
+    )
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        help_text="When set, the instance is loaded from the database when "
+        "the email is sent rather than being taken from the snapshot.",
+    )
+    object_id = models.CharField(max_length=255, blank=True, null=True)
+    payload = models.ForeignKey(
+        EmailPayload,
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        related_name="outbox",
+        help_text="When set, the email has already been rendered and is "
+        "sent as is.",
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=StatusChoices.choices,
+        default=StatusChoices.pending,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Outbox email"
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self) -> str:
+        return f"{self.signal.name} ({self.status})"
+
+
+class Digest(models.Model):
+    """Collects the events of a digest signal for a recipient until the
+    digest is sent.
+    """
+
+    signal = models.ForeignKey(
+        Signal, on_delete=models.CASCADE, related_name="digests"
+    )
+    recipient = models.CharField(max_length=254)
+    window_start = models.DateTimeField()
+    send_at = models.DateTimeField(db_index=True)
+    events = models.JSONField(
+        default=list,
+        help_text="Snapshots of the context of each event. At most "
+        "`settings.EMAIL_SIGNAL_DIGEST_MAX_EVENTS` are kept.",
+    )
+    event_count = models.PositiveIntegerField(
+        default=0,
+        help_text="The number of events, including those which were not "
+        "kept.",
+    )
+
+    class Meta:
+        verbose_name = "Digest"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["signal", "recipient", "window_start"],
+                name="email_signals_digest_unique",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.signal.name} - {self.recipient}"
+
+
+class DeliveryLog(models.Model):
+    """A record of an email which has been sent or has failed to send."""
+
+    class StatusChoices(models.TextChoices):
+        """Choices for the outcome of a delivery."""
+
+        sent = "sent", "Sent"
+        failed = "failed", "Failed"
+
+    signal = models.ForeignKey(
+        Signal,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="deliveries",
+    )
+    recipients = models.JSONField()
+    payload = models.ForeignKey(
+        EmailPayload, on_delete=models.PROTECT, related_name="deliveries"
+    )
+    status = models.CharField(max_length=10, choices=StatusChoices.choices)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Delivery log"
+
+    def __str__(self) -> str:
+        return f"{self.signal} ({self.status})"
+
+
+class Watermark(models.Model):
+    """The position up to which a signal has scanned its model's records, as
+    the value of the field they are scanned in order of, e.g: the
+    `absence_field` of an absence signal, and the primary key of the last
+    record scanned.
+    """
+
+    signal = models.OneToOneField(
+        Signal, on_delete=models.CASCADE, related_name="watermark"
+    )
+    value = models.DateTimeField()
+    last_pk = models.CharField(max_length=255, blank=True, default="")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Watermark"
+
+    def __str__(self) -> str:
+        return f"{self.signal.name} - {self.value}"
+
+
+class ChangeLog(models.Model):
+    """A row inserted or updated in the table of a registered model, written
+    by the database triggers installed by `changes.install()`.
+    """
+
+    table_name = models.CharField(max_length=255)
+    object_id = models.CharField(max_length=255)
+    operation = models.CharField(max_length=1)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Change log entry"
+        verbose_name_plural = "Change log"
+
+    def __str__(self) -> str:
+        return f"{self.operation} {self.table_name} {self.object_id}"
+
+
+class SuppressedAddress(models.Model):
+    """An email address which signal emails are not sent to, e.g: because
+    it bounced or unsubscribed. Deactivate an address, rather than deleting
+    it, for other processes to stop suppressing it.
+    """
+
+    class ReasonChoices(models.TextChoices):
+        """Choices for why an address is suppressed."""
+
+        bounce = "bounce", "Bounced"
+        complaint = "complaint", "Complained"
+        unsubscribe = "unsubscribe", "Unsubscribed"
+        manual = "manual", "Manual"
+
+    email = models.CharField(max_length=254, unique=True)
+    reason = models.CharField(
+        max_length=20,
+        choices=ReasonChoices.choices,
+        default=ReasonChoices.manual,
+    )
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Suppressed address"
+        verbose_name_plural = "Suppressed addresses"
+
+    def __str__(self) -> str:
+        return self.email
+
+    def save(self, *args, **kwargs):
+        from . import recipients
+
+        self.email = recipients.normalise(self.email).lower()
+        super().save(*args, **kwargs)
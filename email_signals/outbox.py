@@ -0,0 +1,385 @@
+"""Deferred delivery of signal emails.
+
+When `settings.EMAIL_SIGNAL_DELIVERY_MODE` is `"snapshot"` or `"reference"`,
+emails are not sent whilst the model is being saved. Instead, they are stored
+in the `OutboxEmail` table and rendered and sent later by the
+`email_signals_worker` management command.
+
+In `"snapshot"` mode the values the email needs are captured when the signal
+is raised. In `"reference"` mode only a reference to the instance is stored
+and the instance is loaded again when the email is sent, so that the email is
+rendered against fresh data. Delete signals, and `pre_save` signals for
+records which have not been created yet, are always snapshotted as there is
+no row to load.
+"""
+
+import datetime
+import typing as _t
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.mail import EmailMessage
+from django.db import connection, transaction
+from django.db.models import F, Model
+from django.utils import timezone
+from . import (
+    breaker,
+    delivery,
+    digests,
+    emailer,
+    metrics,
+    mime,
+    payloads,
+    rehydration,
+    snapshot,
+)
+from .models import DeliveryLog, OutboxEmail, Signal
+
+IMMEDIATE = "immediate"
+SNAPSHOT = "snapshot"
+REFERENCE = "reference"
+
+
+def delivery_mode() -> str:
+    """Return the configured delivery mode."""
+    return getattr(settings, "EMAIL_SIGNAL_DELIVERY_MODE", IMMEDIATE)
+
+
+def is_deferred() -> bool:
+    """Return `True` if emails should be queued rather than sent whilst the
+    signal is being handled.
+    """
+    return delivery_mode() != IMMEDIATE
+
+
+def enqueue(
+    signal: Signal,
+    recipients: _t.Iterable[str],
+    instance: Model,
+    signal_kwargs: dict,
+    send_at: _t.Optional[datetime.datetime] = None,
+) -> OutboxEmail:
+    """Queue an email for a signal which has been raised.
+
+    Args:
+        signal: The signal which was raised.
+        recipients: The email addresses to send the email to.
+        instance: The model instance the signal was raised for.
+        signal_kwargs: The kwargs retrieved from the signal handler.
+        send_at: When to send the email. Defaults to as soon as possible.
+
+    Returns:
+        The queued email.
+    """
+    send_at = send_at or timezone.now()
+    if (
+        delivery_mode() == REFERENCE
+        and instance.pk is not None
+        and not (signal.is_pre_delete() or signal.is_post_delete())
+    ):
+        return OutboxEmail.objects.create(
+            signal=signal,
+            recipients=list(recipients),
+            context=snapshot.snapshot_context(
+                signal, instance, signal_kwargs, roots=("signal_kwargs",)
+            ),
+            content_type=ContentType.objects.get_for_model(instance),
+            object_id=str(instance.pk),
+            next_attempt_at=send_at,
+        )
+
+    return OutboxEmail.objects.create(
+        signal=signal,
+        recipients=list(recipients),
+        context=snapshot.snapshot_context(signal, instance, signal_kwargs),
+        next_attempt_at=send_at,
+    )
+
+
+def enqueue_context(
+    signal: Signal, recipients: _t.Iterable[str], context: dict
+) -> OutboxEmail:
+    """Queue an email with a context which has already been snapshotted,
+    such as the summary of several events.
+
+    Args:
+        signal: The signal the email is for.
+        recipients: The email addresses to send the email to.
+        context: The snapshot of the context.
+
+    Returns:
+        The queued email.
+    """
+    return OutboxEmail.objects.create(
+        signal=signal, recipients=list(recipients), context=context
+    )
+
+
+def enqueue_message(signal: Signal, message: EmailMessage) -> OutboxEmail:
+    """Queue an email which has already been rendered. The content is
+    stored as a compressed payload which is shared with identical emails.
+
+    Args:
+        signal: The signal the email was rendered for.
+        message: The rendered email.
+
+    Returns:
+        The queued email.
+    """
+    return OutboxEmail.objects.create(
+        signal=signal,
+        recipients=list(message.recipients()),
+        payload=payloads.store(message),
+    )
+
+
+def render(
+    item: OutboxEmail, instance: _t.Optional[Model] = None
+) -> EmailMessage:
+    """Render a queued email from its stored context.
+
+    Args:
+        item: The queued email.
+        instance: The rehydrated instance for emails which reference one.
+
+    Returns:
+        The email message ready to be sent.
+    """
+    if item.payload_id is not None:
+        return payloads.to_message(item.payload, item.recipients)
+
+    signal = item.signal
+    context = snapshot.load_snapshot(item.context or {})
+    if item.object_id is not None:
+        context["instance"] = instance
+    if signal.personalised:
+        # Personalised emails are queued once per recipient.
+        context["recipient"] = item.recipients[0] if item.recipients else None
+    if snapshot.EVENTS in context and not signal.digest_interval:
+        return digests.build_folded(signal, context, item.recipients)
+    return emailer.build_email(
+        subject=signal.subject,
+        recipient_list=item.recipients,
+        plain_message=signal.plain_message,
+        html_message=signal.get_html_message(),
+        from_email=signal.from_email,
+        template=signal.template,
+        context=context,
+        signal_id=signal.pk,
+        render_engine=signal.render_engine,
+    )
+
+
+def retry_delay(attempts: int) -> datetime.timedelta:
+    """Return how long to wait before retrying an email which has failed
+    `attempts` times. The delay doubles with every attempt.
+    """
+    base = getattr(settings, "EMAIL_SIGNAL_RETRY_DELAY", 60)
+    limit = getattr(settings, "EMAIL_SIGNAL_MAX_RETRY_DELAY", 3600)
+    return datetime.timedelta(
+        seconds=min(base * 2 ** max(attempts - 1, 0), limit)
+    )
+
+
+def claim(batch_size: int) -> _t.List[OutboxEmail]:
+    """Claim a batch of emails which are due to be sent. Claimed emails are
+    not due again until their lease expires, so that concurrent workers do
+    not send the same email twice.
+
+    Args:
+        batch_size: The maximum number of emails to claim.
+
+    Returns:
+        The claimed emails.
+    """
+    now = timezone.now()
+    lease = datetime.timedelta(
+        seconds=getattr(settings, "EMAIL_SIGNAL_WORKER_LEASE", 300)
+    )
+    with transaction.atomic():
+        pks = list(
+            OutboxEmail.objects.select_for_update(
+                skip_locked=connection.features.has_select_for_update_skip_locked  # noqa: E501
+            )
+            .filter(
+                status=OutboxEmail.StatusChoices.pending,
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at", "pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        OutboxEmail.objects.filter(pk__in=pks).update(
+            attempts=F("attempts") + 1, next_attempt_at=now + lease
+        )
+    return list(
+        OutboxEmail.objects.filter(pk__in=pks)
+        .select_related("signal", "content_type", "payload")
+        .order_by("pk")
+    )
+
+
+def send(messages: _t.List[EmailMessage]) -> _t.List[delivery.DeliveryResult]:
+    """Send messages through the email backend's circuit breaker, with the
+    asynchronous engine when `settings.EMAIL_SIGNAL_ASYNC_DELIVERY` is
+    enabled, otherwise with Django's email backend. Whilst the circuit is
+    open, every message fails with a `breaker.CircuitOpenError`.
+    """
+    if not messages:
+        return []
+    circuit = breaker.get_breaker()
+    if not circuit.allow():
+        error = breaker.CircuitOpenError(
+            f"The {circuit.name} circuit is open."
+        )
+        return [
+            delivery.DeliveryResult(
+                message=message, ok=False, error=error, temporary=True
+            )
+            for message in messages
+        ]
+    if getattr(settings, "EMAIL_SIGNAL_ASYNC_DELIVERY", False):
+        results = delivery.deliver(messages)
+    else:
+        results = delivery.deliver_sync(messages)
+    # The batch only counts as a failure when no message got through and
+    # the relay itself failed.
+    if any(result.ok for result in results):
+        circuit.record(None)
+    else:
+        circuit.record(
+            next(
+                (
+                    result.error
+                    for result in results
+                    if result.error is not None
+                    and delivery.is_backend_error(result.error)
+                ),
+                None,
+            )
+        )
+    return results
+
+
+def _record_failure(item: OutboxEmail, error: BaseException, temporary: bool):
+    """Record a failed attempt, scheduling a retry if it is worth one."""
+    max_attempts = getattr(settings, "EMAIL_SIGNAL_MAX_ATTEMPTS", 5)
+    item.last_error = f"{error.__class__.__name__}: {error}"
+    if temporary and item.attempts < max_attempts:
+        item.status = OutboxEmail.StatusChoices.pending
+        item.next_attempt_at = timezone.now() + retry_delay(item.attempts)
+    else:
+        item.status = OutboxEmail.StatusChoices.failed
+
+
+def log_deliveries(
+    outcomes: _t.Iterable[
+        _t.Tuple[Signal, EmailMessage, delivery.DeliveryResult]
+    ]
+):
+    """Record the outcome of sent emails in the `DeliveryLog` table when
+    `settings.EMAIL_SIGNAL_DELIVERY_LOG` is enabled. The rendered content is
+    stored as a compressed payload which is shared with identical emails.
+
+    Args:
+        outcomes: The signal, message and delivery result of each email.
+    """
+    if not getattr(settings, "EMAIL_SIGNAL_DELIVERY_LOG", False):
+        return
+    DeliveryLog.objects.bulk_create(
+        DeliveryLog(
+            signal=signal,
+            recipients=list(message.recipients()),
+            payload=payloads.store(message),
+            status=(
+                DeliveryLog.StatusChoices.sent
+                if result.ok
+                else DeliveryLog.StatusChoices.failed
+            ),
+            error="" if result.ok else str(result.error),
+        )
+        for signal, message, result in outcomes
+    )
+
+
+def process_outbox(batch_size: int = 100) -> int:
+    """Send a batch of queued emails, recording the outcome of each one.
+
+    Args:
+        batch_size: The maximum number of emails to send.
+
+    Returns:
+        The number of emails that were processed.
+    """
+    items = claim(batch_size)
+    instances = rehydration.rehydrate(items)
+    to_send = []
+    for item in items:
+        try:
+            if item.object_id is not None and item.pk not in instances:
+                raise ObjectDoesNotExist(
+                    f"{item.content_type} {item.object_id} no longer exists."
+                )
+            to_send.append((item, render(item, instances.get(item.pk))))
+        except Exception as error:
+            _record_failure(item, error, temporary=False)
+
+    # Each email is split into messages of at most
+    # `settings.EMAIL_SIGNAL_MAX_RCPT` recipients, like emails sent straight
+    # away.
+    parts = [
+        (item, part)
+        for item, message in to_send
+        for part in mime.split_message(message)
+    ]
+    results = send([part for _, part in parts])
+    outcomes = {}
+    for (item, _), result in zip(parts, results):
+        outcomes.setdefault(item.pk, (item, []))[1].append(result)
+    for item, item_results in outcomes.values():
+        if isinstance(item_results[0].error, breaker.CircuitOpenError):
+            # Not an attempt: retry once the circuit may have closed.
+            item.attempts -= 1
+            item.next_attempt_at = timezone.now() + datetime.timedelta(
+                seconds=breaker.get_breaker().cooldown
+            )
+            item.last_error = str(item_results[0].error)
+            metrics.incr("emails.deferred")
+            continue
+        failed = [result for result in item_results if not result.ok]
+        metrics.incr("emails.sent", len(item_results) - len(failed))
+        metrics.incr("emails.failed", len(failed))
+        if not failed:
+            item.status = OutboxEmail.StatusChoices.sent
+            item.sent_at = timezone.now()
+            item.last_error = ""
+            continue
+        if len(failed) < len(item_results):
+            # Only retry the recipients whose messages failed.
+            item.recipients = [
+                recipient
+                for result in failed
+                for recipient in result.message.recipients()
+            ]
+        _record_failure(
+            item,
+            failed[0].error,
+            all(result.temporary for result in failed),
+        )
+    log_deliveries(
+        (item.signal, part, result)
+        for (item, part), result in zip(parts, results)
+        if not isinstance(result.error, breaker.CircuitOpenError)
+    )
+
+    OutboxEmail.objects.bulk_update(
+        items,
+        [
+            "status",
+            "attempts",
+            "next_attempt_at",
+            "last_error",
+            "sent_at",
+            "recipients",
+        ],
+    )
+    return len(items)
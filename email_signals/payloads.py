@@ -0,0 +1,150 @@
+"""Compressed, deduplicated storage of rendered email content.
+
+Rendered emails are stored as `EmailPayload` rows which are shared by every
+queued email and delivery log entry with the same content. The content is
+compressed with zstd when the optional `zstandard` package is installed and
+zlib otherwise.
+"""
+
+import hashlib
+import json
+import typing as _t
+import zlib
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import EmailPayload
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+ZLIB = "zlib"
+ZSTD = "zstd"
+NONE = "none"
+
+
+def default_codec() -> str:
+    """Return the codec new payloads are compressed with. Defaults to zstd
+    if the `zstandard` package is installed and zlib otherwise.
+    """
+    codec = getattr(settings, "EMAIL_SIGNAL_PAYLOAD_CODEC", None)
+    if codec is None:
+        return ZSTD if zstandard is not None else ZLIB
+    if codec == ZSTD and zstandard is None:
+        raise ImproperlyConfigured(
+            "The zstd payload codec requires the `zstandard` package."
+        )
+    return codec
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    """Compress `data` with `codec`."""
+    if codec == ZSTD:
+        return zstandard.ZstdCompressor().compress(data)
+    if codec == ZLIB:
+        return zlib.compress(data)
+    if codec == NONE:
+        return data
+    raise ValueError(f"Unknown payload codec: {codec}")
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    """Decompress `data` which was compressed with `codec`."""
+    data = bytes(data)
+    if codec == ZSTD:
+        if zstandard is None:
+            raise ImproperlyConfigured(
+                "Reading zstd payloads requires the `zstandard` package."
+            )
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == ZLIB:
+        return zlib.decompress(data)
+    if codec == NONE:
+        return data
+    raise ValueError(f"Unknown payload codec: {codec}")
+
+
+def encode_message(message: EmailMessage) -> bytes:
+    """Serialise the content of a message. Recipients are not included so
+    that the same content sent to different recipients is only stored once.
+    """
+    content = {
+        "subject": message.subject,
+        "body": message.body,
+        "from_email": message.from_email,
+        "alternatives": [
+            list(alternative)
+            for alternative in getattr(message, "alternatives", [])
+        ],
+    }
+    return json.dumps(content, sort_keys=True).encode("utf-8")
+
+
+def store(message: EmailMessage) -> EmailPayload:
+    """Store the content of a message, reusing an existing payload with the
+    same content. A reused payload's `last_used_at` is updated, so that
+    `retention.compact()` does not delete it before the row that uses it is
+    saved.
+
+    Args:
+        message: The rendered message.
+
+    Returns:
+        The stored payload.
+    """
+    data = encode_message(message)
+    digest = hashlib.sha256(data).hexdigest()
+    payload = EmailPayload.objects.filter(hash=digest).first()
+    if payload is not None:
+        payload.last_used_at = timezone.now()
+        # Nothing is updated if the payload has been deleted since.
+        if EmailPayload.objects.filter(pk=payload.pk).update(
+            last_used_at=payload.last_used_at
+        ):
+            return payload
+
+    codec = default_codec()
+    try:
+        with transaction.atomic():
+            return EmailPayload.objects.create(
+                hash=digest,
+                codec=codec,
+                data=compress(data, codec),
+                size=len(data),
+            )
+    except IntegrityError:
+        # Stored by someone else in the meantime.
+        return EmailPayload.objects.get(hash=digest)
+
+
+def load(payload: EmailPayload) -> dict:
+    """Return the content of a stored payload."""
+    return json.loads(decompress(payload.data, payload.codec))
+
+
+def to_message(
+    payload: EmailPayload, recipients: _t.List[str]
+) -> EmailMultiAlternatives:
+    """Build a message from a stored payload.
+
+    Args:
+        payload: The stored payload.
+        recipients: The email addresses to send the message to.
+
+    Returns:
+        The message ready to be sent.
+    """
+    content = load(payload)
+    message = EmailMultiAlternatives(
+        subject=content["subject"],
+        body=content["body"],
+        from_email=content["from_email"],
+        to=recipients,
+    )
+    for alternative, mimetype in content["alternatives"]:
+        message.attach_alternative(alternative, mimetype)
+    return message
@@ -0,0 +1,129 @@
+"""Renders personalised emails, one per recipient, on a pool of threads.
+
+The first recipient's email is rendered on the calling thread, which
+compiles the signal's content and loads the relations it uses, so the
+remaining recipients only substitute their context into the compiled
+template. Results are yielded in order as they are rendered, with a bounded
+number of renders in flight, so that emails can be sent while later ones are
+still being rendered and only a few bodies are held in memory at a time.
+
+Pool threads query the database over their own connections, which can't see
+writes the calling thread has not committed. Inside a transaction, every
+email is therefore rendered on the calling thread. The connections pool
+threads open are closed once, when the pool shuts down.
+"""
+
+import contextvars
+import typing as _t
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections
+
+T = _t.TypeVar("T")
+R = _t.TypeVar("R")
+
+
+def render_workers() -> int:
+    """Return the number of threads personalised emails are rendered on."""
+    return getattr(settings, "EMAIL_SIGNAL_RENDER_WORKERS", 4)
+
+
+def in_transaction() -> bool:
+    """Return `True` if the calling thread is in a transaction on any
+    database.
+    """
+    return any(connection.in_atomic_block for connection in connections.all())
+
+
+def _run(
+    render: _t.Callable[[T], R], item: T, opened: _t.Dict[int, _t.Any]
+) -> R:
+    """Render an item on a pool thread and record the database connections
+    the thread has opened, so that they can be closed when the pool shuts
+    down.
+    """
+    try:
+        return render(item)
+    finally:
+        for connection in connections.all():
+            if connection.connection is not None and (
+                id(connection) not in opened
+            ):
+                # Allows the calling thread to close the connection.
+                connection.inc_thread_sharing()
+                opened[id(connection)] = connection
+
+
+def _close(opened: _t.Dict[int, _t.Any]) -> None:
+    """Close the connections opened by pool threads."""
+    for connection in opened.values():
+        try:
+            connection.close()
+        finally:
+            connection.dec_thread_sharing()
+
+
+def render_each(
+    render: _t.Callable[[T], R],
+    items: _t.Iterable[T],
+    workers: _t.Optional[int] = None,
+) -> _t.Iterator[_t.Tuple[T, R]]:
+    """Render each item on a pool of threads.
+
+    Renders run in a copy of the calling thread's context, so that any
+    `budgets` which have been set apply to them. Inside a transaction, every
+    item is rendered on the calling thread.
+
+    Args:
+        render: Renders a single item.
+        items: The items to render.
+        workers: The number of threads. Defaults to
+            `settings.EMAIL_SIGNAL_RENDER_WORKERS`.
+
+    Yields:
+        `(item, result)` tuples in the order of `items`. An exception raised
+        while rendering an item is raised when its result is reached.
+    """
+    items = iter(items)
+    for first in items:
+        yield first, render(first)
+        break
+    else:
+        return
+
+    if in_transaction():
+        for item in items:
+            yield item, render(item)
+        return
+
+    workers = max(1, workers or render_workers())
+    pending = deque()
+    opened = {}
+    try:
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="email_signals"
+        ) as pool:
+            try:
+                for item in items:
+                    future = pool.submit(
+                        contextvars.copy_context().run,
+                        _run,
+                        render,
+                        item,
+                        opened,
+                    )
+                    pending.append((item, future))
+                    if len(pending) >= workers * 2:
+                        item, future = pending.popleft()
+                        yield item, future.result()
+                while pending:
+                    item, future = pending.popleft()
+                    yield item, future.result()
+            finally:
+                # Stop renders which have not started when the caller stops
+                # early or a render fails.
+                for _, future in pending:
+                    future.cancel()
+    finally:
+        _close(opened)
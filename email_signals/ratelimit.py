@@ -0,0 +1,183 @@
+"""Rate limits for the emails sent by signals.
+
+Limits are set globally, per signal and per recipient with
+`settings.EMAIL_SIGNAL_RATE_LIMITS`, e.g::
+
+    EMAIL_SIGNAL_RATE_LIMITS = {
+        "global": "1000/m",
+        "signal": "100/m",
+        "recipient": "20/h",
+    }
+
+A signal's own `rate_limit` overrides the `"signal"` limit. Each limit is a
+bucket of `limit` tokens which refills continuously over its period. Buckets
+are kept in Django's cache as a counter per period, using only `add()` and
+atomic `incr()`, and the tokens left are estimated from the current and
+previous counters, so a check costs a constant number of cache operations.
+
+Emails over a limit still use up tokens, so that delayed emails are spread
+out at the limit's rate rather than all being sent when the bucket refills.
+"""
+
+import hashlib
+import re
+import time
+import typing as _t
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import caches
+from . import recipients
+
+GLOBAL = "global"
+SIGNAL = "signal"
+RECIPIENT = "recipient"
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_RATE_RE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*([smhd])\s*$")
+
+
+class Rate(_t.NamedTuple):
+    """A number of emails per period."""
+
+    limit: int
+    period: int
+
+
+@lru_cache(maxsize=128)
+def parse_rate(value: str) -> Rate:
+    """Parse a rate such as `"100/m"` (100 a minute) or `"10/5s"` (10 every
+    5 seconds). Units are `s`, `m`, `h` and `d`.
+
+    Raises:
+        ValueError: If the rate is invalid.
+    """
+    match = _RATE_RE.match(value or "")
+    if match is None or int(match.group(1)) < 1:
+        raise ValueError(
+            f'Invalid rate "{value}". Use "<count>/<unit>", e.g: "100/m".'
+        )
+    count, multiplier, unit = match.groups()
+    return Rate(int(count), int(multiplier or 1) * _UNITS[unit])
+
+
+def get_rate(scope: str, signal=None) -> _t.Optional[Rate]:
+    """Return the rate of a scope, or `None` if it is not limited.
+
+    Args:
+        scope: `GLOBAL`, `SIGNAL` or `RECIPIENT`.
+        signal: The signal whose own limit overrides the `SIGNAL` limit.
+    """
+    if scope == SIGNAL and signal is not None and signal.rate_limit:
+        return parse_rate(signal.rate_limit)
+    value = getattr(settings, "EMAIL_SIGNAL_RATE_LIMITS", {}).get(scope)
+    return parse_rate(value) if value else None
+
+
+def fallback() -> str:
+    """Return what happens to emails over a limit: `"outbox"` (delayed),
+    `"digest"` or `"drop"`.
+    """
+    return getattr(settings, "EMAIL_SIGNAL_RATE_LIMIT_FALLBACK", "outbox")
+
+
+def _cache():
+    return caches[
+        getattr(settings, "EMAIL_SIGNAL_RATE_LIMIT_CACHE", "default")
+    ]
+
+
+def _key(scope: str, window: int) -> str:
+    return f"email_signals:ratelimit:{scope}:{window}"
+
+
+def acquire(scope: str, rate: Rate, now: _t.Optional[float] = None) -> float:
+    """Take a token from a bucket.
+
+    Args:
+        scope: The name of the bucket.
+        rate: The bucket's rate.
+        now: The current time. Defaults to `time.time()`.
+
+    Returns:
+        `0` if the bucket had a token, otherwise the number of seconds
+        until there would be one for this email.
+    """
+    now = time.time() if now is None else now
+    window, offset = divmod(now, rate.period)
+    key = _key(scope, int(window))
+    cache = _cache()
+    cache.add(key, 0, rate.period * 2)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # The counter was evicted between `add()` and `incr()`.
+        cache.set(key, 1, rate.period * 2)
+        count = 1
+    previous = cache.get(_key(scope, int(window) - 1), 0)
+    used = previous * (1 - offset / rate.period) + count
+    if used <= rate.limit:
+        return 0.0
+    return (used - rate.limit) * rate.period / rate.limit
+
+
+def check(signal, now: _t.Optional[float] = None) -> float:
+    """Take a token from the global and the signal's buckets.
+
+    Args:
+        signal: The signal which is sending an email.
+        now: The current time. Defaults to `time.time()`.
+
+    Returns:
+        `0` if the email is within the limits, otherwise the number of
+        seconds it should be delayed by.
+    """
+    delay = 0.0
+    for scope, rate in (
+        (GLOBAL, get_rate(GLOBAL)),
+        (f"{SIGNAL}:{signal.pk}", get_rate(SIGNAL, signal)),
+    ):
+        if rate is not None:
+            delay = max(delay, acquire(scope, rate, now))
+    return delay
+
+
+def filter_recipients(
+    mailing_list: _t.Iterable[_t.Any],
+    on_limited: _t.Callable[[_t.List[str], float], None],
+) -> _t.Iterable[_t.Any]:
+    """Leave out the recipients who are over the per recipient limit.
+
+    Args:
+        mailing_list: The recipients, as returned by the mailing list.
+        on_limited: Called with chunks of the email addresses which are over
+            the limit and the number of seconds to delay them by.
+
+    Returns:
+        The recipients within the limit. `mailing_list` is returned as is
+        when there is no per recipient limit.
+    """
+    rate = get_rate(RECIPIENT)
+    if rate is None:
+        return mailing_list
+    return _filter_recipients(mailing_list, rate, on_limited)
+
+
+def _filter_recipients(
+    mailing_list: _t.Iterable[_t.Any],
+    rate: Rate,
+    on_limited: _t.Callable[[_t.List[str], float], None],
+) -> _t.Iterator[_t.Any]:
+    limited, delay = [], 0.0
+    for email, recipient in recipients.iter_entries(mailing_list):
+        digest = hashlib.sha1(email.lower().encode("utf-8")).hexdigest()
+        recipient_delay = acquire(f"{RECIPIENT}:{digest}", rate)
+        if not recipient_delay:
+            yield recipient
+            continue
+        limited.append(email)
+        delay = max(delay, recipient_delay)
+        if len(limited) >= recipients.chunk_size():
+            on_limited(limited, delay)
+            limited, delay = [], 0.0
+    if limited:
+        on_limited(limited, delay)
@@ -0,0 +1,147 @@
+"""Streams the recipients of a signal in bounded chunks.
+
+Mailing list methods can return a list, a generator or a queryset. Querysets
+are read with `.iterator()`, so that a mailing list of any size is held in
+memory one chunk at a time. Addresses are stripped of whitespace, repeated
+addresses, ignoring case, are sent to once and addresses on the
+`suppression_list` are left out.
+
+So that memory stays flat however long a streamed mailing list is, repeats
+are only looked for among the last chunk's worth of addresses. An address
+repeated further apart than that is sent to again, so order querysets by
+email for them to be removed throughout.
+"""
+
+import itertools
+import typing as _t
+from collections import OrderedDict
+from functools import lru_cache
+from django.conf import settings
+from django.db.models import QuerySet
+from . import metrics, suppression_list
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def chunk_size() -> int:
+    """Return the maximum number of recipients sent to at a time."""
+    return getattr(
+        settings, "EMAIL_SIGNAL_RECIPIENT_CHUNK_SIZE", DEFAULT_CHUNK_SIZE
+    )
+
+
+def _email(recipient: _t.Any) -> str:
+    """Return the email address of a recipient, which is either an email
+    address or a model instance with an email field.
+    """
+    if isinstance(recipient, str):
+        return recipient
+    if hasattr(recipient, "get_email_field_name"):
+        return getattr(recipient, recipient.get_email_field_name())
+    return recipient.email
+
+
+def normalise(email: str) -> str:
+    """Return an email address without surrounding whitespace. Addresses are
+    compared case insensitively, but sent to as they were given.
+    """
+    return email.strip()
+
+
+@lru_cache(maxsize=256)
+def parse_static(mailing_list: str) -> _t.Tuple[str, ...]:
+    """Parse a comma separated mailing list into its normalised addresses,
+    without repeats, ignoring case. The result is cached, as a signal's
+    static mailing list is the same every time it is sent.
+    """
+    emails, seen = [], set()
+    for email in mailing_list.split(","):
+        email = normalise(email)
+        if email and email.lower() not in seen:
+            seen.add(email.lower())
+            emails.append(email)
+    return tuple(emails)
+
+
+def iter_entries(
+    recipients: _t.Iterable[_t.Any], size: _t.Optional[int] = None
+) -> _t.Iterator[_t.Tuple[str, _t.Any]]:
+    """Iterate over the recipients in a mailing list along with their email
+    addresses.
+
+    Args:
+        recipients: Email addresses or model instances with an `email`
+            field, e.g: `User.objects.values_list("email", flat=True)`.
+            Querysets are streamed from the database.
+        size: The number of rows to fetch from the database at a time.
+            Defaults to `settings.EMAIL_SIGNAL_RECIPIENT_CHUNK_SIZE`.
+
+    Yields:
+        `(email, recipient)` tuples, where `recipient` is the item from the
+        mailing list and `email` is normalised. Recipients without an email
+        address, addresses repeated within the last `size` addresses and
+        suppressed addresses are skipped.
+    """
+    size = max(1, size or chunk_size())
+    if isinstance(recipients, QuerySet):
+        recipients = recipients.iterator(chunk_size=size)
+    suppressed = suppression_list.addresses()
+    # The last `size` addresses, least recently seen first.
+    seen = OrderedDict()
+    for recipient in recipients:
+        email = _email(recipient)
+        if not email:
+            continue
+        email = normalise(email)
+        key = email.lower()
+        if key in seen:
+            seen.move_to_end(key)
+            continue
+        seen[key] = None
+        if len(seen) > size:
+            seen.popitem(last=False)
+        if key in suppressed:
+            metrics.incr("recipients.suppressed")
+            continue
+        yield email, recipient
+
+
+def iter_recipients(
+    recipients: _t.Iterable[_t.Any], size: _t.Optional[int] = None
+) -> _t.Iterator[str]:
+    """Iterate over the email addresses in a mailing list.
+
+    Args:
+        recipients: Email addresses or model instances with an `email`
+            field. Querysets are streamed from the database.
+        size: The number of rows to fetch from the database at a time.
+            Defaults to `settings.EMAIL_SIGNAL_RECIPIENT_CHUNK_SIZE`.
+
+    Yields:
+        The email addresses. Empty addresses are skipped.
+    """
+    for email, _ in iter_entries(recipients, size):
+        yield email
+
+
+def chunked(
+    recipients: _t.Iterable[_t.Any], size: _t.Optional[int] = None
+) -> _t.Iterator[_t.List[str]]:
+    """Split a mailing list into chunks of email addresses.
+
+    Args:
+        recipients: Email addresses or model instances with an `email`
+            field. Querysets are streamed from the database.
+        size: The maximum number of addresses per chunk. Defaults to
+            `settings.EMAIL_SIGNAL_RECIPIENT_CHUNK_SIZE`.
+
+    Yields:
+        Lists of at most `size` email addresses.
+    """
+    size = max(1, size or chunk_size())
+    emails = iter_recipients(recipients, size)
+    while True:
+        chunk = list(itertools.islice(emails, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,119 @@
+"""Loads the model instances referenced by queued emails in bulk.
+
+Queued emails are grouped by model and each model's instances are fetched
+with a single `in_bulk()` query. Relations used by the signals' content are
+fetched in the same query (`select_related`) or in one extra query per
+relation (`prefetch_related`) rather than once per email.
+"""
+
+import typing as _t
+from collections import defaultdict
+from functools import lru_cache
+from django.db.models import Field, ForeignObjectRel, Model
+from django.db.models.base import ModelBase
+from . import rendering, snapshot
+
+
+@lru_cache(maxsize=None)
+def _relations(model: ModelBase) -> _t.Dict[str, Field]:
+    """Return the relation fields of a model keyed by the name they are
+    accessed by on an instance.
+    """
+    relations = {}
+    for field in model._meta.get_fields():
+        if not field.is_relation or field.related_model is None:
+            continue
+        if isinstance(field, ForeignObjectRel):
+            accessor = field.get_accessor_name()
+            if accessor:
+                relations[accessor] = field
+        else:
+            relations[field.name] = field
+    return relations
+
+
+def query_plan(
+    model: ModelBase, paths: _t.Iterable[str]
+) -> _t.Tuple[_t.List[str], _t.List[str]]:
+    """Work out which relations to load alongside `model` so that rendering
+    the `instance` paths does not cause a query per instance.
+
+    Single valued relations (foreign keys and one to one relations) are
+    joined with `select_related`. Multi valued relations and anything
+    reached through them are fetched with `prefetch_related`.
+
+    Args:
+        model: The model the paths are relative to.
+        paths: Template context paths, e.g: `instance.customer.name`. Paths
+            which do not start with `instance` are ignored.
+
+    Returns:
+        The `select_related` and `prefetch_related` lookups.
+    """
+    select_related, prefetch_related = set(), set()
+    for path in paths:
+        segments = path.split(".")
+        if segments[0] != "instance":
+            continue
+
+        current, lookup, prefetching = model, [], False
+        for segment in segments[1:]:
+            if segment == snapshot.ITEMS or (prefetching and segment == "all"):
+                continue
+            field = _relations(current).get(segment)
+            if field is None:
+                break
+            lookup.append(segment)
+            if field.many_to_many or field.one_to_many:
+                prefetching = True
+            target = prefetch_related if prefetching else select_related
+            target.add("__".join(lookup))
+            current = field.related_model
+
+    return sorted(select_related), sorted(prefetch_related)
+
+
+def rehydrate(items: _t.Iterable[Model]) -> _t.Dict[_t.Any, Model]:
+    """Load the instances referenced by queued emails with one `in_bulk()`
+    query per model.
+
+    Args:
+        items: `OutboxEmail` instances. Those without a referenced instance
+            are ignored.
+
+    Returns:
+        The loaded instances keyed by the primary key of the queued email
+        which references them. Emails whose instance no longer exists are
+        left out.
+    """
+    groups = defaultdict(list)
+    for item in items:
+        if item.object_id is not None:
+            groups[item.content_type].append(item)
+
+    instances = {}
+    for content_type, group in groups.items():
+        model = content_type.model_class()
+        if model is None:
+            continue
+
+        paths = set()
+        for signal in {item.signal for item in group}:
+            try:
+                paths |= snapshot.signal_paths(signal)
+            except rendering.TEMPLATE_ERRORS:
+                # The email will fail to render and be marked as failed.
+                continue
+        select_related, prefetch_related = query_plan(model, paths)
+
+        pk_field = model._meta.pk
+        found = (
+            model._default_manager.select_related(*select_related)
+            .prefetch_related(*prefetch_related)
+            .in_bulk({pk_field.to_python(item.object_id) for item in group})
+        )
+        for item in group:
+            instance = found.get(pk_field.to_python(item.object_id))
+            if instance is not None:
+                instances[item.pk] = instance
+    return instances
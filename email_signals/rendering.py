@@ -0,0 +1,273 @@
+"""Renders signal content with the Django template engine or with Jinja2.
+
+The engine is chosen per signal with `Signal.render_engine`, falling back to
+`settings.EMAIL_SIGNAL_RENDER_ENGINE` (`"django"` by default). Jinja2 is an
+optional dependency (`pip install django-email-signals[jinja2]`).
+
+Jinja2 content is rendered in a sandbox, as signal content is written in the
+admin: attributes starting with an underscore can't be read and methods which
+alter data, such as `delete()`, can't be called.
+
+Jinja2 compiles each template once per process and, with a bytecode cache,
+stores the compiled bytecode on the filesystem or in a Django cache so that
+other processes can skip compiling. Inline content is served by a loader
+under a name derived from a hash of the content so that it can be bytecode
+cached as well.
+"""
+
+import hashlib
+import threading
+import typing as _t
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+from django.template.utils import get_app_template_dirs
+from . import budgets, utils
+
+try:
+    import jinja2
+    import jinja2.sandbox
+    import markupsafe
+except ImportError:  # pragma: no cover
+    jinja2 = None
+
+DJANGO = "django"
+JINJA2 = "jinja2"
+
+#: Errors raised by the engines when a template is missing.
+TEMPLATE_NOT_FOUND = (TemplateDoesNotExist,) + (
+    (jinja2.TemplateNotFound,) if jinja2 else ()
+)
+
+#: Errors raised by the engines when a template is missing or invalid.
+TEMPLATE_ERRORS = (TemplateDoesNotExist, TemplateSyntaxError) + (
+    (jinja2.TemplateError,) if jinja2 else ()
+)
+
+#: Prefix of the names inline content is loaded under.
+INLINE_PREFIX = "email_signals:inline/"
+
+_environment = None
+_environment_lock = threading.Lock()
+#: The most recently registered inline content, by name. Guarded by
+#: `_inline_lock`, as content is registered and rendered by pool threads.
+_inline_sources: "OrderedDict[str, str]" = OrderedDict()
+_inline_lock = threading.Lock()
+_INLINE_MAX_SIZE = 1024
+
+
+def resolve_engine(name: _t.Optional[str] = None) -> str:
+    """Return `name`, or the default engine if it is not set.
+
+    Args:
+        name: The name of an engine, e.g: `Signal.render_engine`.
+    """
+    name = name or getattr(settings, "EMAIL_SIGNAL_RENDER_ENGINE", DJANGO)
+    if name not in (DJANGO, JINJA2):
+        raise ImproperlyConfigured(f"Unknown render engine: {name}")
+    return name
+
+
+def engine_name(signal=None) -> str:
+    """Return the name of the engine which renders a signal's content.
+
+    Args:
+        signal: The `Signal` instance. If not given, the default engine is
+            returned.
+    """
+    return resolve_engine(getattr(signal, "render_engine", None))
+
+
+def _template_dirs() -> _t.List[str]:
+    """Return the directories the Django template engines search."""
+    dirs = []
+    for backend in getattr(settings, "TEMPLATES", []):
+        dirs.extend(str(path) for path in backend.get("DIRS", []))
+        if backend.get("APP_DIRS"):
+            dirs.extend(
+                str(path) for path in get_app_template_dirs("templates")
+            )
+    return dirs
+
+
+class InlineLoader(jinja2.BaseLoader if jinja2 else object):
+    """Loads inline content which has been registered with
+    `inline_template_name`.
+    """
+
+    def get_source(self, environment, template):
+        if not template.startswith(INLINE_PREFIX):
+            raise jinja2.TemplateNotFound(template)
+        with _inline_lock:
+            source = _inline_sources.get(template)
+        if source is None:
+            raise jinja2.TemplateNotFound(template)
+        return source, None, lambda: True
+
+
+def _bytecode_cache():
+    """Return the bytecode cache configured by
+    `settings.EMAIL_SIGNAL_JINJA2_BYTECODE_CACHE`.
+    """
+    kind = getattr(
+        settings, "EMAIL_SIGNAL_JINJA2_BYTECODE_CACHE", "filesystem"
+    )
+    if not kind:
+        return None
+    if kind == "filesystem":
+        return jinja2.FileSystemBytecodeCache(
+            getattr(settings, "EMAIL_SIGNAL_JINJA2_BYTECODE_DIR", None),
+            pattern="email_signals_%s.cache",
+        )
+    if kind == "cache":
+        # Django's cache API is compatible with the memcached client this
+        # bytecode cache expects.
+        return jinja2.MemcachedBytecodeCache(
+            caches[getattr(settings, "EMAIL_SIGNAL_JINJA2_CACHE", "default")],
+            prefix="email_signals:jinja2:",
+        )
+    raise ImproperlyConfigured(f"Unknown Jinja2 bytecode cache: {kind}")
+
+
+def _email_fragment(context, name: str, *vary_on) -> str:
+    """Render a template whose output is shared by many emails and cache
+    its output. The Jinja2 counterpart of `{% email_fragment %}`.
+    """
+    from . import fragments
+
+    output = fragments.get_or_render(
+        name,
+        vary_on,
+        lambda: context.environment.get_template(name).render(
+            context.get_all()
+        ),
+        JINJA2,
+    )
+    return markupsafe.Markup(output)
+
+
+if jinja2 is not None:
+    _email_fragment = jinja2.pass_context(_email_fragment)
+
+
+def jinja2_environment():
+    """Return the Jinja2 environment used to render signal content. Template
+    files are loaded from the same directories as Django's template engines
+    and then from the `EmailTemplate` table.
+    """
+    global _environment
+    if jinja2 is None:
+        raise ImproperlyConfigured(
+            "`jinja2` is required to render emails with Jinja2. Install it "
+            "with `pip install jinja2`."
+        )
+    from . import loaders
+
+    with _environment_lock:
+        if _environment is None:
+            _environment = jinja2.sandbox.SandboxedEnvironment(
+                loader=jinja2.ChoiceLoader(
+                    [
+                        InlineLoader(),
+                        jinja2.FileSystemLoader(_template_dirs()),
+                        jinja2.FunctionLoader(loaders.jinja2_source),
+                    ]
+                ),
+                autoescape=True,
+                keep_trailing_newline=True,
+                bytecode_cache=_bytecode_cache(),
+                cache_size=getattr(
+                    settings, "EMAIL_SIGNAL_TEMPLATE_CACHE_SIZE", 256
+                ),
+            )
+            _environment.globals["email_fragment"] = _email_fragment
+        return _environment
+
+
+def inline_template_name(source: str) -> str:
+    """Register inline content with the Jinja2 loader and return the name it
+    can be loaded by.
+    """
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()
+    name = f"{INLINE_PREFIX}{digest}"
+    with _inline_lock:
+        if name in _inline_sources:
+            _inline_sources.move_to_end(name)
+        else:
+            # Content is registered again before every render, so only the
+            # least recently used content is evicted.
+            _inline_sources[name] = source
+            if len(_inline_sources) > _INLINE_MAX_SIZE:
+                _inline_sources.popitem(last=False)
+    return name
+
+
+def render_string(
+    source: str,
+    context: dict,
+    engine: _t.Optional[str] = None,
+    signal_id: _t.Optional[_t.Any] = None,
+    field: _t.Optional[str] = None,
+) -> str:
+    """Render inline content.
+
+    Args:
+        source: The template string.
+        context: The context to render the string with.
+        engine: The engine to render with. Defaults to
+            `settings.EMAIL_SIGNAL_RENDER_ENGINE`.
+        signal_id: The id of the signal the string belongs to, if any.
+        field: The name of the signal field the string came from, if any.
+
+    Returns:
+        The rendered string.
+    """
+    if resolve_engine(engine) == JINJA2:
+        environment = jinja2_environment()
+        name = inline_template_name(str(source))
+        return budgets.render_jinja2(environment.get_template(name), context)
+    return utils.add_context_to_string(source, context, signal_id, field)
+
+
+def render_template(
+    template_name: str, context: dict, engine: _t.Optional[str] = None
+) -> str:
+    """Render a template file.
+
+    Args:
+        template_name: The name of the template as passed to the template
+            loader.
+        context: The context to render the template with.
+        engine: The engine to render with. Defaults to
+            `settings.EMAIL_SIGNAL_RENDER_ENGINE`.
+
+    Returns:
+        The rendered template.
+    """
+    if resolve_engine(engine) == JINJA2:
+        template = jinja2_environment().get_template(template_name)
+        return budgets.render_jinja2(template, context)
+    return budgets.render_django(get_template(template_name), context or {})
+
+
+def reset() -> None:
+    """Discard the Jinja2 environment so that it is recreated from the
+    current settings.
+    """
+    global _environment
+    with _environment_lock:
+        _environment = None
+    with _inline_lock:
+        _inline_sources.clear()
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting: str, **kwargs) -> None:
+    """Recreate the Jinja2 environment when its settings change."""
+    if setting == "TEMPLATES" or setting.startswith("EMAIL_SIGNAL_JINJA2_"):
+        reset()
@@ -0,0 +1,118 @@
+"""Removes old queued emails, delivery logs and payloads.
+
+Rows are deleted in chunks of primary keys, each in its own short
+transaction, so that the tables are never locked for long. Rows can
+optionally be written to an archive file, one JSON object per line, before
+they are deleted.
+"""
+
+import datetime
+import json
+import time
+import typing as _t
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, Model, OuterRef, QuerySet
+from . import payloads
+from .models import DeliveryLog, EmailPayload, OutboxEmail
+
+
+def _archive_rows(rows: _t.List[Model], archive: _t.TextIO):
+    """Write rows and their content to an archive file."""
+    for row in rows:
+        fields = {
+            field.attname: getattr(row, field.attname)
+            for field in row._meta.concrete_fields
+        }
+        payload = getattr(row, "payload", None)
+        record = {
+            "model": row._meta.label_lower,
+            "fields": fields,
+            "content": payloads.load(payload) if payload else None,
+        }
+        archive.write(json.dumps(record, cls=DjangoJSONEncoder) + "\n")
+
+
+def delete_in_chunks(
+    queryset: QuerySet,
+    chunk_size: int = 1000,
+    archive: _t.Optional[_t.TextIO] = None,
+    pause: float = 0,
+) -> int:
+    """Delete the rows matched by `queryset` in chunks.
+
+    Args:
+        queryset: The rows to delete. The queryset is evaluated again for
+            each chunk, so it should not match rows which have already been
+            deleted.
+        chunk_size: The maximum number of rows to delete in a transaction.
+        archive: An optional file to write the rows to before they are
+            deleted.
+        pause: Seconds to wait between chunks.
+
+    Returns:
+        The number of rows deleted.
+    """
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            pks = list(
+                queryset.order_by("pk").values_list("pk", flat=True)[
+                    :chunk_size
+                ]
+            )
+            if not pks:
+                return deleted
+            chunk = queryset.filter(pk__in=pks)
+            if archive is not None:
+                _archive_rows(list(chunk), archive)
+            deleted += chunk.delete()[0]
+        if pause:
+            time.sleep(pause)
+
+
+def compact(
+    before: datetime.datetime,
+    chunk_size: int = 1000,
+    archive: _t.Optional[_t.TextIO] = None,
+    pause: float = 0,
+) -> _t.Dict[str, int]:
+    """Delete sent and failed emails and delivery logs created before
+    `before`, followed by payloads which are no longer used.
+
+    Args:
+        before: Rows created before this time are deleted. Pending emails
+            are never deleted.
+        chunk_size: The maximum number of rows to delete in a transaction.
+        archive: An optional file to write the rows to before they are
+            deleted.
+        pause: Seconds to wait between chunks.
+
+    Returns:
+        The number of rows deleted for each model.
+    """
+    outbox = OutboxEmail.objects.select_related("payload").filter(
+        created_at__lt=before,
+        status__in=[
+            OutboxEmail.StatusChoices.sent,
+            OutboxEmail.StatusChoices.failed,
+        ],
+    )
+    logs = DeliveryLog.objects.select_related("payload").filter(
+        created_at__lt=before
+    )
+    # Payloads are only deleted once they were last stored before the
+    # cutoff, and are locked whilst they are deleted. `payloads.store()`
+    # updates `last_used_at` of the payload it reuses, so it either waits
+    # for the chunk to be deleted and then stores a new payload, or keeps
+    # the payload from being deleted.
+    orphans = EmailPayload.objects.select_for_update().filter(
+        ~Exists(OutboxEmail.objects.filter(payload=OuterRef("pk"))),
+        ~Exists(DeliveryLog.objects.filter(payload=OuterRef("pk"))),
+        last_used_at__lt=before,
+    )
+    return {
+        "outbox": delete_in_chunks(outbox, chunk_size, archive, pause),
+        "delivery_logs": delete_in_chunks(logs, chunk_size, archive, pause),
+        "payloads": delete_in_chunks(orphans, chunk_size, None, pause),
+    }
@@ -1,18 +1,501 @@
 """Dynamically creates signals for registered models."""
 
+import contextlib
+import datetime
+import itertools
+import logging
+import typing as _t
+from collections import deque
 from functools import partial
+from django.conf import settings
+from django.core.mail import get_connection
 from django.db.models import signals, Model
+from django.utils import timezone
 from .constraint_checker import ConstraintChecker
-from . import models, emailer
+from . import (
+    models,
+    breaker,
+    budgets,
+    bulk,
+    cascade,
+    changes,
+    coalesce,
+    dedup,
+    digests,
+    emailer,
+    metrics,
+    mime,
+    outbox,
+    personalise,
+    ratelimit,
+    recipients,
+    snapshot,
+    suppression,
+)
 
+logger = logging.getLogger(__name__)
 
-def signal_callback(
-    instance: Model, signal: signals.ModelSignal, **kwargs
+
+def send_email(model_signal: models.Signal, message) -> None:
+    """Send an email for a signal. If the email backend's circuit breaker is
+    open, the email is queued in the outbox to be sent by the worker once the
+    backend has recovered or, when `settings.EMAIL_SIGNAL_BREAKER_FALLBACK`
+    is `"drop"`, it is dropped.
+
+    Args:
+        model_signal: The signal the email was rendered for.
+        message: The rendered email.
+    """
+    try:
+        emailer.send_message(message)
+    except breaker.CircuitOpenError:
+        fallback = getattr(settings, "EMAIL_SIGNAL_BREAKER_FALLBACK", "outbox")
+        if fallback == "drop":
+            metrics.incr("emails.dropped")
+            logger.warning(
+                "Dropped email for signal %s as the circuit is open.",
+                model_signal.pk,
+            )
+        else:
+            outbox.enqueue_message(model_signal, message)
+            metrics.incr("emails.deferred")
+
+
+def render_message(
+    model_signal: models.Signal,
+    instance: Model,
+    signal_kwargs: dict,
+    recipient_list: _t.List[str],
+    recipient: _t.Any = None,
+):
+    """Render a signal's email within the render budget.
+
+    Args:
+        model_signal: The signal to render the email for.
+        instance: The model instance the signal was raised for.
+        signal_kwargs: The kwargs retrieved from the signal handler.
+        recipient_list: The email addresses to send the email to.
+        recipient: The recipient a personalised email is rendered for. It is
+            added to the context as `recipient`.
+
+    Raises:
+        budgets.BudgetExceeded: If rendering ran over its budget.
+    """
+    context = {"instance": instance, "signal_kwargs": signal_kwargs}
+    if model_signal.personalised:
+        context["recipient"] = recipient
+    with budgets.budget(budgets.render_budget(), budgets.RENDER):
+        return emailer.build_email(
+            subject=model_signal.subject,
+            plain_message=model_signal.plain_message,
+            html_message=model_signal.get_html_message(),
+            from_email=model_signal.from_email,
+            recipient_list=recipient_list,
+            template=model_signal.template,
+            context=context,
+            signal_id=model_signal.pk,
+            render_engine=model_signal.render_engine,
+        )
+
+
+def enqueue(
+    model_signal: models.Signal,
+    chunks: _t.Iterable[_t.List[str]],
+    instance: Model,
+    signal_kwargs: dict,
+    send_at: _t.Optional[datetime.datetime] = None,
+) -> int:
+    """Queue a signal's email in the outbox for each chunk of recipients, or
+    for each recipient if the signal is personalised.
+
+    Returns:
+        The number of queued emails.
+    """
+    queued = 0
+    for chunk in chunks:
+        if model_signal.personalised:
+            groups = [[email] for email in chunk]
+        else:
+            groups = [chunk]
+        for group in groups:
+            outbox.enqueue(
+                model_signal, group, instance, signal_kwargs, send_at
+            )
+            queued += 1
+    return queued
+
+
+def send_chunks(
+    model_signal: models.Signal,
+    message,
+    chunks: _t.Iterable[_t.List[str]],
 ) -> None:
-    """Callback triggered by signals. This function will check if for a given
-    model instance, certain constraints are met. If so, it will send an email.
+    """Send a rendered email to each chunk of recipients in turn. A chunk
+    which fails is logged and the remaining chunks are still sent. The MIME
+    structure of the email is built once and shared by every chunk.
+
+    Args:
+        model_signal: The signal the email was rendered for.
+        message: The rendered email.
+        chunks: Lists of email addresses to send the email to.
+
+    Raises:
+        Exception: The first error raised while sending a chunk, once every
+            chunk has been attempted.
+    """
+    error, sent, deferring = None, 0, False
+    shared = None
+    for index, chunk in enumerate(chunks):
+        if shared is None:
+            shared = message.message()
+        part = mime.PreparedMessage(message, shared, chunk)
+        if index and not deferring and budgets.exceeded():
+            deferring = True
+            metrics.incr("budgets.exceeded")
+            logger.warning(
+                "Dispatch budget exceeded for signal %s. Queueing the "
+                "remaining recipients in the outbox.",
+                model_signal.pk,
+            )
+        if deferring:
+            outbox.enqueue_message(model_signal, part)
+            metrics.incr("emails.deferred")
+            continue
+        try:
+            send_email(model_signal, part)
+        except Exception as exc:
+            metrics.incr("chunks.failed")
+            logger.exception(
+                "Failed to send chunk %s (%s recipients) for signal %s.",
+                index,
+                len(chunk),
+                model_signal.pk,
+            )
+            error = error or exc
+            continue
+        sent += len(chunk)
+        metrics.incr("chunks.sent")
+        logger.debug(
+            "Sent chunk %s for signal %s (%s recipients so far).",
+            index,
+            model_signal.pk,
+            sent,
+        )
+    if error is not None:
+        raise error
+
+
+def budget_exceeded(
+    model_signal: models.Signal,
+    error: budgets.BudgetExceeded,
+    chunks: _t.Iterable[_t.List[str]],
+    instance: Model,
+    signal_kwargs: dict,
+) -> None:
+    """Handle an email which could not be rendered within its budget. The
+    email is queued in the outbox to be rendered by the worker or, when
+    `settings.EMAIL_SIGNAL_BUDGET_FALLBACK` is `"drop"`, it is dropped.
+
+    Args:
+        model_signal: The signal the email was being rendered for.
+        error: The exceeded budget.
+        chunks: Lists of email addresses the email was to be sent to.
+        instance: The model instance the signal was raised for.
+        signal_kwargs: The kwargs retrieved from the signal handler.
+    """
+    metrics.incr("budgets.exceeded")
+    fallback = getattr(settings, "EMAIL_SIGNAL_BUDGET_FALLBACK", "outbox")
+    if fallback == "drop":
+        metrics.incr("emails.dropped")
+        logger.warning(
+            "Dropped email for signal %s. %s", model_signal.pk, error
+        )
+        return
+    metrics.incr(
+        "emails.deferred",
+        enqueue(model_signal, chunks, instance, signal_kwargs),
+    )
+    logger.warning(
+        "Queued email for signal %s in the outbox. %s", model_signal.pk, error
+    )
+
+
+def send_personalised(
+    model_signal: models.Signal,
+    instance: Model,
+    signal_kwargs: dict,
+    mailing_list: _t.Iterable[_t.Any],
+) -> None:
+    """Render and send a signal's email separately for each recipient.
+
+    Emails are rendered on a pool of threads and sent over a single
+    connection as they are rendered. An email which fails to render or send
+    is logged and the remaining recipients are still sent to. If rendering
+    runs over budget, the remaining recipients are handed to
+    `budget_exceeded`.
+
+    Args:
+        model_signal: The signal to send the email for.
+        instance: The model instance the signal was raised for.
+        signal_kwargs: The kwargs retrieved from the signal handler.
+        mailing_list: The recipients, as returned by the mailing list.
+
+    Raises:
+        Exception: The first error raised while rendering or sending an
+            email, once every recipient has been attempted.
+    """
+    # Recipients which have been handed to the pool but whose email has not
+    # been sent yet.
+    taken = deque()
+
+    def entries():
+        for entry in recipients.iter_entries(mailing_list):
+            taken.append(entry)
+            yield entry
+
+    def render(entry):
+        email, recipient = entry
+        try:
+            return render_message(
+                model_signal, instance, signal_kwargs, [email], recipient
+            )
+        except Exception as exc:
+            return exc
+
+    source = entries()
+    results = personalise.render_each(render, source)
+    error = None
+    connection = get_connection()
+    # A connection which can not be opened fails again when sending, where
+    # the failure is handled by the circuit breaker.
+    with contextlib.suppress(Exception):
+        connection.open()
+    try:
+        for (email, _), result in results:
+            taken.popleft()
+            if isinstance(result, budgets.BudgetExceeded):
+                results.close()
+                remaining = itertools.chain(
+                    [email],
+                    [entry[0] for entry in list(taken)],
+                    (entry[0] for entry in source),
+                )
+                budget_exceeded(
+                    model_signal,
+                    result,
+                    recipients.chunked(remaining),
+                    instance,
+                    signal_kwargs,
+                )
+                break
+            if isinstance(result, Exception):
+                logger.error(
+                    "Failed to render email for signal %s.",
+                    model_signal.pk,
+                    exc_info=result,
+                )
+                error = error or result
+                continue
+            result.connection = connection
+            try:
+                send_email(model_signal, result)
+            except Exception as exc:
+                logger.exception(
+                    "Failed to send email for signal %s.", model_signal.pk
+                )
+                error = error or exc
+    finally:
+        connection.close()
+    if error is not None:
+        raise error
+
+
+def rate_limited(
+    model_signal: models.Signal,
+    emails: _t.Iterable[str],
+    delay: float,
+    instance: Model,
+    signal_kwargs: dict,
+) -> None:
+    """Handle emails which are over a rate limit. Per
+    `settings.EMAIL_SIGNAL_RATE_LIMIT_FALLBACK`, they are queued in the
+    outbox to be sent after `delay` seconds, folded into a digest or
+    dropped.
+
+    Args:
+        model_signal: The signal the emails were for.
+        emails: The email addresses which are over the limit.
+        delay: The number of seconds to delay the emails by.
+        instance: The model instance the signal was raised for.
+        signal_kwargs: The kwargs retrieved from the signal handler.
+    """
+    metrics.incr("emails.rate_limited")
+    fallback = ratelimit.fallback()
+    if fallback == "drop":
+        metrics.incr("emails.dropped")
+        logger.warning(
+            "Dropped email for signal %s as it is over its rate limit.",
+            model_signal.pk,
+        )
+    elif fallback == "digest":
+        digests.record(model_signal, emails, instance, signal_kwargs)
+    else:
+        send_at = timezone.now() + datetime.timedelta(seconds=delay)
+        metrics.incr(
+            "emails.deferred",
+            enqueue(
+                model_signal,
+                recipients.chunked(emails),
+                instance,
+                signal_kwargs,
+                send_at,
+            ),
+        )
+
+
+def send_summary(
+    model_signal: models.Signal, emails: _t.List[str], context: dict
+) -> None:
+    """Send, or queue in the outbox, a single email summarising several
+    events of a signal. The signal's content is rendered for each event.
+
+    Args:
+        model_signal: The signal the events were raised for.
+        emails: The email addresses to send the summary to.
+        context: The snapshot of the summary's context, with the snapshot
+            of each event's context in `events`.
+    """
+    if outbox.is_deferred():
+        groups = (
+            [[email] for email in emails]
+            if model_signal.personalised
+            else recipients.chunked(emails)
+        )
+        for group in groups:
+            outbox.enqueue_context(model_signal, group, context)
+        return
+
+    context = snapshot.load_snapshot(context)
+    if model_signal.personalised:
+        for email in emails:
+            send_email(
+                model_signal,
+                digests.build_folded(
+                    model_signal, {**context, "recipient": email}, [email]
+                ),
+            )
+        return
+    chunks = recipients.chunked(emails)
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
+        return
+    message = digests.build_folded(model_signal, context, first_chunk)
+    send_chunks(model_signal, message, itertools.chain([first_chunk], chunks))
+
+
+def deliver(
+    model_signal: models.Signal,
+    instance: Model,
+    signal_kwargs: dict,
+    mailing_list: _t.Iterable[_t.Any],
+) -> None:
+    """Send, or queue in the outbox, a signal's email for its mailing list.
+
+    Args:
+        model_signal: The signal to send the email for.
+        instance: The model instance the signal was raised for.
+        signal_kwargs: The kwargs retrieved from the signal handler.
+        mailing_list: The recipients, as returned by the mailing list.
+    """
+    deferred = outbox.is_deferred()
+    if not deferred and budgets.exceeded():
+        deferred = True
+        metrics.incr("budgets.exceeded")
+        logger.warning(
+            "Dispatch budget exceeded. Queueing email for signal %s in "
+            "the outbox.",
+            model_signal.pk,
+        )
+    if deferred:
+        enqueue(
+            model_signal,
+            recipients.chunked(mailing_list),
+            instance,
+            signal_kwargs,
+        )
+        return
+    if model_signal.personalised:
+        send_personalised(model_signal, instance, signal_kwargs, mailing_list)
+        return
+
+    chunks = recipients.chunked(mailing_list)
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
+        return
+    chunks = itertools.chain([first_chunk], chunks)
+    try:
+        message = render_message(
+            model_signal, instance, signal_kwargs, first_chunk
+        )
+    except budgets.BudgetExceeded as error:
+        budget_exceeded(model_signal, error, chunks, instance, signal_kwargs)
+        return
+    send_chunks(model_signal, message, chunks)
+
+
+def dispatch_signal(
+    model_signal: models.Signal, instance: Model, kwargs: dict
+) -> None:
+    """Send the email of a signal whose constraints an instance has met.
+
+    Args:
+        model_signal: The signal to send the email for.
+        instance: The model instance the signal was raised for.
+        kwargs: The kwargs retrieved from the signal handler.
     """
+    mailing_list = instance.email_signal_recipients(model_signal.mailing_list)
+    if model_signal.dedup_window:
+        entries = iter(
+            dedup.filter_duplicates(
+                model_signal, instance, kwargs, mailing_list
+            )
+        )
+        first = next(entries, None)
+        if first is None:
+            # Every recipient has already been sent this email.
+            return
+        mailing_list = itertools.chain([first], entries)
+    if model_signal.digest_interval:
+        digests.record(model_signal, mailing_list, instance, kwargs)
+        return
 
+    delay = ratelimit.check(model_signal)
+    if delay:
+        rate_limited(
+            model_signal,
+            recipients.iter_recipients(mailing_list),
+            delay,
+            instance,
+            kwargs,
+        )
+        return
+    mailing_list = ratelimit.filter_recipients(
+        mailing_list,
+        partial(
+            rate_limited,
+            model_signal,
+            instance=instance,
+            signal_kwargs=kwargs,
+        ),
+    )
+    deliver(model_signal, instance, kwargs, mailing_list)
+
+
+def dispatch(instance: Model, signal: signals.ModelSignal, kwargs) -> None:
+    """Send the emails of the signals raised for a model instance. Once the
+    dispatch budget has been used up, the remaining emails are queued in the
+    outbox.
+    """
     model_signals = models.Signal.get_for_model_and_signal(instance, signal)
     for model_signal in model_signals:
         if not model_signal.active:
@@ -23,17 +506,86 @@ def signal_callback(
 
         # When the program reaches this point, the constraint checker has
         # passed.
-        emailer.send_mail(
-            subject=model_signal.subject,
-            plain_message=model_signal.plain_message,
-            html_message=model_signal.html_message,
-            from_email=model_signal.from_email,
-            recipient_list=instance.email_signal_recipients(
-                model_signal.mailing_list
-            ),
-            template=model_signal.template,
-            context={"instance": instance, "signal_kwargs": kwargs},
-        )
+        dispatch_signal(model_signal, instance, kwargs)
+
+
+def evaluate(instance: Model, signal: signals.ModelSignal, kwargs) -> None:
+    """Send the emails of the signals raised for a model instance within the
+    dispatch budget.
+    """
+    with budgets.budget(budgets.dispatch_budget(), budgets.DISPATCH):
+        dispatch(instance, signal, kwargs)
+
+
+def signal_callback(
+    instance: Model, signal: signals.ModelSignal, **kwargs
+) -> None:
+    """Callback triggered by signals. This function will check if for a given
+    model instance, certain constraints are met. If so, it will send an email.
+    `post_save` signals raised in a transaction are coalesced until it
+    commits when `settings.EMAIL_SIGNAL_COALESCE` is enabled, and the delete
+    signals of a cascading delete are batched when
+    `settings.EMAIL_SIGNAL_CASCADE_SUMMARY` is enabled. Signals are ignored
+    when they are suppressed, see `suppression`, and `post_save` signals are
+    ignored when the model's changes are captured, see `changes`.
+    """
+    if suppression.is_suppressed(instance, signal, kwargs):
+        return
+    if signal is signals.post_save and changes.captured(type(instance)):
+        return
+    if coalesce.defer(instance, signal, kwargs, evaluate):
+        return
+    if cascade.collect(instance, signal, kwargs, send_summary):
+        return
+    evaluate(instance, signal, kwargs)
+
+
+def bulk_callback(
+    sender: _t.Type[Model],
+    pks: _t.List[_t.Any],
+    unsaved: _t.List[Model],
+    **kwargs,
+) -> None:
+    """Callback triggered by `bulk_post_save`. The `post_save` signals of the
+    model are evaluated for the rows matching their constraints, sending an
+    email per row or, when `settings.EMAIL_SIGNAL_BULK_SUMMARY` is enabled,
+    a summary per signal and recipients.
+    """
+    if suppression.model_suppressed(sender, signals.post_save):
+        return
+    if changes.captured(sender):
+        return
+    signal_kwargs = {
+        "created": kwargs["created"],
+        "update_fields": kwargs["update_fields"],
+        "raw": False,
+        "using": kwargs["using"],
+        "bulk": True,
+    }
+    summarise = bulk.summarise()
+    with budgets.budget(budgets.dispatch_budget(), budgets.DISPATCH):
+        for model_signal in models.Signal.get_for_model_and_signal(
+            sender, signals.post_save
+        ):
+            groups = {}
+            for instance in bulk.matches(
+                model_signal, sender, pks, unsaved, signal_kwargs
+            ):
+                metrics.incr("bulk.matched")
+                if summarise and not model_signal.digest_interval:
+                    digests.fold(
+                        groups,
+                        model_signal,
+                        instance.email_signal_recipients(
+                            model_signal.mailing_list
+                        ),
+                        instance,
+                        signal_kwargs,
+                    )
+                else:
+                    dispatch_signal(model_signal, instance, signal_kwargs)
+            for summary in digests.folded(groups):
+                send_summary(*summary)
 
 
 def setup():
@@ -61,6 +613,9 @@ def setup():
             signal_factory.append(
                 partial(signal_type.connect, signal_callback, sender=model)
             )
+        signal_factory.append(
+            partial(models.bulk_post_save.connect, bulk_callback, sender=model)
+        )
 
     for function in signal_factory:
         function()
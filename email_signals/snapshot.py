@@ -0,0 +1,747 @@
+"""Captures the parts of a signal's template context which are actually used
+by the signal's content so that the email can be rendered later, without the
+live model instance.
+
+The template content is parsed to find the variable paths it references
+(e.g: `instance.customer.name`). Only those values are resolved from the
+instance and stored in a JSON serialisable snapshot which renders the same
+way as the original context.
+"""
+
+import datetime
+import decimal
+import typing as _t
+import uuid
+from functools import lru_cache
+from django.template import TemplateDoesNotExist, engines
+from django.template.backends.django import DjangoTemplates
+from django.template.base import FilterExpression, Node, NodeList, Variable
+from django.template.defaulttags import ForNode, WithNode
+from django.template.loader import get_template
+from django.template.loader_tags import ExtendsNode, IncludeNode
+from django.template.smartif import TokenBase
+from . import rendering
+
+try:
+    from jinja2 import nodes as jinja2_nodes
+except ImportError:  # pragma: no cover
+    jinja2_nodes = None
+
+#: The context variables which are made available to a signal's content.
+CONTEXT_ROOTS = ("instance", "signal_kwargs")
+
+#: The context variable which holds the events of a digest. Each event has
+#: the same variables as the context of a single email.
+EVENTS = "events"
+
+#: Path segment which represents each item of an iterable.
+ITEMS = "*"
+
+_PRIMITIVES = (str, int, float, bool, type(None))
+_TYPE_KEY = "__type__"
+_STR_KEY = "__str__"
+
+
+def django_engine():
+    """Return the first configured Django template engine."""
+    for engine in engines.all():
+        if isinstance(engine, DjangoTemplates):
+            return engine.engine
+    raise ValueError("Could not find a Django template engine.")
+
+
+def _variables(value: _t.Any) -> _t.Iterator[Variable]:
+    """Yield the template variables held in a node attribute, including
+    those passed as arguments to filters.
+    """
+    if isinstance(value, FilterExpression):
+        if isinstance(value.var, Variable):
+            yield value.var
+        for _, args in value.filters:
+            for is_variable, arg in args:
+                if is_variable:
+                    yield arg
+    elif isinstance(value, TokenBase):
+        # `{% if %}` conditions.
+        for attr in ("value", "first", "second"):
+            yield from _variables(getattr(value, attr, None))
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _variables(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _variables(item)
+
+
+def _variable_path(
+    variable: _t.Any, aliases: _t.Dict[str, str]
+) -> _t.Optional[str]:
+    """Return the full path referenced by a variable with loop and
+    `{% with %}` variables replaced by the path they alias.
+    """
+    if isinstance(variable, FilterExpression):
+        variable = variable.var
+    lookups = getattr(variable, "lookups", None)
+    if not lookups:
+        return None
+    root, rest = lookups[0], list(lookups[1:])
+    if root in aliases:
+        return ".".join([aliases[root]] + rest)
+    return ".".join(lookups)
+
+
+def _constant(expression: _t.Any) -> _t.Optional[str]:
+    """Return the value of a template name given as a string literal."""
+    if isinstance(expression, FilterExpression) and not expression.filters:
+        if isinstance(expression.var, str):
+            return expression.var
+    return None
+
+
+def _template_name(node: Node) -> _t.Optional[str]:
+    """Return the name of the template a node renders if it is a string
+    literal, e.g: `{% include "emails/footer.html" %}`.
+    """
+    if isinstance(node, IncludeNode):
+        return _constant(node.template)
+    if isinstance(node, ExtendsNode):
+        return _constant(node.parent_name)
+    if type(node).__name__ == "EmailFragmentNode":
+        return _constant(node.name)
+    return None
+
+
+def _included_paths(
+    name: str,
+    aliases: _t.Dict[str, str],
+    templates: _t.Optional[_t.Set[str]],
+    chain: _t.Tuple[str, ...],
+) -> _t.Set[str]:
+    """Return the paths referenced by a template which is included,
+    extended or rendered as a fragment.
+    """
+    if templates is not None:
+        templates.add(name)
+    if name in chain:
+        return set()
+    try:
+        template = django_engine().get_template(name)
+    except TemplateDoesNotExist:
+        return set()
+    return nodelist_paths(
+        template.nodelist, aliases, templates, _chain=chain + (name,)
+    )
+
+
+def nodelist_paths(
+    nodelist: NodeList,
+    aliases: _t.Optional[_t.Dict[str, str]] = None,
+    templates: _t.Optional[_t.Set[str]] = None,
+    _chain: _t.Tuple[str, ...] = (),
+) -> _t.Set[str]:
+    """Walk a compiled template's nodes and return the variable paths they
+    reference. Templates named by `{% include %}`, `{% extends %}` and
+    `{% email_fragment %}` tags are walked as well.
+
+    Args:
+        nodelist: The nodes to walk.
+        aliases: Variable names which are aliases for other paths, such as
+            `{% for %}` loop variables.
+        templates: If given, the names of the templates which are included,
+            extended or rendered as fragments are added to it.
+
+    Returns:
+        The set of referenced paths. Items of an iterable are represented by
+        a `*` segment, e.g: `instance.items.all.*.name`.
+    """
+    aliases = aliases or {}
+    paths = set()
+    for node in nodelist:
+        if not isinstance(node, Node):
+            continue
+        name = _template_name(node)
+        if name:
+            include_aliases = aliases
+            if isinstance(node, IncludeNode) and node.extra_context:
+                include_aliases = (
+                    {} if node.isolated_context else dict(aliases)
+                )
+                for key, expression in node.extra_context.items():
+                    include_aliases[key] = (
+                        _variable_path(expression, aliases) or ""
+                    )
+            paths |= _included_paths(name, include_aliases, templates, _chain)
+        child_names = set(node.child_nodelists)
+        for attr, value in vars(node).items():
+            if attr in child_names or attr in ("token", "origin"):
+                continue
+            for variable in _variables(value):
+                path = _variable_path(variable, aliases)
+                if path:
+                    paths.add(path)
+
+        child_aliases = aliases
+        if isinstance(node, ForNode):
+            sequence = _variable_path(node.sequence, aliases)
+            child_aliases = dict(aliases)
+            for index, loopvar in enumerate(node.loopvars):
+                item = f"{sequence}.{ITEMS}" if sequence else ""
+                if len(node.loopvars) > 1:
+                    item = f"{item}.{index}"
+                child_aliases[loopvar] = item
+        elif isinstance(node, WithNode):
+            child_aliases = dict(aliases)
+            for name, expression in node.extra_context.items():
+                child_aliases[name] = _variable_path(expression, aliases) or ""
+
+        for attr in child_names:
+            child = getattr(node, attr, None)
+            if child:
+                paths |= nodelist_paths(
+                    child, child_aliases, templates, _chain
+                )
+    return paths
+
+
+def _jinja2_chain(
+    node: _t.Any, aliases: _t.Dict[str, str]
+) -> _t.Tuple[_t.Optional[str], list]:
+    """Return the path of a Jinja2 lookup chain such as
+    `instance.orders.all()` along with the nodes inside the chain which need
+    to be walked separately, such as call arguments.
+    """
+    segments, others = [], []
+    while True:
+        if isinstance(node, jinja2_nodes.Getattr):
+            segments.append(node.attr)
+            node = node.node
+        elif isinstance(node, jinja2_nodes.Getitem) and isinstance(
+            node.arg, jinja2_nodes.Const
+        ):
+            segments.append(str(node.arg.value))
+            node = node.node
+        elif isinstance(node, jinja2_nodes.Call):
+            if node.args or node.kwargs:
+                # Calls with arguments can not be captured.
+                others.extend(node.args)
+                others.extend(node.kwargs)
+                others.append(node.node)
+                return None, others
+            node = node.node
+        elif isinstance(node, jinja2_nodes.Name):
+            root = aliases.get(node.name, node.name)
+            if not root:
+                return None, others
+            return ".".join([root] + segments[::-1]), others
+        else:
+            others.append(node)
+            return None, others
+
+
+def _jinja2_template_name(node: _t.Any) -> _t.Optional[str]:
+    """Return the name of the template a Jinja2 node renders if it is a
+    string literal, e.g: `{% include "emails/footer.html" %}`.
+    """
+    if isinstance(node, (jinja2_nodes.Include, jinja2_nodes.Extends)):
+        template = node.template
+    elif (
+        isinstance(node, jinja2_nodes.Call)
+        and isinstance(node.node, jinja2_nodes.Name)
+        and node.node.name == "email_fragment"
+        and node.args
+    ):
+        template = node.args[0]
+    else:
+        return None
+    if isinstance(template, jinja2_nodes.Const) and isinstance(
+        template.value, str
+    ):
+        return template.value
+    return None
+
+
+def _jinja2_included_paths(
+    name: str,
+    aliases: _t.Dict[str, str],
+    templates: _t.Optional[_t.Set[str]],
+    chain: _t.Tuple[str, ...],
+) -> _t.Set[str]:
+    """Return the paths referenced by a Jinja2 template which is included,
+    extended or rendered as a fragment.
+    """
+    if templates is not None:
+        templates.add(name)
+    if name in chain:
+        return set()
+    environment = rendering.jinja2_environment()
+    try:
+        source, _, _ = environment.loader.get_source(environment, name)
+    except rendering.TEMPLATE_NOT_FOUND:
+        return set()
+    return jinja2_node_paths(
+        environment.parse(source), dict(aliases), templates, chain + (name,)
+    )
+
+
+def jinja2_node_paths(
+    node: _t.Any,
+    aliases: _t.Optional[_t.Dict[str, str]] = None,
+    templates: _t.Optional[_t.Set[str]] = None,
+    _chain: _t.Tuple[str, ...] = (),
+) -> _t.Set[str]:
+    """Walk a Jinja2 template's nodes and return the variable paths they
+    reference, in the same form as `nodelist_paths`.
+
+    Args:
+        node: The node to walk.
+        aliases: Variable names which are aliases for other paths, such as
+            `{% for %}` loop variables. Assignments update this mapping.
+        templates: If given, the names of the templates which are included,
+            extended or rendered as fragments are added to it.
+
+    Returns:
+        The set of referenced paths.
+    """
+    aliases = {} if aliases is None else aliases
+    paths = set()
+
+    name = _jinja2_template_name(node)
+    if name:
+        paths |= _jinja2_included_paths(name, aliases, templates, _chain)
+
+    if isinstance(node, jinja2_nodes.For):
+        paths |= jinja2_node_paths(node.iter, aliases, templates, _chain)
+        sequence, _ = _jinja2_chain(node.iter, aliases)
+        child_aliases = dict(aliases)
+        item = f"{sequence}.{ITEMS}" if sequence else ""
+        if isinstance(node.target, jinja2_nodes.Tuple):
+            for index, target in enumerate(node.target.items):
+                child_aliases[target.name] = f"{item}.{index}" if item else ""
+        else:
+            child_aliases[node.target.name] = item
+        for child in node.body + node.else_ + [node.test]:
+            if child is not None:
+                paths |= jinja2_node_paths(
+                    child, child_aliases, templates, _chain
+                )
+        return paths
+
+    if isinstance(node, jinja2_nodes.Assign) and isinstance(
+        node.target, jinja2_nodes.Name
+    ):
+        paths |= jinja2_node_paths(node.node, aliases, templates, _chain)
+        aliases[node.target.name] = _jinja2_chain(node.node, aliases)[0] or ""
+        return paths
+
+    if isinstance(
+        node,
+        (
+            jinja2_nodes.Getattr,
+            jinja2_nodes.Getitem,
+            jinja2_nodes.Call,
+            jinja2_nodes.Name,
+        ),
+    ):
+        path, others = _jinja2_chain(node, aliases)
+        if path:
+            paths.add(path)
+        for other in others:
+            if other is not node:
+                paths |= jinja2_node_paths(other, aliases, templates, _chain)
+        if path or others:
+            return paths
+
+    for child in node.iter_child_nodes():
+        paths |= jinja2_node_paths(child, aliases, templates, _chain)
+    return paths
+
+
+def _context_paths(paths: _t.Iterable[str]) -> _t.FrozenSet[str]:
+    """Only keep paths which point into the signal's context or into the
+    events of a digest.
+    """
+    return frozenset(
+        path
+        for path in paths
+        if path and path.split(".", 1)[0] in CONTEXT_ROOTS + (EVENTS,)
+    )
+
+
+@lru_cache(maxsize=256)
+def source_dependencies(
+    source: str, engine: str = rendering.DJANGO
+) -> _t.Tuple[_t.FrozenSet[str], _t.FrozenSet[str]]:
+    """Return the context paths and the templates a template string depends
+    on.
+
+    Args:
+        source: The template string.
+        engine: The engine the string is rendered with.
+
+    Returns:
+        A `(paths, templates)` tuple of the context paths referenced by the
+        template, including those referenced by the templates it includes,
+        extends or renders as fragments, and the names of those templates.
+    """
+    templates = set()
+    if engine == rendering.JINJA2:
+        ast = rendering.jinja2_environment().parse(source)
+        paths = jinja2_node_paths(ast, templates=templates)
+    else:
+        template = django_engine().from_string(source)
+        paths = nodelist_paths(template.nodelist, templates=templates)
+    return _context_paths(paths), frozenset(templates)
+
+
+def source_paths(
+    source: str, engine: str = rendering.DJANGO
+) -> _t.FrozenSet[str]:
+    """Return the context paths referenced by a template string.
+
+    Args:
+        source: The template string.
+        engine: The engine the string is rendered with.
+
+    Returns:
+        The context paths referenced by the template.
+    """
+    return source_dependencies(source, engine)[0]
+
+
+def template_file_dependencies(
+    template_name: str, engine: str = rendering.DJANGO
+) -> _t.Tuple[_t.FrozenSet[str], _t.FrozenSet[str]]:
+    """Return the context paths and the templates a template file depends
+    on. Templates which are not Django templates are assumed to reference
+    the whole context.
+
+    Args:
+        template_name: The name of the template as passed to the template
+            loader.
+        engine: The engine the template is rendered with.
+
+    Returns:
+        A `(paths, templates)` tuple as returned by `source_dependencies`.
+        `templates` includes `template_name`.
+    """
+    templates = {template_name}
+    if engine == rendering.JINJA2:
+        environment = rendering.jinja2_environment()
+        source, _, _ = environment.loader.get_source(
+            environment, template_name
+        )
+        paths = jinja2_node_paths(
+            environment.parse(source), None, templates, (template_name,)
+        )
+        return _context_paths(paths), frozenset(templates)
+    template = get_template(template_name)
+    nodelist = getattr(getattr(template, "template", None), "nodelist", None)
+    if nodelist is None:
+        return frozenset(CONTEXT_ROOTS), frozenset(templates)
+    paths = nodelist_paths(nodelist, None, templates, (template_name,))
+    return _context_paths(paths), frozenset(templates)
+
+
+def template_file_paths(
+    template_name: str, engine: str = rendering.DJANGO
+) -> _t.FrozenSet[str]:
+    """Return the context paths referenced by a template file. Templates
+    which are not Django templates are assumed to reference the whole
+    context.
+
+    Args:
+        template_name: The name of the template as passed to the template
+            loader.
+        engine: The engine the template is rendered with.
+
+    Returns:
+        The context paths referenced by the template.
+    """
+    return template_file_dependencies(template_name, engine)[0]
+
+
+def content_dependencies(
+    plain_message: str,
+    html_message: str,
+    template: str,
+    engine: str = rendering.DJANGO,
+) -> _t.Tuple[_t.FrozenSet[str], _t.FrozenSet[str]]:
+    """Return the context paths and the templates a signal's content
+    depends on.
+
+    Args:
+        plain_message: The plain text content.
+        html_message: The HTML content.
+        template: The name of the template file, if any.
+        engine: The engine the content is rendered with.
+
+    Returns:
+        A `(paths, templates)` tuple as returned by `source_dependencies`.
+
+    Raises:
+        TemplateSyntaxError: If the content cannot be parsed.
+        TemplateDoesNotExist: If the template file does not exist.
+    """
+    paths, templates = set(), set()
+    for source in (plain_message, html_message):
+        if source:
+            found_paths, found_templates = source_dependencies(source, engine)
+            paths |= found_paths
+            templates |= found_templates
+    if template:
+        file_paths, file_templates = template_file_dependencies(
+            template, engine
+        )
+        paths |= file_paths
+        templates |= file_templates
+    return frozenset(paths), frozenset(templates)
+
+
+def signal_dependencies(signal) -> _t.Dict[str, _t.List[str]]:
+    """Return the dependencies of a signal's content in the form they are
+    stored in `Signal.template_dependencies`.
+
+    Args:
+        signal: The `Signal` instance.
+
+    Returns:
+        A dict with the sorted `paths` and `templates` the content depends
+        on.
+    """
+    paths, templates = content_dependencies(
+        signal.plain_message,
+        signal.get_html_message(),
+        signal.template,
+        rendering.engine_name(signal),
+    )
+    return {"paths": sorted(paths), "templates": sorted(templates)}
+
+
+def signal_paths(signal) -> _t.FrozenSet[str]:
+    """Return the context paths referenced by a signal's plain text, HTML
+    and template content. The paths stored on the signal when it was saved
+    are used if there are any.
+
+    Args:
+        signal: The `Signal` instance.
+
+    Returns:
+        The context paths referenced by the signal's content.
+    """
+    stored = getattr(signal, "template_dependencies", None)
+    if stored:
+        return frozenset(stored["paths"])
+    paths, _ = content_dependencies(
+        signal.plain_message,
+        signal.get_html_message(),
+        signal.template,
+        rendering.engine_name(signal),
+    )
+    return paths
+
+
+def event_paths(signal) -> _t.FrozenSet[str]:
+    """Return the context paths a digest signal's content references for
+    each of its events, e.g: `instance.order_number` for
+    `{% for event in events %}{{ event.instance.order_number }}{% endfor %}`.
+
+    Args:
+        signal: The `Signal` instance.
+
+    Returns:
+        The paths relative to each event's context.
+    """
+    paths = set()
+    for path in signal_paths(signal):
+        segments = path.split(".")
+        if segments[0] == EVENTS and len(segments) > 2:
+            # The second segment is `*` or an index into the events.
+            if segments[2] in CONTEXT_ROOTS:
+                paths.add(".".join(segments[2:]))
+    return frozenset(paths)
+
+
+def _path_tree(paths: _t.Iterable[str]) -> dict:
+    """Build a tree of path segments. An empty key marks the end of a
+    path.
+    """
+    tree = {}
+    for path in paths:
+        node = tree
+        for segment in path.split("."):
+            node = node.setdefault(segment, {})
+        node[""] = {}
+    return tree
+
+
+def _lookup(value: _t.Any, segment: str) -> _t.Any:
+    """Resolve a single path segment the same way as Django's template
+    engine does. Raises `LookupError` if the segment cannot be resolved.
+    """
+    try:
+        value = value[segment]
+    except (TypeError, AttributeError, KeyError, ValueError, IndexError):
+        try:
+            value = getattr(value, segment)
+        except (TypeError, AttributeError):
+            try:
+                value = value[int(segment)]
+            except (
+                IndexError,
+                ValueError,
+                KeyError,
+                TypeError,
+                AttributeError,
+            ):
+                raise LookupError(segment)
+        except Exception as error:
+            if getattr(error, "silent_variable_failure", False):
+                raise LookupError(segment)
+            raise
+
+    if callable(value):
+        if getattr(value, "do_not_call_in_templates", False):
+            pass
+        elif getattr(value, "alters_data", False):
+            raise LookupError(segment)
+        else:
+            try:
+                value = value()
+            except TypeError:
+                raise LookupError(segment)
+    return value
+
+
+def encode_value(value: _t.Any) -> _t.Any:
+    """Convert a value into something that can be serialised as JSON.
+    Types which templates commonly format (dates, decimals, UUIDs) are tagged
+    so that they can be restored. Anything else is stored as the string it
+    would render as.
+    """
+    if isinstance(value, _PRIMITIVES):
+        return value
+    if isinstance(value, datetime.datetime):
+        return {_TYPE_KEY: "datetime", "value": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {_TYPE_KEY: "date", "value": value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {_TYPE_KEY: "time", "value": value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {_TYPE_KEY: "decimal", "value": str(value)}
+    if isinstance(value, uuid.UUID):
+        return {_TYPE_KEY: "uuid", "value": str(value)}
+    if isinstance(value, dict):
+        return {str(key): encode_value(item) for key, item in value.items()}
+    if hasattr(value, "__iter__") and not isinstance(value, bytes):
+        # Lists, sets, querysets etc.
+        return [encode_value(item) for item in value]
+    return str(value)
+
+
+def _capture(value: _t.Any, tree: dict) -> _t.Any:
+    """Capture the parts of `value` described by `tree`."""
+    children = {key: child for key, child in tree.items() if key}
+    if not children or value is None:
+        return encode_value(value)
+
+    if ITEMS in children:
+        try:
+            items = iter(value)
+        except TypeError:
+            return []
+        return [_capture(item, children[ITEMS]) for item in items]
+
+    captured = {}
+    for segment, child in children.items():
+        try:
+            captured[segment] = _capture(_lookup(value, segment), child)
+        except LookupError:
+            # Left out so that the variable renders as it would have if it
+            # were missing from the live context.
+            continue
+    if "" in tree:
+        captured[_STR_KEY] = str(value)
+    return captured
+
+
+def take_snapshot(paths: _t.Iterable[str], context: dict) -> dict:
+    """Capture the values referenced by `paths` from `context`.
+
+    Args:
+        paths: The paths to capture.
+        context: The live template context.
+
+    Returns:
+        A JSON serialisable snapshot of the context.
+    """
+    return _capture(context, _path_tree(paths))
+
+
+class SnapshotNode(dict):
+    """A captured object. Renders as the string the original object rendered
+    as whilst still allowing its attributes to be looked up.
+    """
+
+    def __str__(self) -> str:
+        return self.get(_STR_KEY, "")
+
+
+def load_snapshot(data: _t.Any) -> _t.Any:
+    """Restore a snapshot created by `take_snapshot` into a template
+    context.
+
+    Args:
+        data: The snapshot.
+
+    Returns:
+        The template context.
+    """
+    if isinstance(data, list):
+        return [load_snapshot(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+
+    type_name = data.get(_TYPE_KEY)
+    if type_name == "datetime":
+        return datetime.datetime.fromisoformat(data["value"])
+    if type_name == "date":
+        return datetime.date.fromisoformat(data["value"])
+    if type_name == "time":
+        return datetime.time.fromisoformat(data["value"])
+    if type_name == "decimal":
+        return decimal.Decimal(data["value"])
+    if type_name == "uuid":
+        return uuid.UUID(data["value"])
+
+    node_class = SnapshotNode if _STR_KEY in data else dict
+    return node_class(
+        (key, load_snapshot(value)) for key, value in data.items()
+    )
+
+
+def snapshot_context(
+    signal,
+    instance,
+    signal_kwargs: dict,
+    roots: _t.Iterable[str] = CONTEXT_ROOTS,
+) -> dict:
+    """Capture the context a signal's content needs from a model instance and
+    the signal kwargs.
+
+    Args:
+        signal: The `Signal` instance being dispatched.
+        instance: The model instance the signal was raised for.
+        signal_kwargs: The kwargs retrieved from the signal handler.
+        roots: The context variables to capture.
+
+    Returns:
+        A JSON serialisable snapshot of the context.
+    """
+    return take_snapshot(
+        (
+            path
+            for path in signal_paths(signal)
+            if path.split(".", 1)[0] in roots
+        ),
+        {"instance": instance, "signal_kwargs": signal_kwargs},
+    )
@@ -0,0 +1,128 @@
+"""Switches off signal emails for bulk data operations.
+
+Signals are not evaluated when:
+
+* The signal was raised with `raw=True`, i.e: by `loaddata` loading a
+  fixture.
+* It is raised inside a `suppressed()` block which covers its model and
+  signal type. Blocks are tracked with a context variable, so they only
+  apply to the thread or asyncio task which entered them.
+* The kill switch is on. It is a flag held in the cache named by
+  `settings.EMAIL_SIGNAL_KILL_SWITCH_CACHE`, so turning it on in one process
+  switches off signal emails in every process sharing the cache. Each
+  process reads the flag at most once every
+  `settings.EMAIL_SIGNAL_KILL_SWITCH_POLL` seconds.
+"""
+
+import contextlib
+import contextvars
+import time
+import typing as _t
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Model
+from django.db.models.signals import ModelSignal
+
+KILL_SWITCH_KEY = "email_signals:kill_switch"
+
+# Each active block as a `(models, signals)` pair, where `None` matches any
+# model or signal.
+_blocks: contextvars.ContextVar = contextvars.ContextVar(
+    "email_signals_suppressed", default=()
+)
+
+# The last value read of the kill switch and when it should be read again.
+_kill_switch = {"active": False, "expires": 0.0}
+
+
+def _cache():
+    return caches[
+        getattr(settings, "EMAIL_SIGNAL_KILL_SWITCH_CACHE", "default")
+    ]
+
+
+def poll_interval() -> float:
+    """Return how long, in seconds, a process may use the last value it read
+    of the kill switch.
+    """
+    return getattr(settings, "EMAIL_SIGNAL_KILL_SWITCH_POLL", 1)
+
+
+@contextlib.contextmanager
+def suppressed(
+    models: _t.Optional[_t.Iterable[_t.Type[Model]]] = None,
+    signals: _t.Optional[_t.Iterable[ModelSignal]] = None,
+) -> _t.Iterator[None]:
+    """Do not evaluate signals raised inside the block.
+
+    Args:
+        models: The models to suppress the signals of, including their
+            subclasses. Defaults to every model.
+        signals: The signal types to suppress, e.g: `post_save`. Defaults to
+            every signal type.
+    """
+    block = (
+        tuple(models) if models is not None else None,
+        frozenset(signals) if signals is not None else None,
+    )
+    token = _blocks.set(_blocks.get() + (block,))
+    try:
+        yield
+    finally:
+        _blocks.reset(token)
+
+
+def set_kill_switch(active: bool, timeout: _t.Optional[int] = None) -> None:
+    """Turn the kill switch on or off in every process sharing the cache.
+
+    Args:
+        active: `True` to stop evaluating signals, `False` to resume.
+        timeout: Seconds after which the kill switch turns itself off.
+            Defaults to staying on until it is turned off.
+    """
+    if active:
+        _cache().set(KILL_SWITCH_KEY, True, timeout)
+    else:
+        _cache().delete(KILL_SWITCH_KEY)
+    _kill_switch.update(
+        active=active, expires=time.monotonic() + poll_interval()
+    )
+
+
+def kill_switch_active() -> bool:
+    """Return `True` if the kill switch is on."""
+    now = time.monotonic()
+    if now >= _kill_switch["expires"]:
+        _kill_switch.update(
+            active=bool(_cache().get(KILL_SWITCH_KEY)),
+            expires=now + poll_interval(),
+        )
+    return _kill_switch["active"]
+
+
+def is_suppressed(instance: Model, signal: ModelSignal, kwargs: dict) -> bool:
+    """Return `True` if a signal should not be evaluated.
+
+    Args:
+        instance: The instance the signal was raised for.
+        signal: The signal which was raised.
+        kwargs: The kwargs retrieved from the signal handler.
+    """
+    return kwargs.get("raw") or model_suppressed(type(instance), signal)
+
+
+def model_suppressed(
+    model: _t.Type[Model], signal: _t.Optional[ModelSignal]
+) -> bool:
+    """Return `True` if the signals of a model and signal type should not be
+    evaluated, whatever instance they are raised for.
+
+    Signals which no model signal raises, e.g: absence signals, are passed
+    as `None` and are only suppressed by blocks covering every signal type.
+    """
+    for models, signals in _blocks.get():
+        if (models is None or issubclass(model, models)) and (
+            signals is None or (signal is not None and signal in signals)
+        ):
+            return True
+    return kill_switch_active()
@@ -0,0 +1,139 @@
+"""An in-memory index of the addresses signal emails are not sent to.
+
+The active `SuppressedAddress` rows are loaded into a set once per process,
+so checking an address is a single set lookup however many addresses are
+suppressed. Every `settings.EMAIL_SIGNAL_SUPPRESSION_REFRESH` seconds only
+the rows changed since the last refresh are read, using the index on
+`updated_at`, and the whole list is reloaded every
+`settings.EMAIL_SIGNAL_SUPPRESSION_RELOAD` seconds to drop rows deleted by
+other processes. Changes made by this process are applied straight away.
+"""
+
+import threading
+import time
+import typing as _t
+from django.conf import settings
+from django.db.models import signals
+from django.dispatch import receiver
+from . import metrics, recipients
+from .models import SuppressedAddress
+
+_lock = threading.Lock()
+_state = {
+    "emails": None,
+    "latest": None,
+    "refreshed": 0.0,
+    "loaded": 0.0,
+}
+
+
+def refresh_interval() -> float:
+    """Return how often, in seconds, changed rows are read."""
+    return getattr(settings, "EMAIL_SIGNAL_SUPPRESSION_REFRESH", 60)
+
+
+def reload_interval() -> float:
+    """Return how often, in seconds, the whole list is reloaded."""
+    return getattr(settings, "EMAIL_SIGNAL_SUPPRESSION_RELOAD", 3600)
+
+
+def _load(now: float) -> None:
+    emails, latest = set(), None
+    rows = SuppressedAddress.objects.filter(active=True).values_list(
+        "email", "updated_at"
+    )
+    for email, updated_at in rows.iterator(chunk_size=10000):
+        emails.add(email)
+        if latest is None or updated_at > latest:
+            latest = updated_at
+    _state.update(emails=emails, latest=latest, refreshed=now, loaded=now)
+    metrics.incr("suppression_list.loads")
+
+
+def _refresh(now: float) -> None:
+    rows = SuppressedAddress.objects.order_by("updated_at")
+    if _state["latest"] is not None:
+        # Rows saved in the same instant as the latest row may not have
+        # been read yet, so they are read again.
+        rows = rows.filter(updated_at__gte=_state["latest"])
+    emails = _state["emails"]
+    for email, active, updated_at in rows.values_list(
+        "email", "active", "updated_at"
+    ):
+        if active:
+            emails.add(email)
+        else:
+            emails.discard(email)
+        _state["latest"] = updated_at
+    _state["refreshed"] = now
+
+
+def addresses() -> _t.Set[str]:
+    """Return the suppressed addresses, refreshing them when they are due
+    to be.
+    """
+    now = time.monotonic()
+    if (
+        _state["emails"] is not None
+        and now - _state["refreshed"] < refresh_interval()
+    ):
+        return _state["emails"]
+    with _lock:
+        if (
+            _state["emails"] is None
+            or now - _state["loaded"] >= reload_interval()
+        ):
+            _load(now)
+        elif now - _state["refreshed"] >= refresh_interval():
+            _refresh(now)
+    return _state["emails"]
+
+
+def clear() -> None:
+    """Discard the loaded addresses, so they are loaded again when they are
+    next used.
+    """
+    with _lock:
+        _state.update(emails=None, latest=None, refreshed=0.0, loaded=0.0)
+
+
+def is_suppressed(email: str) -> bool:
+    """Return `True` if signal emails should not be sent to an address.
+
+    Args:
+        email: A normalised email address, see `recipients.normalise()`.
+    """
+    return email.lower() in addresses()
+
+
+def suppress(
+    email: str, reason: str = SuppressedAddress.ReasonChoices.manual
+) -> SuppressedAddress:
+    """Stop sending signal emails to an address.
+
+    Args:
+        email: The address to suppress.
+        reason: One of `SuppressedAddress.ReasonChoices`.
+    """
+    address, _ = SuppressedAddress.objects.update_or_create(
+        email=recipients.normalise(email).lower(),
+        defaults={"reason": reason, "active": True},
+    )
+    return address
+
+
+@receiver(signals.post_save, sender=SuppressedAddress)
+def _saved(instance: SuppressedAddress, **kwargs) -> None:
+    emails = _state["emails"]
+    if emails is None:
+        return
+    if instance.active:
+        emails.add(instance.email)
+    else:
+        emails.discard(instance.email)
+
+
+@receiver(signals.post_delete, sender=SuppressedAddress)
+def _deleted(instance: SuppressedAddress, **kwargs) -> None:
+    if _state["emails"] is not None:
+        _state["emails"].discard(instance.email)
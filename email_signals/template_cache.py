@@ -0,0 +1,121 @@
+"""A bounded, per-process cache of compiled templates for the plain text and
+HTML content of signals, so that the same content is not parsed again every
+time an email is sent.
+
+Templates are keyed by the signal's id, the field the content came from and
+a hash of the content. Entries for a signal are discarded when it is saved
+or deleted. Hits and misses are counted in `email_signals.metrics`.
+"""
+
+import hashlib
+import threading
+import typing as _t
+from collections import OrderedDict
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.template import engines
+from . import metrics
+
+_lock = threading.Lock()
+_templates: "OrderedDict[tuple, _t.Any]" = OrderedDict()
+_engine = None
+
+
+def max_size() -> int:
+    """Return the maximum number of templates to cache."""
+    return getattr(settings, "EMAIL_SIGNAL_TEMPLATE_CACHE_SIZE", 256)
+
+
+def get_engine():
+    """Return the template engine used to render signal content. The engine
+    is resolved once and reused.
+    """
+    global _engine
+    if _engine is None:
+        backends = engines.all()
+        if not backends:
+            raise ValueError(
+                "Could not find a template engine that can render the string."
+            )
+        _engine = backends[0]
+    return _engine
+
+
+def get_template(
+    source: str,
+    signal_id: _t.Optional[_t.Any] = None,
+    field: _t.Optional[str] = None,
+):
+    """Return the compiled template for `source`, compiling and caching it
+    if it has not been seen before.
+
+    Args:
+        source: The template string.
+        signal_id: The id of the signal the content belongs to, if any.
+        field: The name of the field the content came from, if any.
+
+    Returns:
+        The compiled template.
+    """
+    digest = hashlib.sha1(str(source).encode("utf-8")).hexdigest()
+    key = (signal_id, field, digest)
+    with _lock:
+        template = _templates.get(key)
+        if template is not None:
+            _templates.move_to_end(key)
+    if template is not None:
+        metrics.incr("template_cache.hits")
+        return template
+
+    metrics.incr("template_cache.misses")
+    template = get_engine().from_string(source)
+    with _lock:
+        _templates[key] = template
+        _templates.move_to_end(key)
+        while len(_templates) > max_size():
+            _templates.popitem(last=False)
+    return template
+
+
+def invalidate(signal_id: _t.Optional[_t.Any] = None) -> None:
+    """Discard the cached templates of a signal, or every cached template if
+    `signal_id` is not given.
+    """
+    with _lock:
+        if signal_id is None:
+            _templates.clear()
+            return
+        for key in [key for key in _templates if key[0] == signal_id]:
+            del _templates[key]
+
+
+def stats() -> _t.Dict[str, int]:
+    """Return the number of hits and misses and the size of the cache."""
+    with _lock:
+        size = len(_templates)
+    return {
+        "hits": metrics.get("template_cache.hits"),
+        "misses": metrics.get("template_cache.misses"),
+        "size": size,
+        "max_size": max_size(),
+    }
+
+
+@receiver(post_save, sender="email_signals.Signal")
+@receiver(post_delete, sender="email_signals.Signal")
+def _invalidate_signal(instance, **kwargs) -> None:
+    """Discard a signal's templates when it is edited or deleted."""
+    invalidate(instance.pk)
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting: str, **kwargs) -> None:
+    """Discard the engine and templates when the template settings
+    change.
+    """
+    global _engine
+    if setting == "TEMPLATES":
+        _engine = None
+        invalidate()
@@ -1,6 +1,7 @@
 from django import template
 from django.urls import reverse
 from django.urls.exceptions import NoReverseMatch
+from .. import fragments
 
 
 register = template.Library()
@@ -15,3 +16,47 @@ def model_attrs_url():
         )
     except NoReverseMatch:
         return ""
+
+
+class EmailFragmentNode(template.Node):
+    """Renders a template with the current context and caches its output.
+
+    Args:
+        name: The name of the template.
+        vary_on: Values the output depends on.
+    """
+
+    def __init__(self, name, vary_on):
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        vary_on = [value.resolve(context) for value in self.vary_on]
+        return fragments.get_or_render(
+            name,
+            vary_on,
+            lambda: context.template.engine.get_template(name).render(context),
+        )
+
+
+@register.tag
+def email_fragment(parser, token):
+    """Render a template whose output is shared by many emails, such as a
+    header or footer, and cache its output. Values the output depends on
+    can be passed after the name of the template.
+
+    Usage::
+
+        {% email_fragment "emails/footer.html" %}
+        {% email_fragment "emails/header.html" instance.customer.language %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"{bits[0]!r} tag requires the name of a template."
+        )
+    return EmailFragmentNode(
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
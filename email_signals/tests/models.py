@@ -2,8 +2,9 @@ import typing as _t
 import random
 import string
 from django.db import connection, models
+from django.utils import timezone
 from django.contrib.contenttypes.models import ContentType
-from ..models import EmailSignalMixin
+from ..models import EmailSignalManager, EmailSignalMixin
 
 
 def generate_random_string() -> str:
@@ -69,6 +70,9 @@ class TestCustomerOrderModel(models.Model, EmailSignalMixin):
     order_number = models.CharField(
         max_length=100, default=generate_random_string, null=True, blank=True
     )
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = EmailSignalManager()
 
     def my_mailing_list(self) -> _t.List[str]:
         return [self.customer.email]
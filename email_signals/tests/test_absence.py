@@ -0,0 +1,187 @@
+import datetime
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.core.management import call_command
+from django.db import models
+from django.db.models.signals import post_save
+from django.test import override_settings
+from django.utils import timezone
+import email_signals
+from .testcase import EmailSignalTestCase
+from .. import absence, forms, suppression
+from ..models import Signal, SignalConstraint, Watermark
+from ..registry import add_to_registry
+
+
+class TestAbsence(EmailSignalTestCase):
+    """Unittests for the `absence` module."""
+
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.signal = self.create_signal(
+            self.customer_order_rec, Signal.SignalTypeChoices.absence
+        )
+        self.signal.absence_field = "created_at"
+        self.signal.absence_delay = 60
+        self.signal.plain_message = "{{ instance.order_number }}"
+        self.signal.save()
+        SignalConstraint.objects.create(
+            signal=self.signal,
+            param_1="order_number",
+            comparison="startswith",
+            param_2="pending",
+        )
+        # The first scan only sets the watermark.
+        absence.scan(self.signal, now=self.now)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def create_order(self, order_number, minutes_ago=0):
+        order = self.CustomerOrder.create_record(self.customer_rec)
+        order.order_number = order_number
+        order.created_at = self.now - datetime.timedelta(minutes=minutes_ago)
+        order.save()
+        return order
+
+    def scan(self, minutes, batch_size=1000):
+        return absence.scan(
+            self.signal,
+            batch_size,
+            now=self.now + datetime.timedelta(minutes=minutes),
+        )
+
+    def test_overdue(self):
+        """Test that an email is sent once for each record which meets the
+        constraints once it is overdue.
+        """
+        self.create_order("pending-1")
+        self.create_order("completed")
+        self.assertEqual(self.scan(30), 0)
+        self.assertEqual(self.scan(61), 1)
+        self.assertEqual(mail.outbox[0].body, "pending-1")
+        self.assertEqual(self.scan(120), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_already_overdue(self):
+        """Test that records which were overdue before the first scan are
+        not sent to.
+        """
+        self.create_order("pending-1", minutes_ago=120)
+        self.assertEqual(self.scan(1), 0)
+
+    def test_batches(self):
+        """Test that records with the same value are scanned once when they
+        are split across batches.
+        """
+        for i in range(5):
+            order = self.create_order(f"pending-{i}")
+            order.created_at = self.now + datetime.timedelta(seconds=1)
+            order.save()
+        self.assertEqual(self.scan(61, batch_size=2), 5)
+        self.assertEqual(
+            sorted(message.body for message in mail.outbox),
+            [f"pending-{i}" for i in range(5)],
+        )
+        self.assertEqual(self.scan(62, batch_size=2), 0)
+
+    def test_incremental(self):
+        """Test that a scan only reads the records after the watermark."""
+        self.create_order("pending-1")
+        self.scan(61)
+        watermark = Watermark.objects.get(signal=self.signal)
+        self.assertEqual(
+            watermark.value, self.now + datetime.timedelta(minutes=1)
+        )
+        with self.assertNumQueries(6):
+            # The savepoint and its release, the locked watermark, the
+            # constraints, the scan and saving the watermark.
+            self.scan(62)
+
+    def test_date_field(self):
+        """Test that records with a date field are only due once their whole
+        day is before the cutoff.
+        """
+        end = datetime.datetime(2024, 1, 2, 10, 30)
+        field = models.DateField()
+        self.assertEqual(
+            absence._position(absence.last_due(end, field), field),
+            datetime.date(2024, 1, 1),
+        )
+        field = models.DateTimeField()
+        self.assertEqual(absence.last_due(end, field), end)
+
+    @override_settings(USE_TZ=True, TIME_ZONE="Asia/Tokyo")
+    def test_date_field_time_zone(self):
+        """Test that the days of a date field are those of the current time
+        zone, so that a watermark reads back as the day it was set to.
+        """
+        field = models.DateField()
+        day = datetime.date(2024, 1, 5)
+        end = timezone.make_aware(datetime.datetime(2024, 1, 6, 0, 30))
+        Watermark.objects.filter(signal=self.signal).update(
+            value=absence._watermark(day, end)
+        )
+        watermark = Watermark.objects.get(signal=self.signal)
+        self.assertEqual(absence._position(watermark.value, field), day)
+        # `end` is 2024-01-05 15:30 UTC, when the 5th is over in Tokyo.
+        self.assertEqual(
+            absence._position(absence.last_due(end, field), field), day
+        )
+
+    def test_suppressed(self):
+        """Test that a suppressed model is not scanned, and that its records
+        are sent to once it is no longer suppressed.
+        """
+        self.create_order("pending-1")
+        with email_signals.suppressed(models=[self.CustomerOrder]):
+            self.assertEqual(self.scan(61), 0)
+        suppression.set_kill_switch(True)
+        self.addCleanup(suppression.set_kill_switch, False)
+        self.assertEqual(self.scan(61), 0)
+        self.assertEqual(len(mail.outbox), 0)
+        suppression.set_kill_switch(False)
+        self.assertEqual(self.scan(61), 1)
+
+    def test_suppressed_other_signal(self):
+        """Test that blocks which only cover some signal types do not
+        suppress absence signals.
+        """
+        self.create_order("pending-1")
+        with email_signals.suppressed(signals=[post_save]):
+            self.assertEqual(self.scan(61), 1)
+
+    def test_command(self):
+        """Test that the command scans the active absence signals."""
+        self.CustomerOrder.objects.filter(
+            pk=self.customer_order_rec.pk
+        ).update(order_number="pending", created_at=self.now)
+        Watermark.objects.filter(signal=self.signal).update(
+            value=self.now - datetime.timedelta(minutes=1)
+        )
+        self.signal.absence_delay = 0
+        self.signal.save()
+        call_command("email_signals_absence", once=True)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_form(self):
+        """Test that absence signals need a date field and a delay."""
+        add_to_registry(self.CustomerOrder)
+        data = {
+            "name": "Absence",
+            "content_type": ContentType.objects.get_for_model(
+                self.CustomerOrder
+            ).pk,
+            "signal_type": Signal.SignalTypeChoices.absence,
+            "subject": "Subject",
+            "mailing_list": "my_mailing_list",
+            "plain_message": "{{ instance.order_number }}",
+            "render_engine": "",
+            "absence_field": "order_number",
+            "absence_delay": 60,
+            "active": True,
+        }
+        form = forms.SignalAdminForm(data)
+        self.assertFalse(form.is_valid())
+        self.assertIn("not a date or datetime field", str(form.errors))
+        form = forms.SignalAdminForm({**data, "absence_field": "created_at"})
+        self.assertTrue(form.is_valid(), form.errors)
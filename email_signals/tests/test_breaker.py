@@ -0,0 +1,168 @@
+import smtplib
+from unittest import mock
+from django.core import mail
+from django.db.models import signals as django_signals
+from django.test import SimpleTestCase, override_settings
+from .testcase import EmailSignalTestCase
+from .. import breaker, delivery, metrics, signals
+from ..models import OutboxEmail
+
+
+class FakeClock:
+    """A clock which only moves when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def fail():
+    raise OSError("down")
+
+
+class TestCircuitBreaker(SimpleTestCase):
+    """Unittests for the `CircuitBreaker` class."""
+
+    def setUp(self):
+        metrics.reset()
+        self.clock = FakeClock()
+        self.breaker = breaker.CircuitBreaker(
+            threshold=2, cooldown=10, clock=self.clock
+        )
+
+    def trip(self):
+        for _ in range(self.breaker.threshold):
+            with self.assertRaises(OSError):
+                self.breaker.call(fail)
+
+    def test_opens_after_threshold(self):
+        """Test that the circuit opens after consecutive failures and rejects
+        calls without making them.
+        """
+        with self.assertRaises(OSError):
+            self.breaker.call(fail)
+        self.assertEqual(self.breaker.state, breaker.CLOSED)
+        with self.assertRaises(OSError):
+            self.breaker.call(fail)
+        self.assertEqual(self.breaker.state, breaker.OPEN)
+
+        func = mock.Mock()
+        with self.assertRaises(breaker.CircuitOpenError):
+            self.breaker.call(func)
+        func.assert_not_called()
+        self.assertEqual(metrics.get("breaker.opened"), 1)
+        self.assertEqual(metrics.get("breaker.rejected"), 1)
+        self.assertEqual(metrics.get("breaker.state"), breaker.OPEN)
+
+    def test_success_resets_failures(self):
+        """Test that only consecutive failures count."""
+        with self.assertRaises(OSError):
+            self.breaker.call(fail)
+        self.breaker.call(lambda: None)
+        with self.assertRaises(OSError):
+            self.breaker.call(fail)
+        self.assertEqual(self.breaker.state, breaker.CLOSED)
+
+    def test_half_open_probe_succeeds(self):
+        """Test that a single probe is allowed after the cooldown and that
+        the circuit closes if it succeeds.
+        """
+        self.trip()
+        self.clock.now = 10
+        self.assertEqual(self.breaker.state, breaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, breaker.CLOSED)
+
+    def test_half_open_probe_fails(self):
+        """Test that the circuit opens again if the probe fails."""
+        self.trip()
+        self.clock.now = 10
+        with self.assertRaises(OSError):
+            self.breaker.call(fail)
+        self.assertEqual(self.breaker.state, breaker.OPEN)
+        self.clock.now = 15
+        self.assertEqual(self.breaker.state, breaker.OPEN)
+
+    def test_refused_recipient_is_not_a_failure(self):
+        """Test that the email backend's breaker stays closed when a
+        recipient is refused or the message can't be built, and opens when
+        the relay can't be reached.
+        """
+        circuit = breaker.CircuitBreaker(
+            threshold=2, is_failure=delivery.is_backend_error
+        )
+        refused = smtplib.SMTPRecipientsRefused(
+            {"bad@test.com": (550, b"No such user")}
+        )
+        for error in (refused, refused, ValueError("bad"), ValueError("bad")):
+            with self.assertRaises(type(error)):
+                circuit.call(mock.Mock(side_effect=error))
+        self.assertEqual(circuit.state, breaker.CLOSED)
+
+        for error in (
+            smtplib.SMTPServerDisconnected(),
+            smtplib.SMTPResponseException(421, b"Try later"),
+        ):
+            with self.assertRaises(type(error)):
+                circuit.call(mock.Mock(side_effect=error))
+        self.assertEqual(circuit.state, breaker.OPEN)
+
+    @override_settings(
+        EMAIL_SIGNAL_BREAKER_THRESHOLD=3, EMAIL_SIGNAL_BREAKER_COOLDOWN=1
+    )
+    def test_get_breaker_settings(self):
+        """Test that the email backend's breaker is configured by
+        settings.
+        """
+        self.assertEqual(breaker.get_breaker().threshold, 3)
+        self.assertEqual(breaker.get_breaker().cooldown, 1)
+        self.assertIs(breaker.get_breaker(), breaker.get_breaker())
+
+
+@override_settings(EMAIL_SIGNAL_BREAKER_THRESHOLD=1)
+class TestBreakerFallback(EmailSignalTestCase):
+    """Unittests for sending signal emails whilst the circuit is open."""
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        breaker.reset_breaker()
+        self.addCleanup(breaker.reset_breaker)
+        self.signal = self.create_signal(self.customer_order_rec)
+        with mock.patch(
+            "django.core.mail.EmailMessage.send", side_effect=OSError
+        ), self.assertLogs("email_signals.signals", "ERROR"):
+            with self.assertRaises(OSError):
+                signals.signal_callback(
+                    self.customer_order_rec, django_signals.pre_save
+                )
+        self.assertEqual(breaker.get_breaker().state, breaker.OPEN)
+
+    def test_queued_in_outbox(self):
+        """Test that emails are queued in the outbox whilst the circuit is
+        open.
+        """
+        signals.signal_callback(
+            self.customer_order_rec, django_signals.pre_save
+        )
+        self.assertEqual(len(mail.outbox), 0)
+        item = OutboxEmail.objects.get()
+        self.assertEqual(item.recipients, [self.customer_rec.email])
+        self.assertIsNotNone(item.payload)
+        self.assertEqual(metrics.get("emails.deferred"), 1)
+        self.assertEqual(metrics.get("emails.failed"), 1)
+
+    @override_settings(EMAIL_SIGNAL_BREAKER_FALLBACK="drop")
+    def test_dropped(self):
+        """Test that emails can be dropped whilst the circuit is open."""
+        with self.assertLogs("email_signals.signals", "WARNING"):
+            signals.signal_callback(
+                self.customer_order_rec, django_signals.pre_save
+            )
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(OutboxEmail.objects.exists())
+        self.assertEqual(metrics.get("emails.dropped"), 1)
@@ -0,0 +1,113 @@
+from unittest import mock
+from django.core import mail
+from django.db.models import signals as django_signals
+from django.test import SimpleTestCase, override_settings
+from .testcase import EmailSignalTestCase
+from .. import budgets, metrics, rendering, signals
+from ..models import OutboxEmail
+
+LOOP = "{% for char in '" + "x" * 200 + "' %}{{ char }}{% endfor %}"
+
+
+class TestBudgets(SimpleTestCase):
+    """Unittests for the `budgets` module."""
+
+    @mock.patch("email_signals.budgets.time.monotonic")
+    def test_budget(self, monotonic):
+        """Test that a budget is exceeded once its deadline has passed and
+        that nested budgets can only bring the deadline forward.
+        """
+        monotonic.return_value = 0
+        self.assertFalse(budgets.active())
+        with budgets.budget(10, budgets.DISPATCH):
+            with budgets.budget(20, budgets.RENDER):
+                monotonic.return_value = 15
+                with self.assertRaises(budgets.BudgetExceeded) as ctx:
+                    budgets.check()
+                self.assertEqual(ctx.exception.kind, budgets.DISPATCH)
+            monotonic.return_value = 5
+            with budgets.budget(1, budgets.RENDER):
+                self.assertFalse(budgets.exceeded())
+                monotonic.return_value = 7
+                self.assertTrue(budgets.exceeded())
+        self.assertFalse(budgets.active())
+        budgets.check()
+
+    def test_no_budget(self):
+        """Test that templates render as usual without a budget."""
+        with budgets.budget(None, budgets.RENDER):
+            self.assertEqual(rendering.render_string(LOOP, {}), "x" * 200)
+
+    @override_settings(EMAIL_SIGNAL_JINJA2_BYTECODE_CACHE=None)
+    def test_render_abandoned(self):
+        """Test that rendering is abandoned when it runs over budget."""
+        # The loop is valid in both engines.
+        for engine in (rendering.DJANGO, rendering.JINJA2):
+            with self.subTest(engine=engine):
+                with budgets.budget(0, budgets.RENDER):
+                    with self.assertRaises(budgets.BudgetExceeded):
+                        rendering.render_string(LOOP, {}, engine)
+                with budgets.budget(60, budgets.RENDER):
+                    self.assertEqual(
+                        rendering.render_string(LOOP, {}, engine), "x" * 200
+                    )
+
+
+class TestSignalBudgets(EmailSignalTestCase):
+    """Unittests for budgets when handling signals."""
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.signal = self.create_signal(self.customer_order_rec)
+        self.signal.plain_message = LOOP
+        self.signal.save()
+
+    def dispatch(self):
+        signals.signal_callback(
+            self.customer_order_rec, django_signals.pre_save
+        )
+
+    @override_settings(EMAIL_SIGNAL_RENDER_BUDGET=0)
+    def test_render_budget(self):
+        """Test that an email which runs over its render budget is queued in
+        the outbox.
+        """
+        with self.assertLogs("email_signals.signals", "WARNING") as logs:
+            self.dispatch()
+        self.assertIn(f"signal {self.signal.pk}", logs.output[0])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(OutboxEmail.objects.filter(signal=self.signal))
+        self.assertEqual(metrics.get("budgets.exceeded"), 1)
+
+    @override_settings(
+        EMAIL_SIGNAL_RENDER_BUDGET=0, EMAIL_SIGNAL_BUDGET_FALLBACK="drop"
+    )
+    def test_render_budget_drop(self):
+        """Test that an email which runs over its render budget can be
+        dropped.
+        """
+        with self.assertLogs("email_signals.signals", "WARNING"):
+            self.dispatch()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(OutboxEmail.objects.filter(signal=self.signal))
+        self.assertEqual(metrics.get("emails.dropped"), 1)
+
+    @override_settings(EMAIL_SIGNAL_DISPATCH_BUDGET=0)
+    def test_dispatch_budget(self):
+        """Test that emails are queued once the dispatch budget has been
+        used up.
+        """
+        with self.assertLogs("email_signals.signals", "WARNING"):
+            self.dispatch()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(OutboxEmail.objects.filter(signal=self.signal))
+
+    @override_settings(
+        EMAIL_SIGNAL_RENDER_BUDGET=60, EMAIL_SIGNAL_DISPATCH_BUDGET=60
+    )
+    def test_within_budget(self):
+        """Test that emails within their budgets are sent."""
+        self.dispatch()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].body, "x" * 200)
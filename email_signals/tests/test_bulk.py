@@ -0,0 +1,167 @@
+from unittest import mock
+from django.core import mail
+from django.db import connection
+from django.db.models import Q
+from django.db.models import signals as django_signals
+from django.test import override_settings
+import email_signals
+from .testcase import EmailSignalTestCase
+from .. import bulk, metrics
+from ..models import Signal, SignalConstraint
+
+
+class TestBulk(EmailSignalTestCase):
+    """Unittests for the `bulk` module."""
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.setup_signals()
+        self.addCleanup(self.disconnect_signals)
+        self.orders = [self.customer_order_rec] + [
+            self.CustomerOrder.create_record(self.customer_rec)
+            for _ in range(3)
+        ]
+        self.signal = self.create_signal(
+            self.customer_order_rec, Signal.SignalTypeChoices.post_save
+        )
+        self.signal.plain_message = (
+            "{{ instance.order_number }} {{ signal_kwargs.created }}"
+        )
+        self.signal.save()
+        self.add_constraint("order_number", "startswith", "match")
+        mail.outbox = []
+
+    def add_constraint(self, param_1, comparison, param_2=None):
+        return SignalConstraint.objects.create(
+            signal=self.signal,
+            param_1=param_1,
+            comparison=comparison,
+            param_2=param_2,
+        )
+
+    def test_constraint_filter(self):
+        """Test that constraints are translated into lookups when the
+        database gives the same answer.
+        """
+        model = self.CustomerOrder
+        cases = [
+            (
+                "order_number",
+                "startswith",
+                "a",
+                Q(order_number__startswith="a"),
+            ),
+            ("order_number", "exact", "5", Q(order_number=5)),
+            ("customer.email", "iexact", "a", Q(customer__email__iexact="a")),
+            ("id", "gt", "5", Q(id__gt=5.0)),
+            ("order_number", "isnull", None, Q(order_number__isnull=True)),
+            ("order_number", "gt", "5", None),
+            ("order_number", "regex", "^a", None),
+            ("order_number", "exact", "customer.email", None),
+            ("created", "istrue", None, None),
+            ("customer", "exact", "1", None),
+            ("order_number", "icontains", "é", None),
+        ]
+        for param_1, comparison, param_2, expected in cases:
+            constraint = SignalConstraint(
+                param_1=param_1, comparison=comparison, param_2=param_2
+            )
+            with self.subTest(param_1=param_1, comparison=comparison):
+                self.assertEqual(
+                    bulk.constraint_filter(
+                        model, constraint, {"created": False}
+                    ),
+                    expected,
+                )
+
+    def test_non_ascii_case(self):
+        """Test that rows which only match a case insensitive constraint
+        when non-ASCII letters are folded are still sent to on SQLite.
+        """
+        self.signal.constraints.all().delete()
+        self.add_constraint("order_number", "iexact", "éclair")
+        self.CustomerOrder.objects.filter(pk=self.orders[0].pk).update(
+            order_number="ÉCLAIR"
+        )
+        self.assertEqual(len(mail.outbox), 1)
+
+        constraint = SignalConstraint(
+            param_1="order_number", comparison="iexact", param_2="éclair"
+        )
+        with mock.patch.object(connection, "vendor", "postgresql"):
+            self.assertEqual(
+                bulk.constraint_filter(self.CustomerOrder, constraint, {}),
+                Q(order_number__iexact="éclair"),
+            )
+
+    def test_bulk_update(self):
+        """Test that an email is sent for each updated row which matches."""
+        self.orders[0].order_number = "match-0"
+        self.orders[1].order_number = "match-1"
+        self.orders[2].order_number = "other"
+        self.CustomerOrder.objects.bulk_update(
+            self.orders[:3], ["order_number"]
+        )
+        self.assertEqual(
+            sorted(message.body for message in mail.outbox),
+            ["match-0 False", "match-1 False"],
+        )
+
+    def test_update(self):
+        """Test that `QuerySet.update()` evaluates the updated rows."""
+        self.CustomerOrder.objects.filter(pk=self.orders[0].pk).update(
+            order_number="match"
+        )
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].body, "match False")
+
+    def test_bulk_create(self):
+        """Test that created rows are evaluated with `created`."""
+        self.add_constraint("created", "istrue")
+        self.CustomerOrder.objects.bulk_create(
+            [
+                self.CustomerOrder(customer=self.customer_rec, order_number=n)
+                for n in ("match-a", "other")
+            ]
+        )
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].body, "match-a True")
+
+    def test_kwargs_constraint(self):
+        """Test that no rows are loaded when a constraint on the kwargs of
+        the operation fails.
+        """
+        self.add_constraint("created", "istrue")
+        self.CustomerOrder.objects.update(order_number="match")
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(metrics.get("bulk.matched"), 0)
+
+    @override_settings(EMAIL_SIGNAL_BULK_SUMMARY=True)
+    def test_summary(self):
+        """Test that matching rows are sent as a single summary."""
+        self.CustomerOrder.objects.update(order_number="match")
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].body, "\n\n".join(["match False"] * 4))
+
+    @override_settings(EMAIL_SIGNAL_BULK_CHUNK_SIZE=1)
+    def test_chunked(self):
+        """Test that the rows are loaded a chunk of primary keys at a
+        time, after the constraints.
+        """
+        with self.assertNumQueries(3):
+            list(
+                bulk.matches(
+                    self.signal,
+                    self.CustomerOrder,
+                    [order.pk for order in self.orders[:2]],
+                    [],
+                    {"created": False},
+                )
+            )
+
+    def test_suppressed(self):
+        """Test that suppressed bulk operations are not evaluated."""
+        with email_signals.suppressed(signals=[django_signals.post_save]):
+            self.CustomerOrder.objects.update(order_number="match")
+        self.assertEqual(len(mail.outbox), 0)
@@ -0,0 +1,79 @@
+from django.core import mail
+from django.test import override_settings
+from .testcase import EmailSignalTestCase
+from .. import metrics, outbox
+from ..models import OutboxEmail, Signal
+
+
+@override_settings(EMAIL_SIGNAL_CASCADE_SUMMARY=True)
+class TestCascade(EmailSignalTestCase):
+    """Unittests for the `cascade` module."""
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.setup_signals()
+        self.addCleanup(self.disconnect_signals)
+        self.orders = [self.customer_order_rec] + [
+            self.CustomerOrder.create_record(self.customer_rec)
+            for _ in range(2)
+        ]
+        self.signal = self.create_signal(
+            self.customer_order_rec, Signal.SignalTypeChoices.post_delete
+        )
+        self.signal.plain_message = "{{ instance.order_number }}"
+        self.signal.save()
+
+    def test_summary(self):
+        """Test that the rows deleted by a cascade are sent in a single
+        summary.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer_rec.delete()
+            self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            sorted(mail.outbox[0].body.split("\n\n")),
+            sorted(order.order_number for order in self.orders),
+        )
+        self.assertEqual(mail.outbox[0].to, [self.customer_rec.email])
+        # pre_delete and post_delete for each order.
+        self.assertEqual(metrics.get("cascade.collected"), 6)
+        self.assertEqual(metrics.get("cascade.summaries"), 1)
+
+    @override_settings(EMAIL_SIGNAL_DIGEST_MAX_EVENTS=2)
+    def test_omitted(self):
+        """Test that the summary only renders up to the maximum number of
+        events.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer_rec.delete()
+        self.assertEqual(len(mail.outbox[0].body.split("\n\n")), 3)
+        self.assertTrue(mail.outbox[0].body.endswith("And 1 more."))
+
+    def test_deferred(self):
+        """Test that the summary is queued in the outbox when emails are
+        deferred.
+        """
+        with override_settings(EMAIL_SIGNAL_DELIVERY_MODE=outbox.SNAPSHOT):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.customer_rec.delete()
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+        outbox.process_outbox()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(len(mail.outbox[0].body.split("\n\n")), 3)
+
+    def test_direct_delete(self):
+        """Test that a row deleted directly is evaluated as before."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer_order_rec.delete()
+            self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(metrics.get("cascade.collected"), 0)
+
+    @override_settings(EMAIL_SIGNAL_CASCADE_SUMMARY=False)
+    def test_disabled(self):
+        """Test that each deleted row is evaluated when batching is
+        disabled.
+        """
+        self.customer_rec.delete()
+        self.assertEqual(len(mail.outbox), 3)
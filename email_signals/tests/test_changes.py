@@ -0,0 +1,213 @@
+import datetime
+from unittest import mock
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+from .testcase import EmailSignalTestCase
+from .. import changes
+from ..models import ChangeLog, Signal, SignalConstraint
+
+
+class ChangesTestCase(EmailSignalTestCase):
+    """Sets up a `post_save` signal for orders whose number starts with
+    "pending".
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.setup_signals()
+        self.addCleanup(self.disconnect_signals)
+        self.signal = self.create_signal(
+            self.customer_order_rec, Signal.SignalTypeChoices.post_save
+        )
+        self.signal.plain_message = "{{ instance.order_number }}"
+        self.signal.save()
+        SignalConstraint.objects.create(
+            signal=self.signal,
+            param_1="order_number",
+            comparison="startswith",
+            param_2="pending",
+        )
+
+    def execute(self, sql, params=()):
+        table = connection.ops.quote_name(self.CustomerOrder._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(table=table), params)
+
+
+@override_settings(EMAIL_SIGNAL_CHANGE_CAPTURE=changes.TRIGGERS)
+class TestTriggers(ChangesTestCase):
+    """Unittests for capturing changes with triggers."""
+
+    def setUp(self):
+        super().setUp()
+        changes.install([self.CustomerOrder])
+        self.addCleanup(changes.uninstall, [self.CustomerOrder])
+        ChangeLog.objects.all().delete()
+
+    def test_raw_sql(self):
+        """Test that a change made with raw SQL is evaluated."""
+        self.execute(
+            "UPDATE {table} SET order_number = %s WHERE id = %s",
+            ["pending-1", self.customer_order_rec.pk],
+        )
+        self.assertEqual(ChangeLog.objects.count(), 1)
+        self.assertEqual(changes.process_changes(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].body, "pending-1")
+        self.assertFalse(ChangeLog.objects.exists())
+        self.assertEqual(changes.process_changes(), 0)
+
+    def test_orm_save(self):
+        """Test that a save is evaluated once, when the change log is
+        drained rather than when it is saved.
+        """
+        self.customer_order_rec.order_number = "pending-1"
+        self.customer_order_rec.save()
+        self.assertEqual(len(mail.outbox), 0)
+        changes.process_changes()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_coalesced(self):
+        """Test that repeated changes of a row in a batch are evaluated
+        once, as created if any of them was an insert.
+        """
+        order = self.CustomerOrder.create_record(self.customer_rec)
+        order.order_number = "pending-1"
+        order.save()
+        order.save()
+        self.assertEqual(
+            sorted(ChangeLog.objects.values_list("operation", flat=True)),
+            ["I", "U", "U", "U"],
+        )
+        with mock.patch.object(changes, "_evaluate") as evaluate:
+            self.assertEqual(changes.process_changelog(), 4)
+        evaluate.assert_called_once()
+        instance, signal_kwargs = evaluate.call_args[0]
+        self.assertEqual(instance, order)
+        self.assertTrue(signal_kwargs["created"])
+
+    def test_batches(self):
+        """Test that the change log is drained in batches."""
+        for i in range(3):
+            self.execute(
+                "INSERT INTO {table} (customer_id, order_number, created_at) "
+                "VALUES (%s, %s, %s)",
+                [self.customer_rec.pk, f"pending-{i}", timezone.now()],
+            )
+        self.assertEqual(changes.process_changelog(batch_size=2), 2)
+        self.assertEqual(changes.process_changelog(batch_size=2), 1)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_deleted(self):
+        """Test that rows deleted before the change log is drained are
+        skipped.
+        """
+        self.execute("UPDATE {table} SET order_number = %s", ["pending-1"])
+        self.CustomerOrder.objects.all().delete()
+        self.assertEqual(changes.process_changes(), 1)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_command(self):
+        """Test that the command drains the change log."""
+        self.execute("UPDATE {table} SET order_number = %s", ["pending-1"])
+        call_command("email_signals_changes", "--once")
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_unsupported_vendor(self):
+        """Test that installing triggers on another database fails."""
+        unsupported = mock.Mock(vendor="oracle")
+        with self.assertRaises(NotImplementedError):
+            changes.trigger_sql(self.CustomerOrder, unsupported)
+
+
+@override_settings(EMAIL_SIGNAL_CHANGE_CAPTURE=changes.TRIGGERS)
+class TestTriggersNotInstalled(ChangesTestCase):
+    """Unittests for the triggers mode before triggers are installed."""
+
+    def test_post_save_sent(self):
+        """Test that saves are still evaluated when they are saved until the
+        model's triggers are installed.
+        """
+        self.assertFalse(changes.captured(self.CustomerOrder))
+        self.customer_order_rec.order_number = "pending-1"
+        self.customer_order_rec.save()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_partial_install(self):
+        """Test that only the models whose triggers are installed are
+        captured.
+        """
+        changes.install([self.CustomerOrder])
+        self.addCleanup(changes.uninstall, [self.CustomerOrder])
+        self.assertTrue(changes.captured(self.CustomerOrder))
+        self.assertFalse(changes.captured(self.Customer))
+
+    def test_unsupported_vendor(self):
+        """Test that nothing is captured on databases without triggers."""
+        with mock.patch.object(connection, "vendor", "oracle"):
+            self.assertEqual(changes._read_installed("default"), frozenset())
+
+
+@override_settings(
+    EMAIL_SIGNAL_CHANGE_CAPTURE=changes.POLLING,
+    EMAIL_SIGNAL_CHANGE_POLL_LAG=0,
+)
+class TestPolling(ChangesTestCase):
+    """Unittests for capturing changes by polling."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(
+            self.CustomerOrder,
+            "EMAIL_SIGNAL_UPDATED_FIELD",
+            "created_at",
+            create=True,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = timezone.now()
+        # The first poll only sets the watermark.
+        changes.poll(now=self.now)
+
+    def test_polled(self):
+        """Test that rows changed since the last poll are evaluated once."""
+        later = self.now + datetime.timedelta(seconds=1)
+        self.execute(
+            "UPDATE {table} SET order_number = %s, created_at = %s",
+            ["pending-1", later],
+        )
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(changes.poll(now=later), 1)
+        self.assertEqual(mail.outbox[0].body, "pending-1")
+        self.assertEqual(changes.poll(now=later), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_orm_save(self):
+        """Test that saves of a polled model are not evaluated when they
+        are saved.
+        """
+        self.customer_order_rec.order_number = "pending-1"
+        self.customer_order_rec.save()
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_uncaptured_model(self):
+        """Test that only models with an updated field are polled."""
+        self.assertTrue(changes.captured(self.CustomerOrder))
+        self.assertFalse(changes.captured(self.Customer))
+
+    def test_created_constraint(self):
+        """Test that polling a signal with a constraint on created warns
+        that it can't match.
+        """
+        SignalConstraint.objects.create(
+            signal=self.signal,
+            param_1="created",
+            comparison="exact",
+            param_2="True",
+        )
+        with self.assertLogs("email_signals.changes", "WARNING") as logs:
+            changes.poll(now=self.now)
+        self.assertIn("constraint on created", logs.output[0])
@@ -0,0 +1,90 @@
+from django.core import mail
+from django.db import transaction
+from django.db.models import signals as django_signals
+from django.test import override_settings
+from .testcase import EmailSignalTestCase
+from .. import coalesce, metrics, signals
+from ..models import Signal
+
+
+@override_settings(EMAIL_SIGNAL_COALESCE=True)
+class TestCoalesce(EmailSignalTestCase):
+    """Unittests for the `coalesce` module."""
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.signal = self.create_signal(
+            self.customer_order_rec, Signal.SignalTypeChoices.post_save
+        )
+        self.signal.plain_message = (
+            "{{ instance.order_number }} {{ signal_kwargs.created }}"
+        )
+        self.signal.save()
+
+    def save(self, order_number: str, created: bool = False):
+        self.customer_order_rec.order_number = order_number
+        signals.signal_callback(
+            self.customer_order_rec,
+            django_signals.post_save,
+            sender=self.CustomerOrder,
+            created=created,
+            update_fields=None,
+            raw=False,
+            using="default",
+        )
+
+    def test_coalesced(self):
+        """Test that saves in a transaction are evaluated once at commit
+        against the final state.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.save("first", created=True)
+            self.save("second")
+            self.save("final")
+            self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].body, "final True")
+        self.assertEqual(metrics.get("coalesce.merged"), 2)
+
+    def test_rolled_back(self):
+        """Test that a save which was rolled back is not evaluated or merged
+        into later saves.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.save("rolled back", created=True)
+                    raise ValueError
+            except ValueError:
+                pass
+            self.assertEqual(coalesce._pending("default"), {})
+            self.save("final")
+            self.assertEqual(len(coalesce._pending("default")), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].body, "final False")
+        self.assertEqual(coalesce._pending("default"), {})
+
+    @override_settings(EMAIL_SIGNAL_COALESCE=False)
+    def test_disabled(self):
+        """Test that every save is evaluated when coalescing is disabled."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.save("first")
+            self.save("second")
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_merge(self):
+        """Test that the kwargs of saves are merged."""
+        self.assertEqual(
+            coalesce._merge(
+                {"created": True, "update_fields": frozenset({"a"})},
+                {"created": False, "update_fields": frozenset({"b"})},
+            ),
+            {"created": True, "update_fields": frozenset({"a", "b"})},
+        )
+        self.assertIsNone(
+            coalesce._merge(
+                {"created": False, "update_fields": None},
+                {"created": False, "update_fields": frozenset({"b"})},
+            )["update_fields"]
+        )
@@ -0,0 +1,90 @@
+from unittest import mock
+from django.core import mail
+from django.core.cache import cache
+from django.db.models import signals as django_signals
+from django.test import override_settings
+from .testcase import EmailSignalTestCase
+from .test_recipients import addresses
+from .. import dedup, emailer, metrics, signals
+
+
+class TestDedup(EmailSignalTestCase):
+    """Unittests for the `dedup` module."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        metrics.reset()
+        self.signal = self.create_signal(self.customer_order_rec)
+        self.signal.dedup_window = 60
+        self.signal.plain_message = "{{ instance.order_number }}"
+        self.signal.save()
+
+    def dispatch(self, mailing_list):
+        with mock.patch.object(
+            self.CustomerOrder,
+            "my_mailing_list",
+            side_effect=lambda: mailing_list,
+        ):
+            signals.signal_callback(
+                self.customer_order_rec, django_signals.pre_save
+            )
+
+    def test_key(self):
+        """Test that the order of the recipients does not matter."""
+        self.assertEqual(
+            dedup.key(self.signal, self.customer_order_rec, ["a", "B"]),
+            dedup.key(self.signal, self.customer_order_rec, ["b", "a"]),
+        )
+        self.assertNotEqual(
+            dedup.key(self.signal, self.customer_order_rec, ["a"]),
+            dedup.key(self.signal, self.customer_order_rec, ["a"], "hash"),
+        )
+
+    def test_duplicate_suppressed(self):
+        """Test that a duplicate is suppressed before it is rendered."""
+        self.dispatch(addresses(2))
+        with mock.patch.object(
+            emailer, "build_email", wraps=emailer.build_email
+        ) as build_email:
+            self.dispatch(addresses(2))
+        build_email.assert_not_called()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(metrics.get("dedup.sends_avoided"), 2)
+        self.assertEqual(metrics.get("dedup.renders_avoided"), 1)
+
+    def test_different_recipients(self):
+        """Test that the same email to other recipients is sent."""
+        self.dispatch(addresses(1))
+        self.dispatch(addresses(2))
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(EMAIL_SIGNAL_RECIPIENT_CHUNK_SIZE=1)
+    def test_chunks(self):
+        """Test that duplicates are suppressed a chunk at a time."""
+        self.dispatch(addresses(1))
+        self.dispatch(addresses(2))
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [["user0@test.com"], ["user1@test.com"]],
+        )
+
+    def test_by_content(self):
+        """Test that emails with different content are not duplicates when
+        the content is part of the key.
+        """
+        self.signal.dedup_by_content = True
+        self.signal.save()
+        self.dispatch(addresses(1))
+        self.customer_order_rec.order_number = "changed"
+        self.dispatch(addresses(1))
+        self.dispatch(addresses(1))
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_window_disabled(self):
+        """Test that emails are not deduplicated without a window."""
+        self.signal.dedup_window = None
+        self.signal.save()
+        self.dispatch(addresses(1))
+        self.dispatch(addresses(1))
+        self.assertEqual(len(mail.outbox), 2)
@@ -0,0 +1,170 @@
+import smtplib
+import socket
+import unittest
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.test import SimpleTestCase
+from .. import delivery
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # pragma: no cover
+    Controller = None
+
+
+def get_free_port() -> int:
+    """Return a free port on localhost."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class SinkHandler:
+    """An SMTP handler which stores each envelope it receives. Recipients
+    starting with "temp" or "perm" are refused with a 4xx and 5xx response
+    respectively.
+    """
+
+    def __init__(self):
+        self.envelopes = []
+
+    async def handle_RCPT(self, server, session, envelope, address, options):
+        if address.startswith("temp"):
+            return "450 Mailbox busy"
+        if address.startswith("perm"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.envelopes.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+@unittest.skipIf(
+    delivery.aiosmtplib is None or Controller is None,
+    "aiosmtplib and aiosmtpd are required",
+)
+class TestAsyncDeliveryEngine(SimpleTestCase):
+    """Unittests for the `AsyncDeliveryEngine` class."""
+
+    def setUp(self):
+        self.handler = SinkHandler()
+        self.port = get_free_port()
+        self.controller = Controller(
+            self.handler, hostname="127.0.0.1", port=self.port
+        )
+        self.controller.start()
+
+    def tearDown(self):
+        self.controller.stop()
+
+    def deliver(self, messages, **kwargs):
+        kwargs.setdefault("sessions", 2)
+        return delivery.deliver(
+            messages,
+            host="127.0.0.1",
+            port=self.port,
+            username="",
+            password="",
+            use_tls=False,
+            use_ssl=False,
+            timeout=5,
+            **kwargs,
+        )
+
+    @staticmethod
+    def message(to: str) -> EmailMessage:
+        return EmailMessage(
+            subject="Test Subject",
+            body="Test Message",
+            from_email="sender@test.com",
+            to=[to],
+        )
+
+    def test_send_messages(self):
+        """Test that all messages are delivered and results are returned in
+        the order of the messages.
+        """
+        messages = [self.message(f"user{i}@test.com") for i in range(5)]
+        results = self.deliver(messages)
+
+        self.assertEqual(len(self.handler.envelopes), 5)
+        self.assertEqual([result.message for result in results], messages)
+        self.assertTrue(all(result.ok for result in results))
+
+    def test_per_domain_limit(self):
+        """Test that messages are delivered when the per domain limit is
+        lower than the number of sessions.
+        """
+        messages = [self.message(f"user{i}@test.com") for i in range(6)]
+        results = self.deliver(messages, sessions=4, per_domain_limit=1)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(len(self.handler.envelopes), 6)
+
+    def test_temporary_failure(self):
+        """Test that a 4xx response is reported as a temporary failure and
+        does not stop the session from delivering other messages.
+        """
+        results = self.deliver(
+            [self.message("temp@test.com"), self.message("ok@test.com")],
+            sessions=1,
+        )
+        self.assertFalse(results[0].ok)
+        self.assertTrue(results[0].temporary)
+        self.assertTrue(results[1].ok)
+
+    def test_permanent_failure(self):
+        """Test that a 5xx response is reported as a permanent failure."""
+        results = self.deliver([self.message("perm@test.com")])
+        self.assertFalse(results[0].ok)
+        self.assertFalse(results[0].temporary)
+
+    def test_connection_failure(self):
+        """Test that failing to connect is reported as a temporary failure."""
+        self.port = get_free_port()
+        results = self.deliver([self.message("user@test.com")])
+        self.assertFalse(results[0].ok)
+        self.assertTrue(results[0].temporary)
+
+
+class TestMessageDomains(SimpleTestCase):
+    """Unittests for the `message_domains` function."""
+
+    def test_message_domains(self):
+        """Test that the domains are unique, lowercased and sorted."""
+        message = EmailMessage(
+            to=["a@B.com", "b@a.com"], cc=["c@b.com"], bcc=["d@c.com"]
+        )
+        self.assertEqual(
+            delivery.message_domains(message), ["a.com", "b.com", "c.com"]
+        )
+
+
+class TestDeliverSync(SimpleTestCase):
+    """Unittests for the `deliver_sync` function."""
+
+    def test_deliver_sync(self):
+        """Test that messages are sent with Django's email backend."""
+        messages = [
+            EmailMessage(subject="Test", to=["a@test.com"]),
+            EmailMessage(subject="Test", to=["b@test.com"]),
+        ]
+        results = delivery.deliver_sync(messages)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertTrue(all(result.ok for result in results))
+
+    def test_is_temporary_error(self):
+        """Test that SMTP errors are classified by their response code."""
+        self.assertTrue(
+            delivery.is_temporary_error(
+                smtplib.SMTPResponseException(451, "Try again")
+            )
+        )
+        self.assertFalse(
+            delivery.is_temporary_error(
+                smtplib.SMTPResponseException(550, "No such user")
+            )
+        )
+        self.assertTrue(delivery.is_temporary_error(ConnectionRefusedError()))
+        self.assertFalse(delivery.is_temporary_error(ValueError()))
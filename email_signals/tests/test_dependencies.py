@@ -0,0 +1,159 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import override_settings
+from .testcase import EmailSignalTestCase
+from .test_loaders import TEMPLATES
+from .. import dependencies, loaders, rendering, snapshot
+from ..models import EmailTemplate, Signal
+
+
+@override_settings(
+    TEMPLATES=TEMPLATES, EMAIL_SIGNAL_JINJA2_BYTECODE_CACHE=None
+)
+class TestDependencies(EmailSignalTestCase):
+    """Unittests for the `dependencies` module."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        self.footer = EmailTemplate.objects.create(
+            name="emails/footer.html",
+            content="<p>{{ instance.customer.email }}</p>",
+        )
+
+    def test_include(self):
+        """Test that the paths used by included templates are found, with
+        the names they are given by `with`.
+        """
+        EmailTemplate.objects.create(
+            name="emails/customer.html", content="{{ customer.name }}"
+        )
+        self.assertEqual(
+            snapshot.source_dependencies(
+                "{% include 'emails/footer.html' %}"
+                "{% include 'emails/customer.html' with "
+                "customer=instance.customer only %}"
+                "{% include 'emails/missing.html' %}"
+            ),
+            (
+                frozenset(
+                    {
+                        "instance.customer",
+                        "instance.customer.email",
+                        "instance.customer.name",
+                    }
+                ),
+                frozenset(
+                    {
+                        "emails/footer.html",
+                        "emails/customer.html",
+                        "emails/missing.html",
+                    }
+                ),
+            ),
+        )
+
+    def test_extends_cycle(self):
+        """Test that templates which extend each other are walked once."""
+        self.footer.content = (
+            "{% extends 'emails/footer.html' %}{{ instance.id }}"
+        )
+        self.footer.save()
+        paths, templates = snapshot.source_dependencies(
+            "{% extends 'emails/footer.html' %}"
+        )
+        self.assertEqual(paths, {"instance.id"})
+        self.assertEqual(templates, {"emails/footer.html"})
+
+    def test_jinja2_include(self):
+        """Test that Jinja2 includes and fragments are followed."""
+        self.assertEqual(
+            snapshot.source_dependencies(
+                "{% include 'emails/footer.html' %}"
+                "{{ email_fragment('emails/footer.html') }}",
+                rendering.JINJA2,
+            ),
+            (
+                frozenset({"instance.customer.email"}),
+                frozenset({"emails/footer.html"}),
+            ),
+        )
+
+    def test_stored_on_save(self):
+        """Test that a signal's dependencies are stored when it is saved."""
+        signal = self.create_signal(self.customer_order_rec)
+        signal.plain_message = "{{ instance.order_number }}"
+        signal.html_message = "{% include 'emails/footer.html' %}"
+        signal.save()
+        signal.refresh_from_db()
+        self.assertEqual(
+            signal.template_dependencies,
+            {
+                "paths": ["instance.customer.email", "instance.order_number"],
+                "templates": ["emails/footer.html"],
+            },
+        )
+
+        signal.plain_message = "{% if %}"
+        signal.save()
+        signal.refresh_from_db()
+        self.assertIsNone(signal.template_dependencies)
+
+    def test_refreshed_on_template_change(self):
+        """Test that the dependencies of the signals which include a
+        template are refreshed when the template is changed.
+        """
+        signal = self.create_signal(self.customer_order_rec)
+        signal.html_message = "{% include 'emails/footer.html' %}"
+        signal.save()
+
+        self.footer.content = "{{ instance.customer.name }}"
+        self.footer.save()
+        signal.refresh_from_db()
+        self.assertEqual(
+            signal.template_dependencies["paths"],
+            ["instance.customer.name"],
+        )
+        self.assertEqual(
+            snapshot.signal_paths(Signal.objects.get(pk=signal.pk)),
+            {"instance.customer.name"},
+        )
+
+    def test_invalidated_before_refresh(self):
+        """Test that compiled templates are discarded before the
+        dependencies are worked out again, whatever order the receivers
+        were connected in.
+        """
+        calls = mock.Mock()
+        with mock.patch.object(
+            loaders, "invalidate", calls.invalidate
+        ), mock.patch.object(dependencies, "refresh", calls.refresh):
+            self.footer.save()
+        self.assertEqual(
+            calls.mock_calls,
+            [mock.call.invalidate(), mock.call.refresh(self.footer.name)],
+        )
+
+    def test_invalid_paths(self):
+        """Test that paths are resolved against the model's relations."""
+        self.assertEqual(
+            dependencies.invalid_paths(
+                self.CustomerOrder,
+                [
+                    "instance.customer.name",
+                    "instance.customer.name.upper",
+                    "instance.customer.testcustomerordermodel_set.all.*.id",
+                    "instance.customer.testcustomerordermodel_set.count",
+                    "instance.customer.testcustomerordermodel_set.first.x",
+                    "instance.customer.testcustomerordermodel_set.bad",
+                    "instance.pk",
+                    "instance.missing",
+                    "signal_kwargs.created",
+                ],
+            ),
+            [
+                "instance.customer.testcustomerordermodel_set.bad",
+                "instance.customer.testcustomerordermodel_set.first.x",
+                "instance.missing",
+            ],
+        )
@@ -0,0 +1,140 @@
+import datetime
+from unittest import mock
+from django.core import mail
+from django.core.management import call_command
+from django.db.models import signals as django_signals
+from django.test import override_settings
+from django.utils import timezone
+from .testcase import EmailSignalTestCase
+from .test_recipients import addresses
+from .. import digests, outbox, signals, snapshot
+from ..models import Digest, OutboxEmail
+
+
+class TestDigests(EmailSignalTestCase):
+    """Unittests for the `digests` module."""
+
+    def setUp(self):
+        super().setUp()
+        self.signal = self.create_signal(self.customer_order_rec)
+        self.signal.digest_interval = 60
+        self.signal.plain_message = (
+            "{% for event in events %}{{ event.instance.order_number }},"
+            "{% endfor %}{{ omitted }}"
+        )
+        self.signal.save()
+
+    def dispatch(self, mailing_list, instance=None):
+        instance = instance or self.customer_order_rec
+        with mock.patch.object(
+            self.CustomerOrder,
+            "my_mailing_list",
+            side_effect=lambda: mailing_list,
+        ):
+            signals.signal_callback(instance, django_signals.pre_save)
+
+    def close_windows(self):
+        Digest.objects.update(send_at=timezone.now())
+
+    def test_event_paths(self):
+        """Test that the paths used by each event are relative to the
+        event.
+        """
+        self.assertEqual(
+            snapshot.event_paths(self.signal), {"instance.order_number"}
+        )
+
+    def test_window(self):
+        """Test that windows are aligned to the interval."""
+        now = datetime.datetime(
+            2024, 1, 1, 10, 42, tzinfo=datetime.timezone.utc
+        )
+        self.assertEqual(
+            digests.window(self.signal, now),
+            (now.replace(minute=0), now.replace(hour=11, minute=0)),
+        )
+
+    def test_events_collected(self):
+        """Test that matches are collected per recipient rather than sent."""
+        other = self.CustomerOrder.create_record(self.customer_rec)
+        self.dispatch(addresses(2))
+        self.dispatch(addresses(1), other)
+
+        self.assertEqual(len(mail.outbox), 0)
+        digest = Digest.objects.get(recipient="user0@test.com")
+        self.assertEqual(digest.event_count, 2)
+        self.assertEqual(
+            digest.events,
+            [
+                {"instance": {"order_number": order.order_number}}
+                for order in (self.customer_order_rec, other)
+            ],
+        )
+        self.assertEqual(
+            Digest.objects.get(recipient="user1@test.com").event_count, 1
+        )
+
+    @override_settings(EMAIL_SIGNAL_DIGEST_MAX_EVENTS=1)
+    def test_bounded(self):
+        """Test that events over the limit are only counted."""
+        for _ in range(3):
+            self.dispatch(addresses(1))
+        digest = Digest.objects.get()
+        self.assertEqual(len(digest.events), 1)
+        self.assertEqual(digest.event_count, 3)
+
+    def test_folded_without_events(self):
+        """Test that a folded email can be built when every event was
+        omitted.
+        """
+        self.signal.html_message = "<p>{{ instance.order_number }}</p>"
+        message = digests.build_folded(
+            self.signal,
+            {snapshot.EVENTS: [], "event_count": 3, "omitted": 3},
+            ["user0@test.com"],
+        )
+        self.assertEqual(message.subject, self.signal.subject)
+        self.assertEqual(message.to, ["user0@test.com"])
+        self.assertEqual(message.body, "And 3 more.")
+        self.assertEqual(
+            message.alternatives, [("<p>And 3 more.</p>", "text/html")]
+        )
+
+    def test_open_digests_not_sent(self):
+        """Test that digests are kept until their window closes."""
+        self.dispatch(addresses(1))
+        self.assertEqual(digests.process_digests(), 0)
+        self.assertEqual(Digest.objects.count(), 1)
+
+    def test_sent_by_worker(self):
+        """Test that the worker sends a digest once its window has closed,
+        rendering identical digests once.
+        """
+        self.dispatch(addresses(2))
+        self.dispatch(addresses(2))
+        self.close_windows()
+
+        call_command("email_signals_worker", "--once")
+        self.assertFalse(Digest.objects.exists())
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        number = self.customer_order_rec.order_number
+        self.assertEqual(mail.outbox[0].body, f"{number},{number},0")
+        self.assertEqual(
+            sorted(mail.outbox[0].to), ["user0@test.com", "user1@test.com"]
+        )
+
+    def test_personalised(self):
+        """Test that personalised digests are rendered per recipient."""
+        self.signal.personalised = True
+        self.signal.plain_message = "{{ recipient }}: {{ event_count }}"
+        self.signal.save()
+        self.dispatch(addresses(2))
+        self.close_windows()
+
+        digests.process_digests()
+        outbox.process_outbox()
+        self.assertEqual(
+            sorted(message.body for message in mail.outbox),
+            ["user0@test.com: 1", "user1@test.com: 1"],
+        )
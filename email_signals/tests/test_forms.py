@@ -13,6 +13,7 @@ class TestSignalAdminForm(EmailSignalTestCase):
         """Creates a table for the model."""
         super().setUpClass()
         add_to_registry(cls.Customer)
+        add_to_registry(cls.CustomerOrder)
 
     def sample_form(
         self, override_form_data: _t.Optional[dict] = None
@@ -64,3 +65,42 @@ class TestSignalAdminForm(EmailSignalTestCase):
             {"template": "email_signals/tests/test_emailer.html"}
         )
         self.assertTrue(form.is_valid(), form.data)
+
+    def test_jinja2_template(self):
+        """Test that the template is checked with the chosen engine."""
+        form = self.sample_form(
+            {
+                "content_type": ContentType.objects.get_for_model(
+                    self.customer_order_rec
+                ).pk,
+                "template": "email_signals/tests/test_rendering.html",
+                "render_engine": "jinja2",
+            }
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+
+        form = self.sample_form(
+            {"template": "invalid", "render_engine": "jinja2"}
+        )
+        self.assertFalse(form.is_valid())
+
+    def test_unresolvable_path(self):
+        """Test that content which references a path the model cannot
+        resolve is rejected.
+        """
+        form = self.sample_form({"plain_message": "{{ instance.missing }}"})
+        self.assertFalse(form.is_valid())
+        self.assertIn("instance.missing", str(form.errors))
+
+        form = self.sample_form({"plain_message": "{{ instance.name }}"})
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_invalid_content(self):
+        """Test that content which cannot be parsed is rejected."""
+        form = self.sample_form({"plain_message": "{% if %}"})
+        self.assertFalse(form.is_valid())
+
+    def test_rate_limit(self):
+        """Test that the rate limit must be a valid rate."""
+        self.assertTrue(self.sample_form({"rate_limit": "10/5m"}).is_valid())
+        self.assertFalse(self.sample_form({"rate_limit": "fast"}).is_valid())
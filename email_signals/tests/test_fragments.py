@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.template import TemplateSyntaxError
+from django.test import override_settings
+from .testcase import EmailSignalTestCase
+from .test_loaders import TEMPLATES
+from .. import fragments, metrics, rendering
+from ..models import EmailTemplate
+
+DJANGO_SOURCE = (
+    "{% load email_signal_tags %}<p>{{ name }}</p>"
+    '{% email_fragment "emails/footer.html" %}'
+)
+
+
+@override_settings(
+    TEMPLATES=TEMPLATES, EMAIL_SIGNAL_JINJA2_BYTECODE_CACHE=None
+)
+class TestFragments(EmailSignalTestCase):
+    """Unittests for the `fragments` module and `{% email_fragment %}`."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        fragments.invalidate()
+        metrics.reset()
+        self.footer = EmailTemplate.objects.create(
+            name="emails/footer.html", content="<footer>{{ name }}</footer>"
+        )
+
+    def render(self, name: str, source: str = DJANGO_SOURCE, **kwargs):
+        return rendering.render_string(source, {"name": name}, **kwargs)
+
+    def test_cached(self):
+        """Test that a fragment is rendered once and its output reused."""
+        self.assertEqual(self.render("a"), "<p>a</p><footer>a</footer>")
+        self.assertEqual(self.render("b"), "<p>b</p><footer>a</footer>")
+        self.assertEqual(fragments.stats()["hits"], 1)
+        self.assertEqual(fragments.stats()["misses"], 1)
+
+    def test_vary_on(self):
+        """Test that fragments are cached per vary on value."""
+        source = (
+            "{% load email_signal_tags %}"
+            '{% email_fragment "emails/footer.html" name|lower %}'
+        )
+        self.assertEqual(self.render("a", source), "<footer>a</footer>")
+        self.assertEqual(self.render("b", source), "<footer>b</footer>")
+        self.assertEqual(self.render("A", source), "<footer>a</footer>")
+
+    def test_version(self):
+        """Test that fragments are rendered again when the version changes
+        or the template is saved.
+        """
+        self.render("a")
+        with self.settings(EMAIL_SIGNAL_FRAGMENT_VERSION=2):
+            self.assertEqual(self.render("b"), "<p>b</p><footer>b</footer>")
+        self.footer.content = "<footer>New {{ name }}</footer>"
+        self.footer.save()
+        self.assertEqual(self.render("c"), "<p>c</p><footer>New c</footer>")
+
+    @override_settings(EMAIL_SIGNAL_FRAGMENT_CACHE_SIZE=1)
+    def test_bounded(self):
+        """Test that the least recently used fragment is discarded."""
+        source = (
+            "{% load email_signal_tags %}"
+            '{% email_fragment "emails/footer.html" name %}'
+        )
+        self.render("a", source)
+        self.render("b", source)
+        self.assertEqual(fragments.stats()["size"], 1)
+
+    def test_name_required(self):
+        """Test that the tag requires the name of a template."""
+        with self.assertRaises(TemplateSyntaxError):
+            self.render(
+                "a", "{% load email_signal_tags %}{% email_fragment %}"
+            )
+
+    def test_jinja2(self):
+        """Test that Jinja2 templates can use fragments."""
+        source = '<p>{{ name }}</p>{{ email_fragment("emails/footer.html") }}'
+        for name in ("a", "b"):
+            self.assertEqual(
+                self.render(name, source, engine=rendering.JINJA2),
+                f"<p>{name}</p><footer>a</footer>",
+            )
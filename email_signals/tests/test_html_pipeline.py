@@ -0,0 +1,192 @@
+from django.core import mail
+from django.core.cache import cache
+from django.db.models import signals as django_signals
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase, override_settings
+from .testcase import EmailSignalTestCase
+from .test_loaders import TEMPLATES
+from .. import html_pipeline, signals
+from ..models import EmailTemplate, Signal
+
+
+class TestInlineCSS(SimpleTestCase):
+    """Unittests for inlining CSS with `html_pipeline.process`."""
+
+    def process(self, html: str) -> str:
+        return html_pipeline.process(html, minify_html=False)
+
+    def test_inlined(self):
+        """Test that rules are moved onto the elements they match and the
+        emptied `<style>` element is removed.
+        """
+        self.assertEqual(
+            self.process(
+                "<style>p { color: red } .a { margin: 0 }</style>"
+                '<p class="a">x</p><b>y</b>'
+            ),
+            '<p class="a" style="color:red;margin:0">x</p><b>y</b>',
+        )
+
+    def test_specificity(self):
+        """Test that more specific rules win regardless of their order."""
+        self.assertEqual(
+            self.process(
+                "<style>#main p { color: red } p.a { color: blue } "
+                "p { color: green }</style>"
+                '<div id="main"><p class="a">x</p></div><p class="a">y</p>'
+            ),
+            '<div id="main"><p class="a" style="color:red">x</p></div>'
+            '<p class="a" style="color:blue">y</p>',
+        )
+
+    def test_child_combinator(self):
+        """Test that the child combinator only matches direct children."""
+        self.assertEqual(
+            self.process(
+                "<style>div > b { color: red }</style>"
+                "<div><b>x</b><i><b>y</b></i></div>"
+            ),
+            '<div><b style="color:red">x</b><i><b>y</b></i></div>',
+        )
+
+    def test_existing_styles(self):
+        """Test that existing inline styles win unless a rule is
+        `!important`.
+        """
+        self.assertEqual(
+            self.process(
+                "<style>p { color: red; margin: 0 !important }</style>"
+                '<p style="color: blue; margin: 4px">x</p>'
+            ),
+            '<p style="color:blue;margin:0 !important">x</p>',
+        )
+
+    def test_rules_kept(self):
+        """Test that rules which can not be inlined are kept."""
+        processed = self.process(
+            "<style>a:hover { color: red } "
+            "@media (max-width: 600px) { p { color: blue } }</style><p>x</p>"
+        )
+        self.assertIn("a:hover{color: red}", processed)
+        self.assertIn("@media (max-width: 600px)", processed)
+        self.assertIn("<p>x</p>", processed)
+
+    def test_template_tags(self):
+        """Test that template tags are left untouched."""
+        html = (
+            "<style>a { color: red }</style>"
+            '<a href="{{ url }}?a=1&amp;b=2">{{ name|default:"a  b" }}</a>'
+            "{% for item in items %}<b>{{ item }}</b>{% endfor %}"
+        )
+        self.assertEqual(
+            html_pipeline.process(html),
+            '<a href="{{ url }}?a=1&amp;b=2" style="color:red">'
+            '{{ name|default:"a  b" }}</a>'
+            "{% for item in items %}<b>{{ item }}</b>{% endfor %}",
+        )
+
+    def test_branch_opened_tags(self):
+        """Test that markup whose elements are opened in different branches
+        of a template tag is left as it is.
+        """
+        html = (
+            "<style>div p { color: red }</style>"
+            '{% if x %}<div class="a">{% else %}<div class="b">{% endif %}'
+            "hi</div><p>after</p>"
+        )
+        self.assertEqual(html_pipeline.process(html), html)
+
+    def test_unclosed(self):
+        """Test that elements left unclosed are not closed."""
+        html = "<style>p { color: red }</style><p>a<p>b"
+        self.assertEqual(html_pipeline.process(html), html)
+
+
+class TestMinify(SimpleTestCase):
+    """Unittests for minifying HTML with `html_pipeline.process`."""
+
+    def process(self, html: str) -> str:
+        return html_pipeline.process(html, inline=False)
+
+    def test_comments(self):
+        """Test that comments are removed apart from conditional
+        comments.
+        """
+        self.assertEqual(
+            self.process(
+                "<div><!-- remove --><!--[if mso]><table><![endif]--></div>"
+            ),
+            "<div><!--[if mso]><table><![endif]--></div>",
+        )
+
+    def test_whitespace(self):
+        """Test that whitespace is collapsed and removed around block
+        elements.
+        """
+        self.assertEqual(
+            self.process("<div>\n  <p>Hello   <b>there</b>\n</p>\n</div>"),
+            "<div><p>Hello <b>there</b></p></div>",
+        )
+
+    def test_pre(self):
+        """Test that the content of `<pre>` elements is kept as it is."""
+        self.assertEqual(
+            self.process("<div>\n<pre>  a\n   b </pre>\n</div>"),
+            "<div><pre>  a\n   b </pre></div>",
+        )
+
+
+class TestSavedContent(EmailSignalTestCase):
+    """Unittests for processing content when it is saved."""
+
+    html = "<style>p { color: red }</style>\n<p>{{ instance.id }}</p>"
+
+    def test_disabled(self):
+        """Test that content is not processed by default."""
+        signal = self.create_signal(self.customer_order_rec)
+        signal.html_message = self.html
+        signal.save()
+        self.assertIsNone(signal.html_message_processed)
+        self.assertEqual(signal.get_html_message(), self.html)
+
+    @override_settings(EMAIL_SIGNAL_HTML_PIPELINE=True)
+    def test_signal(self):
+        """Test that the processed HTML content is stored and sent."""
+        signal = self.create_signal(self.customer_order_rec)
+        signal.html_message = self.html
+        signal.save(update_fields=["html_message"])
+        signal = Signal.objects.get(pk=signal.pk)
+        self.assertEqual(signal.html_message, self.html)
+        self.assertEqual(
+            signal.html_message_processed,
+            '<p style="color:red">{{ instance.id }}</p>',
+        )
+
+        signals.signal_callback(
+            self.customer_order_rec, django_signals.pre_save
+        )
+        sent = [
+            message
+            for message in mail.outbox
+            if message.subject == signal.subject
+        ]
+        self.assertEqual(
+            sent[-1].alternatives[0][0],
+            f'<p style="color:red">{self.customer_order_rec.id}</p>',
+        )
+
+    @override_settings(
+        EMAIL_SIGNAL_HTML_PIPELINE=True,
+        TEMPLATES=TEMPLATES,
+        EMAIL_SIGNAL_JINJA2_BYTECODE_CACHE=None,
+    )
+    def test_email_template(self):
+        """Test that stored templates are served processed."""
+        self.addCleanup(cache.clear)
+        EmailTemplate.objects.create(
+            name="emails/styled.html", content=self.html
+        )
+        self.assertEqual(
+            render_to_string("emails/styled.html", {"instance": {"id": 1}}),
+            '<p style="color:red">1</p>',
+        )
@@ -0,0 +1,157 @@
+from pathlib import Path
+from unittest import mock
+from django.core import mail
+from django.core.cache import cache
+from django.db.models import signals as django_signals
+from django.template import TemplateDoesNotExist, engines
+from django.template.loader import render_to_string
+from django.test import override_settings
+from .testcase import EmailSignalTestCase
+from .. import loaders, rendering, signals
+from ..forms import EmailTemplateAdminForm
+from ..models import EmailTemplate
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [Path(__file__).resolve().parent.parent.parent],
+        "OPTIONS": {
+            "loaders": [
+                "email_signals.loaders.Loader",
+                "django.template.loaders.filesystem.Loader",
+            ],
+        },
+    }
+]
+
+
+@override_settings(
+    TEMPLATES=TEMPLATES, EMAIL_SIGNAL_JINJA2_BYTECODE_CACHE=None
+)
+class TestLoader(EmailSignalTestCase):
+    """Unittests for the `loaders` module."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        self.base = EmailTemplate.objects.create(
+            name="emails/base.html",
+            content="<h1>{% block title %}{% endblock %}</h1>"
+            "{% include 'emails/footer.html' %}",
+        )
+        EmailTemplate.objects.create(
+            name="emails/footer.html", content="<p>Footer</p>"
+        )
+        EmailTemplate.objects.create(
+            name="emails/order.html",
+            content="{% extends 'emails/base.html' %}"
+            "{% block title %}{{ name }}{% endblock %}",
+        )
+
+    def render(self) -> str:
+        return render_to_string("emails/order.html", {"name": "Order"})
+
+    def test_extends_and_include(self):
+        """Test that stored templates can extend and include each other."""
+        self.assertEqual(self.render(), "<h1>Order</h1><p>Footer</p>")
+
+    def test_compiled_once(self):
+        """Test that templates are only loaded and compiled once."""
+        self.render()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render(), "<h1>Order</h1><p>Footer</p>")
+
+    def test_invalidated_on_save(self):
+        """Test that compiled templates are discarded when a template is
+        saved.
+        """
+        self.render()
+        self.base.content = "<h2>{% block title %}{% endblock %}</h2>"
+        self.base.save()
+        self.assertEqual(self.render(), "<h2>Order</h2>")
+
+        self.base.delete()
+        with self.assertRaises(TemplateDoesNotExist):
+            self.render()
+
+    @override_settings(EMAIL_SIGNAL_TEMPLATE_STORE_POLL=60)
+    def test_invalidated_by_other_process(self):
+        """Test that compiled templates are discarded when another process
+        changes a template.
+        """
+        loaders._shared_generation["expires"] = 0.0
+        self.render()
+        EmailTemplate.objects.filter(pk=self.base.pk).update(
+            content="<h3>{% block title %}{% endblock %}</h3>"
+        )
+        self.assertEqual(self.render(), "<h1>Order</h1><p>Footer</p>")
+
+        # The other process bumps the generation in the shared cache, which
+        # is read again once the poll interval has passed.
+        cache.incr(loaders.GENERATION_KEY)
+        self.assertEqual(self.render(), "<h1>Order</h1><p>Footer</p>")
+        loaders._shared_generation["expires"] = 0.0
+        self.assertEqual(self.render(), "<h3>Order</h3>")
+
+    def test_generation_polled(self):
+        """Test that the shared generation is read from the cache at most
+        once per poll interval, however many templates are loaded.
+        """
+        self.render()
+        loaders._shared_generation["expires"] = 0.0
+        with mock.patch.object(
+            loaders, "_cache", wraps=loaders._cache
+        ) as shared_cache:
+            for _ in range(3):
+                self.render()
+        shared_cache.assert_called_once()
+
+    def test_files_still_load(self):
+        """Test that templates which are not stored fall through to the
+        other loaders.
+        """
+        engines["django"].engine.get_template(
+            "email_signals/tests/test_rendering.html"
+        )
+
+    def test_signal_template(self):
+        """Test that a signal can use a stored template."""
+        signal = self.create_signal(self.customer_order_rec)
+        signal.template = "emails/order.html"
+        signal.save()
+        signals.signal_callback(
+            self.customer_order_rec, django_signals.pre_save
+        )
+        self.assertEqual(
+            mail.outbox[0].alternatives[0][0], "<h1></h1><p>Footer</p>"
+        )
+
+    def test_jinja2(self):
+        """Test that Jinja2 can load stored templates."""
+        rendering.reset()
+        EmailTemplate.objects.create(
+            name="emails/jinja.html",
+            content="{% include 'emails/footer.html' %}{{ 1 + 1 }}",
+        )
+        self.assertEqual(
+            rendering.render_template(
+                "emails/jinja.html", {}, rendering.JINJA2
+            ),
+            "<p>Footer</p>2",
+        )
+
+
+class TestEmailTemplateAdminForm(EmailSignalTestCase):
+    """Unittests for the `EmailTemplateAdminForm` class."""
+
+    def test_invalid_content(self):
+        """Test that content which does not compile is rejected."""
+        form = EmailTemplateAdminForm(
+            data={"name": "a.html", "content": "{% if %}"}
+        )
+        self.assertFalse(form.is_valid())
+
+        form = EmailTemplateAdminForm(
+            data={"name": "a.html", "content": "{{ a }}"}
+        )
+        self.assertTrue(form.is_valid(), form.errors)
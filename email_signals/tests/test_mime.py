@@ -0,0 +1,80 @@
+from unittest import mock
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.test import SimpleTestCase, override_settings
+from .. import emailer, mime
+
+
+def make_message(to, **kwargs) -> EmailMultiAlternatives:
+    message = EmailMultiAlternatives(
+        subject="Subject",
+        body="Body",
+        from_email="from@test.com",
+        to=to,
+        **kwargs,
+    )
+    message.attach_alternative("<p>Body</p>", "text/html")
+    return message
+
+
+class TestMime(SimpleTestCase):
+    """Unittests for the `mime` module."""
+
+    def test_group_recipients(self):
+        """Test that recipients are grouped by domain into chunks."""
+        self.assertEqual(
+            mime.group_recipients(
+                ["a@x.com", "b@y.com", "c@X.com", "d@x.com", "e@y.com"], 2
+            ),
+            [["a@x.com", "c@X.com"], ["d@x.com"], ["b@y.com", "e@y.com"]],
+        )
+
+    @override_settings(EMAIL_SIGNAL_MAX_RCPT=1)
+    def test_group_recipients_setting(self):
+        """Test that the chunk size defaults to the setting."""
+        self.assertEqual(
+            mime.group_recipients(["a@x.com", "b@x.com"]),
+            [["a@x.com"], ["b@x.com"]],
+        )
+
+    def test_single_chunk(self):
+        """Test that a message with a single chunk is not copied."""
+        message = make_message(["a@x.com", "b@x.com"])
+        self.assertEqual(mime.split_message(message), [message])
+
+    def test_cc(self):
+        """Test that messages with `cc` recipients are not split."""
+        message = make_message(["a@x.com", "b@y.com"], cc=["c@z.com"])
+        self.assertEqual(mime.split_message(message), [message])
+
+    def test_split_message(self):
+        """Test that copies share the MIME parts and only differ by their
+        headers.
+        """
+        message = make_message(["a@x.com", "b@y.com", "c@x.com"])
+        with mock.patch.object(
+            message, "message", wraps=message.message
+        ) as build:
+            messages = mime.split_message(message)
+            built = [copy.message() for copy in messages]
+        build.assert_called_once()
+
+        self.assertEqual(
+            [copy.to for copy in messages],
+            [["a@x.com", "c@x.com"], ["b@y.com"]],
+        )
+        self.assertEqual(built[0]["To"], "a@x.com, c@x.com")
+        self.assertEqual(built[1]["To"], "b@y.com")
+        self.assertNotEqual(built[0]["Message-ID"], built[1]["Message-ID"])
+        self.assertIs(built[0].get_payload(0), built[1].get_payload(0))
+        self.assertEqual(messages[0].mime["To"], "a@x.com, b@y.com, c@x.com")
+
+    def test_send_message(self):
+        """Test that each copy is sent."""
+        emailer.send_message(make_message(["a@x.com", "b@y.com"]))
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [["a@x.com"], ["b@y.com"]],
+        )
+        self.assertEqual(mail.outbox[1].alternatives[0][0], "<p>Body</p>")
+        self.assertIn(b"To: b@y.com", mail.outbox[1].message().as_bytes())
@@ -0,0 +1,224 @@
+from unittest import mock
+from django.core import mail
+from django.core.management import call_command
+from django.db.models import signals as django_signals
+from django.test import override_settings
+from django.utils import timezone
+from .testcase import EmailSignalTestCase
+from .. import breaker, delivery, outbox, signals
+from ..models import OutboxEmail, Signal
+
+
+@override_settings(EMAIL_SIGNAL_DELIVERY_MODE=outbox.SNAPSHOT)
+class TestOutbox(EmailSignalTestCase):
+    """Unittests for the `outbox` module."""
+
+    def create_signal(self, *args, **kwargs) -> Signal:
+        signal = super().create_signal(*args, **kwargs)
+        signal.plain_message = "Order for {{ instance.customer.name }}"
+        signal.save()
+        return signal
+
+    def test_signal_is_queued(self):
+        """Test that a signal which passes its constraints is queued rather
+        than sent.
+        """
+        self.create_signal(self.customer_order_rec)
+        signals.signal_callback(
+            self.customer_order_rec, django_signals.pre_save
+        )
+
+        self.assertEqual(len(mail.outbox), 0)
+        item = OutboxEmail.objects.get()
+        self.assertEqual(item.recipients, [self.customer_rec.email])
+        self.assertEqual(
+            item.context,
+            {"instance": {"customer": {"name": self.customer_rec.name}}},
+        )
+
+    @override_settings(EMAIL_SIGNAL_DELIVERY_MODE=outbox.IMMEDIATE)
+    def test_immediate(self):
+        """Test that nothing is queued in immediate mode."""
+        self.create_signal(self.customer_order_rec)
+        signals.signal_callback(
+            self.customer_order_rec, django_signals.pre_save
+        )
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_process_outbox(self):
+        """Test that queued emails are rendered from their snapshot and
+        sent.
+        """
+        self.create_signal(self.customer_order_rec)
+        signals.signal_callback(
+            self.customer_order_rec, django_signals.pre_save
+        )
+
+        self.assertEqual(outbox.process_outbox(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            mail.outbox[0].body, f"Order for {self.customer_rec.name}"
+        )
+        item = OutboxEmail.objects.get()
+        self.assertEqual(item.status, OutboxEmail.StatusChoices.sent)
+        self.assertEqual(item.attempts, 1)
+        self.assertIsNotNone(item.sent_at)
+
+        # Nothing left to send.
+        self.assertEqual(outbox.process_outbox(), 0)
+
+    def test_post_delete(self):
+        """Test that an email for a deleted record can still be rendered."""
+        self.setup_signals()
+        self.create_signal(
+            self.customer_order_rec,
+            signal_type=Signal.SignalTypeChoices.post_delete,
+        )
+        name = self.customer_rec.name
+        self.customer_order_rec.delete()
+
+        outbox.process_outbox()
+        self.assertEqual(mail.outbox[0].body, f"Order for {name}")
+
+    def test_temporary_failure_is_retried(self):
+        """Test that a temporary failure schedules a retry."""
+        signal = self.create_signal(self.customer_order_rec)
+        OutboxEmail.objects.create(signal=signal, recipients=["a@test.com"])
+
+        failure = delivery.DeliveryResult(
+            message=None, ok=False, error=OSError("down"), temporary=True
+        )
+        with mock.patch.object(outbox, "send", return_value=[failure]):
+            outbox.process_outbox()
+
+        item = OutboxEmail.objects.get()
+        self.assertEqual(item.status, OutboxEmail.StatusChoices.pending)
+        self.assertEqual(item.attempts, 1)
+        self.assertGreater(item.next_attempt_at, timezone.now())
+        self.assertIn("down", item.last_error)
+
+        # Not due yet.
+        self.assertEqual(outbox.process_outbox(), 0)
+
+    @override_settings(EMAIL_SIGNAL_MAX_ATTEMPTS=1)
+    def test_failure_after_max_attempts(self):
+        """Test that an email is marked as failed once it has run out of
+        attempts.
+        """
+        signal = self.create_signal(self.customer_order_rec)
+        OutboxEmail.objects.create(signal=signal, recipients=["a@test.com"])
+
+        failure = delivery.DeliveryResult(
+            message=None, ok=False, error=OSError("down"), temporary=True
+        )
+        with mock.patch.object(outbox, "send", return_value=[failure]):
+            outbox.process_outbox()
+
+        item = OutboxEmail.objects.get()
+        self.assertEqual(item.status, OutboxEmail.StatusChoices.failed)
+
+    def test_permanent_failure(self):
+        """Test that a permanent failure is not retried."""
+        signal = self.create_signal(self.customer_order_rec)
+        OutboxEmail.objects.create(signal=signal, recipients=["a@test.com"])
+
+        failure = delivery.DeliveryResult(
+            message=None, ok=False, error=ValueError("bad"), temporary=False
+        )
+        with mock.patch.object(outbox, "send", return_value=[failure]):
+            outbox.process_outbox()
+
+        item = OutboxEmail.objects.get()
+        self.assertEqual(item.status, OutboxEmail.StatusChoices.failed)
+
+    @override_settings(EMAIL_SIGNAL_MAX_RCPT=2)
+    def test_split_by_max_rcpt(self):
+        """Test that queued emails are split into messages of at most
+        `EMAIL_SIGNAL_MAX_RCPT` recipients.
+        """
+        signal = self.create_signal(self.customer_order_rec)
+        OutboxEmail.objects.create(
+            signal=signal,
+            recipients=[f"user{i}@test.com" for i in range(5)],
+            context={"instance": {"customer": {"name": "Ada"}}},
+        )
+        outbox.process_outbox()
+        self.assertEqual(
+            [len(message.to) for message in mail.outbox], [2, 2, 1]
+        )
+        item = OutboxEmail.objects.get()
+        self.assertEqual(item.status, OutboxEmail.StatusChoices.sent)
+
+    @override_settings(EMAIL_SIGNAL_MAX_RCPT=1)
+    def test_partial_failure(self):
+        """Test that only the recipients whose messages failed are
+        retried.
+        """
+        signal = self.create_signal(self.customer_order_rec)
+        OutboxEmail.objects.create(
+            signal=signal,
+            recipients=["a@one.com", "b@two.com"],
+            context={"instance": {"customer": {"name": "Ada"}}},
+        )
+
+        def send(messages):
+            return [
+                delivery.DeliveryResult(
+                    message=message,
+                    ok=message.to == ["a@one.com"],
+                    error=None
+                    if message.to == ["a@one.com"]
+                    else OSError("down"),
+                    temporary=True,
+                )
+                for message in messages
+            ]
+
+        with mock.patch.object(outbox, "send", side_effect=send):
+            outbox.process_outbox()
+        item = OutboxEmail.objects.get()
+        self.assertEqual(item.status, OutboxEmail.StatusChoices.pending)
+        self.assertEqual(item.recipients, ["b@two.com"])
+
+    @override_settings(
+        EMAIL_SIGNAL_BREAKER_THRESHOLD=1, EMAIL_SIGNAL_BREAKER_COOLDOWN=60
+    )
+    def test_circuit_open(self):
+        """Test that the worker sends through the circuit breaker and that
+        emails rejected whilst it is open keep their attempts.
+        """
+        breaker.reset_breaker()
+        self.addCleanup(breaker.reset_breaker)
+        signal = self.create_signal(self.customer_order_rec)
+        OutboxEmail.objects.create(signal=signal, recipients=["a@test.com"])
+
+        with mock.patch.object(
+            delivery, "deliver_sync", wraps=delivery.deliver_sync
+        ) as deliver:
+            breaker.get_breaker().record_failure()
+            outbox.process_outbox()
+        deliver.assert_not_called()
+
+        self.assertEqual(len(mail.outbox), 0)
+        item = OutboxEmail.objects.get()
+        self.assertEqual(item.status, OutboxEmail.StatusChoices.pending)
+        self.assertEqual(item.attempts, 0)
+        self.assertGreater(item.next_attempt_at, timezone.now())
+
+    def test_retry_delay(self):
+        """Test that the retry delay doubles and is capped."""
+        self.assertEqual(outbox.retry_delay(1).total_seconds(), 60)
+        self.assertEqual(outbox.retry_delay(2).total_seconds(), 120)
+        self.assertEqual(outbox.retry_delay(100).total_seconds(), 3600)
+
+    def test_worker_command(self):
+        """Test that the worker command sends queued emails."""
+        signal = self.create_signal(self.customer_order_rec)
+        OutboxEmail.objects.create(
+            signal=signal,
+            recipients=["a@test.com"],
+            context={"instance": {"customer": {"name": "Worker"}}},
+        )
+        call_command("email_signals_worker", "--once")
+        self.assertEqual(mail.outbox[0].body, "Order for Worker")
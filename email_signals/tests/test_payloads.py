@@ -0,0 +1,96 @@
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.test import override_settings
+from .testcase import EmailSignalTestCase
+from .. import outbox, payloads
+from ..models import DeliveryLog, EmailPayload, OutboxEmail
+
+
+def make_message(body: str = "Hello", to=("a@test.com",)):
+    message = EmailMultiAlternatives(
+        subject="Subject", body=body, from_email="from@test.com", to=to
+    )
+    message.attach_alternative(f"<p>{body}</p>" * 100, "text/html")
+    return message
+
+
+class TestPayloads(EmailSignalTestCase):
+    """Unittests for the `payloads` module."""
+
+    def test_codecs(self):
+        """Test that each codec can read back what it wrote."""
+        data = b"<p>Hello</p>" * 100
+        codecs = [payloads.ZLIB, payloads.NONE]
+        if payloads.zstandard is not None:
+            codecs.append(payloads.ZSTD)
+        for codec in codecs:
+            with self.subTest(codec=codec):
+                compressed = payloads.compress(data, codec)
+                self.assertEqual(payloads.decompress(compressed, codec), data)
+
+    def test_store_compresses(self):
+        """Test that stored content is compressed and can be rebuilt into
+        the same message for different recipients.
+        """
+        message = make_message()
+        payload = payloads.store(message)
+        self.assertLess(len(payload.data), payload.size)
+
+        rebuilt = payloads.to_message(payload, ["b@test.com"])
+        self.assertEqual(rebuilt.to, ["b@test.com"])
+        self.assertEqual(rebuilt.subject, message.subject)
+        self.assertEqual(rebuilt.body, message.body)
+        self.assertEqual(rebuilt.from_email, message.from_email)
+        self.assertEqual(rebuilt.alternatives, message.alternatives)
+
+    @override_settings(EMAIL_SIGNAL_PAYLOAD_CODEC=payloads.ZLIB)
+    def test_codec_setting(self):
+        """Test that the codec can be chosen with a setting."""
+        self.assertEqual(payloads.store(make_message()).codec, "zlib")
+
+    def test_store_deduplicates(self):
+        """Test that identical content is only stored once, regardless of
+        the recipients.
+        """
+        first = payloads.store(make_message(to=["a@test.com"]))
+        second = payloads.store(make_message(to=["b@test.com"]))
+        third = payloads.store(make_message(body="Other"))
+        self.assertEqual(first.pk, second.pk)
+        self.assertNotEqual(first.pk, third.pk)
+        self.assertEqual(EmailPayload.objects.count(), 2)
+
+    def test_enqueue_message(self):
+        """Test that a pre-rendered email is sent as it was rendered."""
+        signal = self.create_signal(self.customer_order_rec)
+        outbox.enqueue_message(signal, make_message())
+
+        outbox.process_outbox()
+        self.assertEqual(mail.outbox[0].body, "Hello")
+        self.assertEqual(mail.outbox[0].to, ["a@test.com"])
+        self.assertEqual(
+            OutboxEmail.objects.get().status, OutboxEmail.StatusChoices.sent
+        )
+
+    @override_settings(EMAIL_SIGNAL_DELIVERY_LOG=True)
+    def test_delivery_log(self):
+        """Test that sent emails are logged with their content."""
+        signal = self.create_signal(self.customer_order_rec)
+        outbox.enqueue_message(signal, make_message(to=["a@test.com"]))
+        outbox.enqueue_message(signal, make_message(to=["b@test.com"]))
+
+        outbox.process_outbox()
+        logs = DeliveryLog.objects.order_by("pk")
+        self.assertEqual(
+            [log.recipients for log in logs], [["a@test.com"], ["b@test.com"]]
+        )
+        self.assertEqual(
+            {log.status for log in logs}, {DeliveryLog.StatusChoices.sent}
+        )
+        self.assertEqual(EmailPayload.objects.count(), 1)
+
+    def test_delivery_log_disabled(self):
+        """Test that nothing is logged by default."""
+        signal = self.create_signal(self.customer_order_rec)
+        outbox.enqueue_message(signal, make_message())
+        outbox.process_outbox()
+        self.assertFalse(DeliveryLog.objects.exists())
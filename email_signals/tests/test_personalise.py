@@ -0,0 +1,206 @@
+import threading
+import time
+from unittest import mock
+from django.core import mail
+from django.db.models import signals as django_signals
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from .testcase import EmailSignalTestCase
+from .test_budgets import LOOP
+from .test_recipients import addresses
+from .. import outbox, personalise, signals
+from ..models import OutboxEmail
+
+
+class TestRenderEach(SimpleTestCase):
+    """Unittests for the `personalise` module."""
+
+    def test_order(self):
+        """Test that results are yielded in order and only the first item
+        is rendered on the calling thread.
+        """
+        threads = {}
+
+        def render(item):
+            threads[item] = threading.current_thread()
+            time.sleep((5 - item) / 1000)
+            return item * 2
+
+        self.assertEqual(
+            list(personalise.render_each(render, range(5), workers=3)),
+            [(i, i * 2) for i in range(5)],
+        )
+        self.assertIs(threads[0], threading.current_thread())
+        self.assertNotIn(
+            threading.current_thread(), list(threads.values())[1:]
+        )
+
+    def test_streamed(self):
+        """Test that only a bounded number of items is taken ahead of the
+        results which have been consumed.
+        """
+        taken = []
+
+        def items():
+            for item in range(100):
+                taken.append(item)
+                yield item
+
+        results = personalise.render_each(lambda item: item, items(), 2)
+        self.assertEqual(next(results), (0, 0))
+        self.assertEqual(next(results), (1, 1))
+        self.assertLessEqual(len(taken), 6)
+        results.close()
+
+    def test_error(self):
+        """Test that an error is raised when its item's result is reached."""
+
+        def render(item):
+            if item == 2:
+                raise ValueError
+            return item
+
+        results = personalise.render_each(render, range(5), 2)
+        self.assertEqual([next(results), next(results)], [(0, 0), (1, 1)])
+        with self.assertRaises(ValueError):
+            next(results)
+
+
+class TestRenderEachDatabase(TransactionTestCase):
+    """Unittests for rendering items which query the database."""
+
+    def query(self, item):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT %s", [item])
+            return threading.current_thread()
+
+    def test_connections_closed_once(self):
+        """Test that the connections opened by pool threads are closed once
+        the pool shuts down, rather than after every render.
+        """
+        wrapper = type(connections["default"])
+        with mock.patch.object(
+            wrapper, "close", autospec=True, side_effect=wrapper.close
+        ) as closed:
+            results = list(personalise.render_each(self.query, range(20), 2))
+        threads = {thread for _, thread in results[1:]}
+        self.assertLessEqual(len(threads), 2)
+        self.assertEqual(closed.call_count, len(threads))
+
+    def test_transaction(self):
+        """Test that every item is rendered on the calling thread inside a
+        transaction, whose writes pool threads can't see.
+        """
+        with transaction.atomic():
+            results = list(personalise.render_each(self.query, range(5), 2))
+        self.assertEqual(
+            {thread for _, thread in results}, {threading.current_thread()}
+        )
+
+
+class TestPersonalisedSignals(EmailSignalTestCase):
+    """Unittests for sending personalised signal emails."""
+
+    def setUp(self):
+        super().setUp()
+        self.signal = self.create_signal(self.customer_order_rec)
+        self.signal.personalised = True
+        self.signal.plain_message = "Hi {{ recipient }} {{ instance.id }}"
+        self.signal.save()
+
+    def dispatch(self, mailing_list):
+        with mock.patch.object(
+            self.CustomerOrder,
+            "my_mailing_list",
+            side_effect=lambda: mailing_list,
+        ):
+            signals.signal_callback(
+                self.customer_order_rec, django_signals.pre_save
+            )
+
+    def test_personalised(self):
+        """Test that each recipient is sent their own email."""
+        self.dispatch(addresses(5))
+        self.assertEqual(
+            [(message.to, message.body) for message in mail.outbox],
+            [
+                (
+                    [f"user{i}@test.com"],
+                    f"Hi user{i}@test.com {self.customer_order_rec.id}",
+                )
+                for i in range(5)
+            ],
+        )
+
+    def test_model_recipients(self):
+        """Test that model instances in a mailing list are available as the
+        recipient.
+        """
+        self.signal.plain_message = "Hi {{ recipient.name }}"
+        self.signal.save()
+        self.dispatch(self.Customer.objects.filter(pk=self.customer_rec.pk))
+        self.assertEqual(mail.outbox[0].to, [self.customer_rec.email])
+        self.assertEqual(mail.outbox[0].body, f"Hi {self.customer_rec.name}")
+
+    def test_failed_render(self):
+        """Test that the remaining recipients are sent to when an email
+        fails to render.
+        """
+        build_email = signals.emailer.build_email
+
+        def fail_second(**kwargs):
+            if kwargs["recipient_list"] == ["user1@test.com"]:
+                raise ValueError
+            return build_email(**kwargs)
+
+        with mock.patch.object(
+            signals.emailer, "build_email", side_effect=fail_second
+        ), self.assertLogs("email_signals.signals", "ERROR"):
+            with self.assertRaises(ValueError):
+                self.dispatch(addresses(3))
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [["user0@test.com"], ["user2@test.com"]],
+        )
+
+    @override_settings(EMAIL_SIGNAL_DELIVERY_MODE="snapshot")
+    def test_deferred(self):
+        """Test that personalised emails are queued once per recipient and
+        rendered for their recipient by the worker.
+        """
+        self.dispatch(addresses(2))
+        self.assertEqual(
+            OutboxEmail.objects.filter(signal=self.signal).count(), 2
+        )
+        with override_settings(EMAIL_SIGNAL_DELIVERY_MODE="immediate"):
+            outbox.process_outbox()
+        self.assertEqual(
+            sorted(
+                message.body
+                for message in mail.outbox
+                if message.subject == self.signal.subject
+            ),
+            [
+                f"Hi user{i}@test.com {self.customer_order_rec.id}"
+                for i in range(2)
+            ],
+        )
+
+    @override_settings(EMAIL_SIGNAL_RENDER_BUDGET=0)
+    def test_budget_exceeded(self):
+        """Test that recipients whose email runs over its render budget are
+        queued in the outbox.
+        """
+        self.signal.plain_message = LOOP
+        self.signal.save()
+        with self.assertLogs("email_signals.signals", "WARNING"):
+            self.dispatch(addresses(3))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            sorted(
+                OutboxEmail.objects.filter(signal=self.signal).values_list(
+                    "recipients", flat=True
+                )
+            ),
+            [[f"user{i}@test.com"] for i in range(3)],
+        )
@@ -0,0 +1,119 @@
+from unittest import mock
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import signals as django_signals
+from django.test import SimpleTestCase, override_settings
+from .testcase import EmailSignalTestCase
+from .test_recipients import addresses
+from .. import ratelimit, signals
+from ..models import Digest, OutboxEmail
+
+
+class TestRates(SimpleTestCase):
+    """Unittests for the rates and buckets of the `ratelimit` module."""
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+
+    def test_parse_rate(self):
+        """Test that rates are parsed into a limit and a period."""
+        self.assertEqual(ratelimit.parse_rate("100/m"), (100, 60))
+        self.assertEqual(ratelimit.parse_rate("10/5s"), (10, 5))
+        self.assertEqual(ratelimit.parse_rate(" 2 / d "), (2, 86400))
+        for value in ("", "100", "0/m", "1/w", "a/m"):
+            with self.assertRaises(ValueError):
+                ratelimit.parse_rate(value)
+
+    def test_acquire(self):
+        """Test that tokens run out and emails over the limit are delayed by
+        their place in the queue.
+        """
+        rate = ratelimit.Rate(2, 60)
+        delays = [ratelimit.acquire("test", rate, now=600) for _ in range(4)]
+        self.assertEqual(delays, [0, 0, 30, 60])
+
+    def test_refill(self):
+        """Test that the bucket refills over the period."""
+        rate = ratelimit.Rate(2, 60)
+        for _ in range(2):
+            ratelimit.acquire("test", rate, now=600)
+        self.assertTrue(ratelimit.acquire("test", rate, now=630))
+        self.assertEqual(ratelimit.acquire("test", rate, now=720), 0)
+
+
+@override_settings(EMAIL_SIGNAL_RATE_LIMITS={"signal": "1/h"})
+class TestRateLimitedSignals(EmailSignalTestCase):
+    """Unittests for rate limited signals."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        self.signal = self.create_signal(self.customer_order_rec)
+        self.signal.plain_message = "{{ instance.order_number }}"
+        self.signal.save()
+
+    def dispatch(self, mailing_list):
+        with mock.patch.object(
+            self.CustomerOrder,
+            "my_mailing_list",
+            side_effect=lambda: mailing_list,
+        ):
+            signals.signal_callback(
+                self.customer_order_rec, django_signals.pre_save
+            )
+
+    def test_delayed(self):
+        """Test that emails over the limit are delayed in the outbox."""
+        self.dispatch(addresses(1))
+        self.dispatch(addresses(1))
+        self.assertEqual(len(mail.outbox), 1)
+        item = OutboxEmail.objects.get()
+        self.assertEqual(item.recipients, ["user0@test.com"])
+        self.assertGreater(item.next_attempt_at, item.created_at)
+
+    def test_signal_rate_limit(self):
+        """Test that a signal's own limit overrides the setting."""
+        self.signal.rate_limit = "2/h"
+        self.signal.save()
+        for _ in range(3):
+            self.dispatch(addresses(1))
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(EMAIL_SIGNAL_RATE_LIMIT_FALLBACK="drop")
+    def test_drop(self):
+        """Test that emails over the limit can be dropped."""
+        self.dispatch(addresses(1))
+        with self.assertLogs("email_signals.signals", "WARNING"):
+            self.dispatch(addresses(1))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    @override_settings(EMAIL_SIGNAL_RATE_LIMIT_FALLBACK="digest")
+    def test_digest(self):
+        """Test that emails over the limit can be folded into a digest,
+        which renders each event with the signal's content.
+        """
+        self.dispatch(addresses(1))
+        self.dispatch(addresses(1))
+        self.dispatch(addresses(1))
+        digest = Digest.objects.get()
+        self.assertEqual(digest.event_count, 2)
+
+        Digest.objects.update(send_at=digest.window_start)
+        call_command("email_signals_worker", "--once")
+        number = self.customer_order_rec.order_number
+        self.assertEqual(mail.outbox[-1].body, f"{number}\n\n{number}")
+
+    @override_settings(EMAIL_SIGNAL_RATE_LIMITS={"recipient": "1/h"})
+    def test_recipient(self):
+        """Test that only the recipients over their limit are held back."""
+        self.dispatch(addresses(1))
+        self.dispatch(addresses(2))
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [["user0@test.com"], ["user1@test.com"]],
+        )
+        self.assertEqual(
+            OutboxEmail.objects.get().recipients, ["user0@test.com"]
+        )
@@ -0,0 +1,213 @@
+import tracemalloc
+from unittest import mock
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.db.models import signals as django_signals
+from django.test import override_settings
+from .testcase import EmailSignalTestCase
+from .. import metrics, recipients, signals
+from ..models import OutboxEmail
+
+
+def addresses(count: int):
+    for i in range(count):
+        yield f"user{i}@test.com"
+
+
+class TestRecipients(EmailSignalTestCase):
+    """Unittests for the `recipients` module."""
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+
+    def test_chunked_generator(self):
+        """Test that generators are consumed one chunk at a time."""
+        emails = addresses(5)
+        chunks = recipients.chunked(emails, 2)
+        self.assertEqual(next(chunks), ["user0@test.com", "user1@test.com"])
+        self.assertEqual(next(emails), "user2@test.com")
+        self.assertEqual(list(chunks), [["user3@test.com", "user4@test.com"]])
+
+    def test_normalised(self):
+        """Test that addresses are stripped and only sent to once, ignoring
+        case.
+        """
+        self.assertEqual(
+            list(
+                recipients.iter_recipients(
+                    [
+                        " a@test.com",
+                        "B@test.com",
+                        "A@TEST.com",
+                        "",
+                        "b@test.com",
+                    ]
+                )
+            ),
+            ["a@test.com", "B@test.com"],
+        )
+
+    def test_repeats_bounded(self):
+        """Test that repeats are only looked for among the last chunk's
+        worth of addresses, so the addresses kept do not grow with the
+        mailing list.
+        """
+        emails = ["a@test.com", "b@test.com", "A@test.com", "c@test.com"]
+        emails += ["d@test.com", "a@test.com"]
+        self.assertEqual(
+            list(recipients.iter_recipients(emails, 2)),
+            [
+                "a@test.com",
+                "b@test.com",
+                "c@test.com",
+                "d@test.com",
+                "a@test.com",
+            ],
+        )
+
+    def test_memory_flat(self):
+        """Test that streaming a long mailing list does not hold on to its
+        addresses.
+        """
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        for _ in recipients.iter_recipients(addresses(50000), 100):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        # Keeping every address would take several megabytes.
+        self.assertLess(peak, 512 * 1024)
+
+    def test_parse_static(self):
+        """Test that a static mailing list is parsed once."""
+        recipients.parse_static.cache_clear()
+        mailing_list = "a@test.com, b@test.com,,A@test.com"
+        self.assertEqual(
+            recipients.parse_static(mailing_list), ("a@test.com", "b@test.com")
+        )
+        self.customer_rec.email_signal_recipients(mailing_list)
+        self.assertEqual(recipients.parse_static.cache_info().hits, 1)
+
+    def test_chunked_queryset(self):
+        """Test that querysets are streamed with `iterator()`."""
+        other = self.Customer.create_record()
+        queryset = self.Customer.objects.filter(
+            pk__in=[self.customer_rec.pk, other.pk]
+        ).order_by("pk")
+        chunks = list(recipients.chunked(queryset, 1))
+        # The queryset's rows were streamed rather than cached.
+        self.assertIsNone(queryset._result_cache)
+        self.assertEqual(chunks, [[self.customer_rec.email], [other.email]])
+        self.assertEqual(
+            list(recipients.chunked(queryset.values_list("email", flat=True))),
+            [[self.customer_rec.email, other.email]],
+        )
+
+    @override_settings(EMAIL_SIGNAL_RECIPIENT_CHUNK_SIZE=2)
+    def test_signal_chunks(self):
+        """Test that a signal's email is sent to each chunk of its mailing
+        list.
+        """
+        self.create_signal(self.customer_order_rec)
+        with mock.patch.object(
+            self.CustomerOrder,
+            "my_mailing_list",
+            side_effect=lambda: addresses(5),
+        ):
+            signals.signal_callback(
+                self.customer_order_rec, django_signals.pre_save
+            )
+        self.assertEqual(
+            [len(message.to) for message in mail.outbox], [2, 2, 1]
+        )
+        self.assertEqual(metrics.get("chunks.sent"), 3)
+
+    @override_settings(EMAIL_SIGNAL_RECIPIENT_CHUNK_SIZE=2)
+    def test_mime_built_once(self):
+        """Test that the MIME structure of a signal's email is built once
+        and shared by every chunk.
+        """
+        self.create_signal(self.customer_order_rec)
+        with mock.patch.object(
+            self.CustomerOrder,
+            "my_mailing_list",
+            side_effect=lambda: addresses(5),
+        ), mock.patch.object(
+            EmailMultiAlternatives,
+            "message",
+            autospec=True,
+            side_effect=EmailMultiAlternatives.message,
+        ) as build:
+            signals.signal_callback(
+                self.customer_order_rec, django_signals.pre_save
+            )
+        build.assert_called_once()
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [
+                ["user0@test.com", "user1@test.com"],
+                ["user2@test.com", "user3@test.com"],
+                ["user4@test.com"],
+            ],
+        )
+
+    @override_settings(EMAIL_SIGNAL_RECIPIENT_CHUNK_SIZE=2)
+    def test_failed_chunk(self):
+        """Test that the remaining chunks are sent when a chunk fails and
+        that the error is raised afterwards.
+        """
+        self.create_signal(self.customer_order_rec)
+        send = mail.EmailMessage.send
+        calls = []
+
+        def fail_second(message, *args, **kwargs):
+            calls.append(message)
+            if len(calls) == 2:
+                raise OSError
+            return send(message, *args, **kwargs)
+
+        with mock.patch.object(
+            self.CustomerOrder,
+            "my_mailing_list",
+            side_effect=lambda: addresses(5),
+        ), mock.patch.object(
+            mail.EmailMessage, "send", autospec=True, side_effect=fail_second
+        ):
+            with self.assertLogs("email_signals.signals", "ERROR"):
+                with self.assertRaises(OSError):
+                    signals.signal_callback(
+                        self.customer_order_rec, django_signals.pre_save
+                    )
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [
+                ["user0@test.com", "user1@test.com"],
+                ["user4@test.com"],
+            ],
+        )
+        self.assertEqual(metrics.get("chunks.sent"), 2)
+        self.assertEqual(metrics.get("chunks.failed"), 1)
+
+    @override_settings(
+        EMAIL_SIGNAL_RECIPIENT_CHUNK_SIZE=2,
+        EMAIL_SIGNAL_DELIVERY_MODE="snapshot",
+    )
+    def test_deferred_chunks(self):
+        """Test that a queued email is created for each chunk."""
+        signal = self.create_signal(self.customer_order_rec)
+        with mock.patch.object(
+            self.CustomerOrder,
+            "my_mailing_list",
+            side_effect=lambda: addresses(3),
+        ):
+            signals.signal_callback(
+                self.customer_order_rec, django_signals.pre_save
+            )
+        self.assertEqual(
+            list(
+                OutboxEmail.objects.filter(signal=signal)
+                .order_by("pk")
+                .values_list("recipients", flat=True)
+            ),
+            [["user0@test.com", "user1@test.com"], ["user2@test.com"]],
+        )
@@ -0,0 +1,159 @@
+from django.core import mail
+from django.db.models import signals as django_signals
+from django.test import override_settings
+from .testcase import EmailSignalTestCase
+from .. import outbox, rehydration, signals
+from ..models import OutboxEmail, Signal
+
+
+class TestQueryPlan(EmailSignalTestCase):
+    """Unittests for the `query_plan` function."""
+
+    def test_foreign_key(self):
+        """Test that foreign keys are joined with `select_related`."""
+        self.assertEqual(
+            rehydration.query_plan(
+                self.CustomerOrder,
+                {"instance.customer.name", "instance.order_number"},
+            ),
+            (["customer"], []),
+        )
+
+    def test_reverse_foreign_key(self):
+        """Test that reverse foreign keys and relations reached through them
+        are prefetched.
+        """
+        self.assertEqual(
+            rehydration.query_plan(
+                self.Customer,
+                {
+                    "instance.testcustomerordermodel_set.all",
+                    "instance.testcustomerordermodel_set.all.*.customer.name",
+                },
+            ),
+            (
+                [],
+                [
+                    "testcustomerordermodel_set",
+                    "testcustomerordermodel_set__customer",
+                ],
+            ),
+        )
+
+    def test_many_to_many(self):
+        """Test that many to many relations are prefetched."""
+        self.assertEqual(
+            rehydration.query_plan(
+                self.M2MModel, {"instance.customers.all.*.name"}
+            ),
+            ([], ["customers"]),
+        )
+
+    def test_ignores_other_paths(self):
+        """Test that paths which are not relations are ignored."""
+        self.assertEqual(
+            rehydration.query_plan(
+                self.CustomerOrder,
+                {"signal_kwargs.created", "instance.missing.name"},
+            ),
+            ([], []),
+        )
+
+
+@override_settings(EMAIL_SIGNAL_DELIVERY_MODE=outbox.REFERENCE)
+class TestReferenceDelivery(EmailSignalTestCase):
+    """Unittests for delivering queued emails which reference their
+    instance.
+    """
+
+    def create_signal(self, *args, **kwargs) -> Signal:
+        signal = super().create_signal(*args, **kwargs)
+        signal.plain_message = (
+            "{{ instance.customer.name }} {{ signal_kwargs.created }}"
+        )
+        signal.save()
+        return signal
+
+    def test_enqueue(self):
+        """Test that only a reference to the instance is stored."""
+        self.create_signal(self.customer_order_rec)
+        signals.signal_callback(
+            self.customer_order_rec, django_signals.pre_save, created=True
+        )
+
+        item = OutboxEmail.objects.get()
+        self.assertEqual(item.object_id, str(self.customer_order_rec.pk))
+        self.assertEqual(item.content_type.model_class(), self.CustomerOrder)
+        self.assertEqual(item.context, {"signal_kwargs": {"created": True}})
+
+    def test_delete_signals_are_snapshotted(self):
+        """Test that delete signals store a snapshot as the instance will no
+        longer exist.
+        """
+        self.create_signal(
+            self.customer_order_rec,
+            signal_type=Signal.SignalTypeChoices.pre_delete,
+        )
+        signals.signal_callback(
+            self.customer_order_rec, django_signals.pre_delete
+        )
+        item = OutboxEmail.objects.get()
+        self.assertIsNone(item.object_id)
+        self.assertIn("instance", item.context)
+
+    def test_renders_fresh_data(self):
+        """Test that the email is rendered with the data as it is when the
+        email is sent.
+        """
+        self.create_signal(self.customer_order_rec)
+        signals.signal_callback(
+            self.customer_order_rec, django_signals.pre_save, created=True
+        )
+        self.customer_rec.name = "Fresh"
+        self.customer_rec.save()
+
+        outbox.process_outbox()
+        self.assertEqual(mail.outbox[0].body, "Fresh True")
+
+    def test_one_query_per_model(self):
+        """Test that instances of the same model are loaded with a single
+        query, including the relations used by the signal.
+        """
+        self.create_signal(self.customer_order_rec)
+        for _ in range(3):
+            order = self.CustomerOrder.create_record(self.customer_rec)
+            signals.signal_callback(order, django_signals.pre_save)
+
+        items = list(
+            OutboxEmail.objects.select_related("signal", "content_type")
+        )
+        with self.assertNumQueries(1):
+            instances = rehydration.rehydrate(items)
+            names = {instance.customer.name for instance in instances.values()}
+        self.assertEqual(names, {self.customer_rec.name})
+
+    def test_missing_instance(self):
+        """Test that an email whose instance has been deleted is marked as
+        failed without affecting other emails.
+        """
+        self.create_signal(self.customer_order_rec)
+        other = self.CustomerOrder.create_record(self.customer_rec)
+        signals.signal_callback(
+            self.customer_order_rec, django_signals.pre_save
+        )
+        signals.signal_callback(other, django_signals.pre_save)
+        other_pk = other.pk
+        other.delete()
+
+        outbox.process_outbox()
+        sent = OutboxEmail.objects.filter(
+            object_id=str(self.customer_order_rec.pk)
+        )
+        self.assertEqual(
+            {item.status for item in sent}, {OutboxEmail.StatusChoices.sent}
+        )
+        failed = OutboxEmail.objects.filter(object_id=str(other_pk))
+        self.assertTrue(failed.exists())
+        for item in failed:
+            self.assertEqual(item.status, OutboxEmail.StatusChoices.failed)
+            self.assertIn("no longer exists", item.last_error)
@@ -0,0 +1,169 @@
+import tempfile
+from unittest import mock
+from django.core import mail
+from django.core.cache import cache
+from django.db.models import signals as django_signals
+from django.test import override_settings
+from .testcase import EmailSignalTestCase
+from .. import outbox, rendering, signals, snapshot
+from ..models import Signal
+
+TEMPLATE = "email_signals/tests/test_rendering.html"
+
+
+@override_settings(EMAIL_SIGNAL_JINJA2_BYTECODE_CACHE=None)
+class TestRendering(EmailSignalTestCase):
+    """Unittests for the `rendering` module."""
+
+    def setUp(self):
+        super().setUp()
+        rendering.reset()
+        self.addCleanup(rendering.reset)
+        self.context = {"instance": self.customer_order_rec}
+
+    def test_engines_render_the_same(self):
+        """Test that content both engines understand renders the same."""
+        source = "{{ instance.customer.name }} {% if instance %}<b>{% endif %}"
+        self.assertEqual(
+            rendering.render_string(source, self.context, rendering.JINJA2),
+            rendering.render_string(source, self.context, rendering.DJANGO),
+        )
+        self.assertEqual(
+            rendering.render_template(
+                TEMPLATE, self.context, rendering.JINJA2
+            ),
+            rendering.render_template(
+                TEMPLATE, self.context, rendering.DJANGO
+            ),
+        )
+
+    @override_settings(EMAIL_SIGNAL_RENDER_ENGINE=rendering.JINJA2)
+    def test_default_engine_setting(self):
+        """Test that the default engine can be set for the whole app."""
+        self.assertEqual(rendering.render_string("{{ 1 + 1 }}", {}), "2")
+
+    def test_unknown_engine(self):
+        """Test that an unknown engine is rejected."""
+        with self.assertRaises(rendering.ImproperlyConfigured):
+            rendering.render_string("", {}, "other")
+
+    def test_sandbox_private_attributes(self):
+        """Test that Jinja2 content can't read private attributes."""
+        source = "{{ x.__class__.__mro__[1].__subclasses__()|length }}"
+        with self.assertRaises(rendering.jinja2.sandbox.SecurityError):
+            rendering.render_string(source, {"x": 1}, rendering.JINJA2)
+
+    def test_sandbox_alters_data(self):
+        """Test that Jinja2 content can't call methods which alter data."""
+        with self.assertRaises(rendering.jinja2.sandbox.SecurityError):
+            rendering.render_string(
+                "{{ instance.delete() }}", self.context, rendering.JINJA2
+            )
+        self.assertTrue(
+            self.CustomerOrder.objects.filter(
+                pk=self.customer_order_rec.pk
+            ).exists()
+        )
+
+    @mock.patch.object(rendering, "_INLINE_MAX_SIZE", 2)
+    def test_inline_sources_bounded(self):
+        """Test that registered inline content is evicted one entry at a
+        time, least recently used first.
+        """
+        first = rendering.inline_template_name("first")
+        second = rendering.inline_template_name("second")
+        rendering.inline_template_name("first")
+        rendering.inline_template_name("third")
+        self.assertIn(first, rendering._inline_sources)
+        self.assertNotIn(second, rendering._inline_sources)
+        self.assertEqual(len(rendering._inline_sources), 2)
+
+    def assert_bytecode_is_reused(self):
+        """Render the same content in two environments, as two processes
+        would, and check that the second one does not compile it.
+        """
+        source = "{{ instance.customer.name }}"
+        rendering.render_string(source, self.context, rendering.JINJA2)
+        rendering.reset()
+        environment = rendering.jinja2_environment()
+        with mock.patch.object(
+            environment, "compile", wraps=environment.compile
+        ) as compile:
+            self.assertEqual(
+                rendering.render_string(
+                    source, self.context, rendering.JINJA2
+                ),
+                self.customer_rec.name,
+            )
+        compile.assert_not_called()
+
+    def test_filesystem_bytecode_cache(self):
+        """Test that bytecode is cached on the filesystem."""
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                EMAIL_SIGNAL_JINJA2_BYTECODE_CACHE="filesystem",
+                EMAIL_SIGNAL_JINJA2_BYTECODE_DIR=directory,
+            ):
+                self.assert_bytecode_is_reused()
+
+    @override_settings(EMAIL_SIGNAL_JINJA2_BYTECODE_CACHE="cache")
+    def test_cache_bytecode_cache(self):
+        """Test that bytecode is cached in Django's cache."""
+        self.addCleanup(cache.clear)
+        self.assert_bytecode_is_reused()
+
+    def test_signal_engine(self):
+        """Test that a signal's engine is used to render its content."""
+        signal = self.create_signal(self.customer_order_rec)
+        signal.plain_message = "{{ instance.customer.name|upper }}!"
+        signal.render_engine = Signal.RenderEngineChoices.jinja2
+        signal.save()
+
+        signals.signal_callback(
+            self.customer_order_rec, django_signals.pre_save
+        )
+        self.assertEqual(
+            mail.outbox[0].body, f"{self.customer_rec.name.upper()}!"
+        )
+
+    @override_settings(EMAIL_SIGNAL_DELIVERY_MODE=outbox.SNAPSHOT)
+    def test_jinja2_snapshot(self):
+        """Test that Jinja2 content can be rendered from a snapshot."""
+        signal = self.create_signal(self.customer_order_rec)
+        signal.plain_message = (
+            "{% set customer = instance.customer %}{{ customer.name }}"
+        )
+        signal.render_engine = Signal.RenderEngineChoices.jinja2
+        signal.save()
+
+        signals.signal_callback(
+            self.customer_order_rec, django_signals.pre_save
+        )
+        outbox.process_outbox()
+        self.assertEqual(mail.outbox[0].body, self.customer_rec.name)
+
+
+@override_settings(EMAIL_SIGNAL_JINJA2_BYTECODE_CACHE=None)
+class TestJinja2Paths(EmailSignalTestCase):
+    """Unittests for finding the paths referenced by Jinja2 content."""
+
+    def test_paths(self):
+        """Test that lookups, loops and assignments are resolved."""
+        self.assertEqual(
+            snapshot.source_paths(
+                "{% for order in instance.orders.all() %}"
+                "{{ order.number|upper }}{% endfor %}"
+                "{{ instance['customer'].email }}"
+                "{% set customer = instance.customer %}{{ customer.name }}"
+                "{% if signal_kwargs.created %}{% endif %}{{ other.value }}",
+                rendering.JINJA2,
+            ),
+            {
+                "instance.orders.all",
+                "instance.orders.all.*.number",
+                "instance.customer",
+                "instance.customer.email",
+                "instance.customer.name",
+                "signal_kwargs.created",
+            },
+        )
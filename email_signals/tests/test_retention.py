@@ -0,0 +1,131 @@
+import datetime
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.utils import timezone
+from .testcase import EmailSignalTestCase
+from .. import payloads, retention
+from ..models import DeliveryLog, EmailPayload, OutboxEmail
+from .test_payloads import make_message
+
+
+class TestCompact(EmailSignalTestCase):
+    """Unittests for the `retention` module."""
+
+    def setUp(self):
+        super().setUp()
+        self.signal = self.create_signal(self.customer_order_rec)
+        self.old = timezone.now() - datetime.timedelta(days=60)
+
+    def create_outbox(self, status, body="Hello", old=True) -> OutboxEmail:
+        item = OutboxEmail.objects.create(
+            signal=self.signal,
+            recipients=["a@test.com"],
+            payload=payloads.store(make_message(body)),
+            status=status,
+        )
+        if old:
+            OutboxEmail.objects.filter(pk=item.pk).update(created_at=self.old)
+            EmailPayload.objects.filter(pk=item.payload_id).update(
+                created_at=self.old, last_used_at=self.old
+            )
+        return item
+
+    def test_compact(self):
+        """Test that old sent and failed emails and delivery logs are deleted
+        along with payloads which are no longer used, whilst pending and
+        recent emails are kept.
+        """
+        sent = OutboxEmail.StatusChoices.sent
+        for index in range(5):
+            self.create_outbox(sent, body=str(index))
+        self.create_outbox(OutboxEmail.StatusChoices.failed, body="0")
+        pending = self.create_outbox(OutboxEmail.StatusChoices.pending)
+        recent = self.create_outbox(sent, body="recent", old=False)
+        log = DeliveryLog.objects.create(
+            recipients=["a@test.com"],
+            payload=payloads.store(make_message("log")),
+            status=DeliveryLog.StatusChoices.sent,
+        )
+        DeliveryLog.objects.filter(pk=log.pk).update(created_at=self.old)
+        EmailPayload.objects.update(created_at=self.old, last_used_at=self.old)
+
+        deleted = retention.compact(
+            timezone.now() - datetime.timedelta(days=30), chunk_size=2
+        )
+
+        self.assertEqual(
+            deleted, {"outbox": 6, "delivery_logs": 1, "payloads": 6}
+        )
+        self.assertEqual(
+            set(OutboxEmail.objects.values_list("pk", flat=True)),
+            {pending.pk, recent.pk},
+        )
+        self.assertEqual(
+            set(EmailPayload.objects.values_list("pk", flat=True)),
+            {pending.payload_id, recent.payload_id},
+        )
+
+    def test_reused_payload(self):
+        """Test that an unused payload which has just been reused is not
+        deleted before the row that uses it is saved.
+        """
+        payload = payloads.store(make_message("Hello"))
+        EmailPayload.objects.update(created_at=self.old, last_used_at=self.old)
+        self.assertEqual(payloads.store(make_message("Hello")), payload)
+        deleted = retention.compact(
+            timezone.now() - datetime.timedelta(days=30)
+        )
+        self.assertEqual(deleted["payloads"], 0)
+        self.assertTrue(EmailPayload.objects.filter(pk=payload.pk).exists())
+
+    def test_payload_deleted_whilst_reused(self):
+        """Test that a payload which is deleted whilst it is being reused is
+        stored again.
+        """
+        payload = payloads.store(make_message("Hello"))
+        first = QuerySet.first
+
+        def compact_then_first(queryset):
+            found = first(queryset)
+            EmailPayload.objects.filter(pk=payload.pk).delete()
+            return found
+
+        with mock.patch.object(
+            QuerySet, "first", autospec=True, side_effect=compact_then_first
+        ):
+            stored = payloads.store(make_message("Hello"))
+        self.assertNotEqual(stored.pk, payload.pk)
+        self.assertTrue(EmailPayload.objects.filter(pk=stored.pk).exists())
+
+    def test_archive(self):
+        """Test that deleted rows are written to the archive with their
+        content.
+        """
+        item = self.create_outbox(OutboxEmail.StatusChoices.sent)
+        archive = io.StringIO()
+        retention.compact(timezone.now(), archive=archive)
+
+        record = json.loads(archive.getvalue())
+        self.assertEqual(record["model"], "email_signals.outboxemail")
+        self.assertEqual(record["fields"]["id"], item.pk)
+        self.assertEqual(record["content"]["body"], "Hello")
+
+    def test_command(self):
+        """Test that the command deletes rows older than `--days`."""
+        self.create_outbox(OutboxEmail.StatusChoices.sent)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "archive.jsonl")
+            call_command(
+                "email_signals_compact",
+                "--days=30",
+                f"--archive={path}",
+                stdout=io.StringIO(),
+            )
+            with open(path) as archive:
+                self.assertEqual(len(archive.readlines()), 1)
+        self.assertFalse(OutboxEmail.objects.exists())
@@ -0,0 +1,151 @@
+import datetime
+import decimal
+import json
+from django.test import SimpleTestCase
+from .testcase import EmailSignalTestCase
+from .. import snapshot, utils
+
+
+class TestSourcePaths(SimpleTestCase):
+    """Unittests for the `source_paths` function."""
+
+    def test_variables(self):
+        """Test that variables and filter arguments are found and that
+        variables outside of the signal context are ignored.
+        """
+        self.assertEqual(
+            snapshot.source_paths(
+                "{{ instance.name|upper }} {{ other.value }} "
+                "{{ instance.email|default:instance.customer.email }}"
+            ),
+            {"instance.name", "instance.email", "instance.customer.email"},
+        )
+
+    def test_if_conditions(self):
+        """Test that variables in `{% if %}` conditions are found."""
+        self.assertEqual(
+            snapshot.source_paths(
+                "{% if signal_kwargs.created and instance.id > 1 %}"
+                "{{ instance.name }}{% else %}{{ instance.email }}{% endif %}"
+            ),
+            {
+                "signal_kwargs.created",
+                "instance.id",
+                "instance.name",
+                "instance.email",
+            },
+        )
+
+    def test_for_loops(self):
+        """Test that loop variables are resolved to the items of the
+        sequence being looped over.
+        """
+        self.assertEqual(
+            snapshot.source_paths(
+                "{% for order in instance.orders.all %}"
+                "{{ order.number }}{{ forloop.counter }}{% endfor %}"
+            ),
+            {"instance.orders.all", "instance.orders.all.*.number"},
+        )
+
+    def test_with(self):
+        """Test that `{% with %}` variables are resolved to the path they
+        alias.
+        """
+        self.assertEqual(
+            snapshot.source_paths(
+                "{% with customer=instance.customer %}"
+                "{{ customer.name }}{% endwith %}"
+            ),
+            {"instance.customer", "instance.customer.name"},
+        )
+
+
+class TestLoadSnapshot(SimpleTestCase):
+    """Unittests for the `encode_value` and `load_snapshot` functions."""
+
+    def test_round_trip(self):
+        """Test that tagged types survive a round trip through JSON."""
+        values = [
+            datetime.datetime(2022, 1, 2, 3, 4, 5),
+            datetime.date(2022, 1, 2),
+            datetime.time(3, 4, 5),
+            decimal.Decimal("1.10"),
+            "a",
+            1,
+            None,
+        ]
+        encoded = json.loads(json.dumps(snapshot.encode_value(values)))
+        self.assertEqual(snapshot.load_snapshot(encoded), values)
+
+    def test_snapshot_node_str(self):
+        """Test that a captured object renders as the original object."""
+        node = snapshot.load_snapshot({"__str__": "Customer", "name": "a"})
+        self.assertEqual(str(node), "Customer")
+        self.assertEqual(node["name"], "a")
+
+
+class TestTakeSnapshot(EmailSignalTestCase):
+    """Unittests for the `take_snapshot` function."""
+
+    def render_both(self, source: str, signal_kwargs=None) -> tuple:
+        """Render `source` with the live context and with a snapshot which
+        has been through JSON.
+        """
+        context = {
+            "instance": self.customer_order_rec,
+            "signal_kwargs": signal_kwargs or {},
+        }
+        data = snapshot.take_snapshot(snapshot.source_paths(source), context)
+        restored = snapshot.load_snapshot(json.loads(json.dumps(data)))
+        return (
+            utils.add_context_to_string(source, context),
+            utils.add_context_to_string(source, restored),
+        )
+
+    def test_only_referenced_values(self):
+        """Test that only the referenced values are captured."""
+        data = snapshot.take_snapshot(
+            {"instance.customer.name"},
+            {"instance": self.customer_order_rec, "signal_kwargs": {}},
+        )
+        self.assertEqual(
+            data, {"instance": {"customer": {"name": self.customer_rec.name}}}
+        )
+
+    def test_renders_the_same(self):
+        """Test that the snapshot renders the same as the live context."""
+        live, restored = self.render_both(
+            "{{ instance }} {{ instance.order_number }} "
+            "{{ instance.customer.name|upper }} {{ instance.customer }} "
+            "{{ instance.missing }} "
+            "{% if signal_kwargs.created %}created{% endif %}",
+            {"created": True},
+        )
+        self.assertEqual(live, restored)
+
+    def test_loops_render_the_same(self):
+        """Test that loops over related objects render the same."""
+        self.CustomerOrder.create_record(self.customer_rec)
+        live, restored = self.render_both(
+            "{% for order in instance.customer.testcustomerordermodel_set.all %}"  # noqa: E501
+            "{{ order.order_number }},{% empty %}none{% endfor %}"
+        )
+        self.assertEqual(live, restored)
+
+    def test_snapshot_context(self):
+        """Test that the paths are taken from the signal's content."""
+        signal = self.create_signal(self.customer_order_rec)
+        signal.plain_message = "{{ instance.customer.email }}"
+        signal.html_message = "<p>{{ signal_kwargs.created }}</p>"
+        signal.save()
+        data = snapshot.snapshot_context(
+            signal, self.customer_order_rec, {"created": False, "raw": False}
+        )
+        self.assertEqual(
+            data,
+            {
+                "instance": {"customer": {"email": self.customer_rec.email}},
+                "signal_kwargs": {"created": False},
+            },
+        )
@@ -0,0 +1,93 @@
+import asyncio
+from django.core import mail
+from django.core.cache import cache
+from django.db.models import signals as django_signals
+from django.test import override_settings
+import email_signals
+from .testcase import EmailSignalTestCase
+from .. import signals, suppression
+from ..models import Signal
+
+
+@override_settings(EMAIL_SIGNAL_KILL_SWITCH_POLL=0)
+class TestSuppression(EmailSignalTestCase):
+    """Unittests for the `suppression` module."""
+
+    def setUp(self):
+        super().setUp()
+        suppression._kill_switch["expires"] = 0.0
+        self.addCleanup(suppression.set_kill_switch, False)
+        self.signal = self.create_signal(
+            self.customer_order_rec, Signal.SignalTypeChoices.post_save
+        )
+
+    def raise_signal(self, **kwargs):
+        signals.signal_callback(
+            self.customer_order_rec,
+            django_signals.post_save,
+            sender=self.CustomerOrder,
+            **{"created": False, "raw": False, "using": "default", **kwargs},
+        )
+
+    def test_raw(self):
+        """Test that signals raised when loading fixtures are ignored."""
+        self.raise_signal(raw=True)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_suppressed(self):
+        """Test that signals are only ignored inside the block."""
+        with email_signals.suppressed():
+            self.raise_signal()
+        self.assertEqual(len(mail.outbox), 0)
+        self.raise_signal()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_suppressed_filters(self):
+        """Test that only the given models and signal types are ignored."""
+        with email_signals.suppressed(models=[self.Customer]):
+            self.raise_signal()
+        with email_signals.suppressed(signals=[django_signals.pre_save]):
+            self.raise_signal()
+        self.assertEqual(len(mail.outbox), 2)
+        with email_signals.suppressed(
+            models=[self.CustomerOrder], signals=[django_signals.post_save]
+        ):
+            self.raise_signal()
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_suppressed_per_task(self):
+        """Test that a block only applies to the task which entered it."""
+
+        async def suppressed_task(entered, finish):
+            with email_signals.suppressed():
+                entered.set()
+                await finish.wait()
+
+        async def main():
+            entered, finish = asyncio.Event(), asyncio.Event()
+            task = asyncio.ensure_future(suppressed_task(entered, finish))
+            await entered.wait()
+            result = suppression.is_suppressed(
+                self.customer_order_rec, django_signals.post_save, {}
+            )
+            finish.set()
+            await task
+            return result
+
+        self.assertFalse(asyncio.run(main()))
+
+    def test_kill_switch(self):
+        """Test that the kill switch is read from the cache."""
+        cache.set(suppression.KILL_SWITCH_KEY, True)
+        self.raise_signal()
+        self.assertEqual(len(mail.outbox), 0)
+        suppression.set_kill_switch(False)
+        self.raise_signal()
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(EMAIL_SIGNAL_KILL_SWITCH_POLL=60)
+    def test_kill_switch_polled(self):
+        """Test that the flag is only read once per poll interval."""
+        suppression.set_kill_switch(False)
+        cache.set(suppression.KILL_SWITCH_KEY, True)
+        self.assertFalse(suppression.kill_switch_active())
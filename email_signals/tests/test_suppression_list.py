@@ -0,0 +1,68 @@
+from django.core import mail
+from django.test import override_settings
+from django.utils import timezone
+from .testcase import EmailSignalTestCase
+from .. import recipients, signals, suppression_list
+from ..models import SuppressedAddress
+
+
+class TestSuppressionList(EmailSignalTestCase):
+    """Unittests for the `suppression_list` module."""
+
+    def setUp(self):
+        super().setUp()
+        suppression_list.clear()
+        self.addCleanup(suppression_list.clear)
+
+    def test_suppress(self):
+        """Test that suppressed addresses are left out of mailing lists,
+        ignoring case.
+        """
+        suppression_list.suppress(" Bounced@Test.com ")
+        self.assertEqual(
+            list(
+                recipients.iter_recipients(
+                    ["ok@test.com", "bounced@test.com", "BOUNCED@test.com"]
+                )
+            ),
+            ["ok@test.com"],
+        )
+        self.assertTrue(suppression_list.is_suppressed("bounced@TEST.com"))
+
+    def test_signal(self):
+        """Test that a signal's email is not sent to suppressed addresses."""
+        self.create_signal(self.customer_rec)
+        suppression_list.suppress(self.customer_rec.email)
+        signals.signal_callback(self.customer_rec, signals.signals.pre_save)
+        self.assertEqual(len(mail.outbox), 0)
+        address = SuppressedAddress.objects.get()
+        address.active = False
+        address.save()
+        signals.signal_callback(self.customer_rec, signals.signals.pre_save)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_loaded_once(self):
+        """Test that the addresses are only read again once the refresh
+        interval has passed.
+        """
+        suppression_list.addresses()
+        with self.assertNumQueries(0):
+            suppression_list.addresses()
+
+    @override_settings(EMAIL_SIGNAL_SUPPRESSION_REFRESH=0)
+    def test_refresh(self):
+        """Test that rows changed by other processes are read
+        incrementally.
+        """
+        suppression_list.addresses()
+        # Saved without sending `post_save`, as another process would.
+        SuppressedAddress.objects.bulk_create(
+            [SuppressedAddress(email=f"user{i}@test.com") for i in range(3)]
+        )
+        with self.assertNumQueries(1):
+            emails = suppression_list.addresses()
+        self.assertEqual(len(emails), 3)
+        SuppressedAddress.objects.filter(email="user0@test.com").update(
+            active=False, updated_at=timezone.now()
+        )
+        self.assertNotIn("user0@test.com", suppression_list.addresses())
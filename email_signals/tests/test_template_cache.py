@@ -0,0 +1,73 @@
+from unittest import mock
+from django.test import override_settings
+from .testcase import EmailSignalTestCase
+from .. import metrics, template_cache, utils
+
+
+class TestTemplateCache(EmailSignalTestCase):
+    """Unittests for the `template_cache` module."""
+
+    def setUp(self):
+        super().setUp()
+        template_cache.invalidate()
+        metrics.reset()
+
+    def test_hits_and_misses(self):
+        """Test that a template is only compiled the first time it is
+        used.
+        """
+        engine = template_cache.get_engine()
+        with mock.patch.object(
+            engine, "from_string", wraps=engine.from_string
+        ) as from_string:
+            for name in ("a", "b", "c"):
+                self.assertEqual(
+                    utils.add_context_to_string(
+                        "Hi {{ name }}", {"name": name}, 1, "plain_message"
+                    ),
+                    f"Hi {name}",
+                )
+        from_string.assert_called_once()
+        stats = template_cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["size"], 1)
+
+    def test_content_is_part_of_the_key(self):
+        """Test that changed content is compiled again."""
+        utils.add_context_to_string("a", {}, 1, "plain_message")
+        self.assertEqual(
+            utils.add_context_to_string("b", {}, 1, "plain_message"), "b"
+        )
+        self.assertEqual(template_cache.stats()["misses"], 2)
+
+    @override_settings(EMAIL_SIGNAL_TEMPLATE_CACHE_SIZE=2)
+    def test_bounded(self):
+        """Test that the least recently used template is evicted."""
+        template_cache.get_template("a")
+        template_cache.get_template("b")
+        template_cache.get_template("a")
+        template_cache.get_template("c")
+        self.assertEqual(template_cache.stats()["size"], 2)
+
+        template_cache.get_template("a")
+        template_cache.get_template("b")
+        self.assertEqual(template_cache.stats()["misses"], 4)
+
+    def test_invalidated_on_save(self):
+        """Test that a signal's templates are discarded when it is saved and
+        that other templates are kept.
+        """
+        signal = self.create_signal(self.customer_order_rec)
+        template_cache.get_template("a", signal.pk, "plain_message")
+        template_cache.get_template("b", signal.pk, "html_message")
+        template_cache.get_template("c")
+        self.assertEqual(template_cache.stats()["size"], 3)
+
+        signal.save()
+        self.assertEqual(template_cache.stats()["size"], 1)
+
+        signal_id = signal.pk
+        template_cache.get_template("a", signal_id, "plain_message")
+        signal.delete()
+        self.assertEqual(template_cache.stats()["size"], 1)
@@ -4,8 +4,10 @@ from django.test import TestCase
 from django.conf import settings
 from django.db import models
 from django.contrib.contenttypes.models import ContentType
-from ..models import Signal
+from django.db.models import signals as django_signals
+from ..models import Signal, bulk_post_save
 from ..registry import add_to_registry
+from ..signals import bulk_callback, signal_callback
 from ..signals import setup as signals_setup
 
 
@@ -70,6 +72,20 @@ class EmailSignalTestCase(TestCase):
         add_to_registry(self.CustomerOrder)
         signals_setup()
 
+    def disconnect_signals(self):
+        """Stops the signals connected by `setup_signals` from being raised
+        for the test models.
+        """
+        for model in (self.Customer, self.CustomerOrder):
+            for signal in (
+                django_signals.pre_save,
+                django_signals.post_save,
+                django_signals.pre_delete,
+                django_signals.post_delete,
+            ):
+                signal.disconnect(signal_callback, sender=model)
+            bulk_post_save.disconnect(bulk_callback, sender=model)
+
     @staticmethod
     def create_signal(
         model_instance: models.Model,
@@ -1,9 +1,9 @@
 """Contains utility functions for the email_signals package."""
 
 import typing as _t
-from django.template import loader
 from django.db.models.base import ModelBase
 from django.db.models.fields.related_descriptors import ManyToManyDescriptor
+from . import budgets, template_cache
 
 
 def convert_to_primitive(param: str) -> _t.Any:
@@ -153,24 +153,24 @@ def get_model_attr_names(model_class: ModelBase, seen_attrs=None) -> dict:
     return attr_names
 
 
-def add_context_to_string(template_str: str, context: dict) -> str:
-    """Add the context to the template string.
+def add_context_to_string(
+    template_str: str,
+    context: dict,
+    signal_id: _t.Optional[_t.Any] = None,
+    field: _t.Optional[str] = None,
+) -> str:
+    """Add the context to the template string. Compiled templates are cached
+    so that the same string is only parsed once.
 
     Args:
         template_str: The template string to add the context to.
         context: The context to add to the template string.
+        signal_id: The id of the signal the string belongs to, if any. Used
+            to discard cached templates when the signal is edited.
+        field: The name of the signal field the string came from, if any.
 
     Returns:
         str: The template string with the context added.
     """
-    engines = loader._engine_list()
-    for engine in engines:
-        try:
-            template = engine.from_string(template_str)
-            return template.render(context)
-        except AttributeError:
-            continue
-    else:
-        raise ValueError(
-            "Could not find a template engine that can render the string."
-        )
+    template = template_cache.get_template(template_str, signal_id, field)
+    return budgets.render_django(template, context)